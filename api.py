@@ -1,9 +1,24 @@
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI, HTTPException
 from src.main import process_patient_query
 from src.models.model import PatientQuery
+from src.rag.api.dependencies import get_openai_client_dep, warm_up
+from src.rag.config import get_settings
+from src.rag.query_cache import get_query_cache
+from src.rag.search_executor import get_search_executor
 import traceback
 
-app = FastAPI(title="Medical AI System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the vector index before the first query instead of during it
+    await asyncio.to_thread(warm_up, get_settings())
+    yield
+
+
+app = FastAPI(title="Medical AI System", lifespan=lifespan)
 
 @app.post("/query")
 async def handle_query(query: PatientQuery):
@@ -20,4 +35,15 @@ async def handle_query(query: PatientQuery):
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics")
+async def metrics():
+    # Same cache instance the RAG dependencies use (keyed by the shared Settings)
+    settings = get_settings()
+    query_cache = get_query_cache(settings)
+    return {
+        "query_cache": query_cache.stats() if query_cache is not None else None,
+        "search_executor": get_search_executor().stats(),
+        "openai": get_openai_client_dep(settings).stats(),
+    }
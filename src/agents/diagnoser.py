@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 
 # RAG imports
 from src.rag.core.services import retrieve_context
-from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep
+from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep, get_lexical_index_dep
 
 load_dotenv()
 
@@ -40,6 +40,7 @@ async def retrieve_medical_knowledge(ctx: RunContextWrapper[Any], query: str) ->
         settings = get_settings_dep()
         vector_store = get_vector_store_dep(settings)
         openai_client = get_openai_client_dep(settings)
+        lexical_index = get_lexical_index_dep(settings)
         
         # Use the RAG service's retrieve_context function
         chunks = await retrieve_context(
@@ -47,7 +48,9 @@ async def retrieve_medical_knowledge(ctx: RunContextWrapper[Any], query: str) ->
             patient_id=patient_id,
             openai_client=openai_client,
             vector_store=vector_store,
-            top_k=settings.top_k
+            top_k=settings.top_k,
+            lexical_index=lexical_index,
+            settings=settings,
         )
         
         if not chunks:
@@ -5,8 +5,8 @@ import os
 from dotenv import load_dotenv
 
 # RAG imports
-from src.rag.core.services import retrieve_context
-from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep
+from src.rag.core.services import retrieve_context_many
+from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep, get_lexical_index_dep
 
 load_dotenv()
 
@@ -35,29 +35,31 @@ async def check_patient_safety(ctx: RunContextWrapper[Any], query: str) -> str:
         if not patient_id:
             return "Error: Patient ID not available in context. Cannot retrieve safety information."
         
-        # Fetch critical safety data from RAG
-        safety_query = f"""
-        For patient {patient_id}, retrieve:
-        1. ALL known allergies (especially drug allergies)
-        2. Current medications and dosages
-        3. Recent adverse reactions or contraindications
-        4. Medical conditions that may affect medication use
-        
-        Query context: {query}
-        """
+        # Fetch critical safety data from RAG, one focused sub-query per safety aspect
+        safety_queries = [
+            f"Known allergies, especially drug allergies. Context: {query}",
+            f"Current medications and dosages. Context: {query}",
+            f"Recent adverse reactions or contraindications. Context: {query}",
+            f"Medical conditions that may affect medication use. Context: {query}",
+        ]
         
         # Initialize RAG dependencies
         settings = get_settings_dep()
         vector_store = get_vector_store_dep(settings)
         openai_client = get_openai_client_dep(settings)
+        lexical_index = get_lexical_index_dep(settings)
         
-        # Use RAG to fetch safety data with focused retrieval
-        chunks = await retrieve_context(
-            question=safety_query,
+        # All sub-queries share one embedding call and one vector search (per RETRIEVAL_MODE);
+        # results are merged and de-duplicated by chunk
+        chunks = await retrieve_context_many(
+            questions=safety_queries,
             patient_id=patient_id,
             openai_client=openai_client,
             vector_store=vector_store,
-            top_k=5  # Focused retrieval for critical safety information
+            top_k=5,  # Focused retrieval for critical safety information
+            max_chunks=5,  # Same context size as a single safety query
+            lexical_index=lexical_index,
+            settings=settings,
         )
         
         if not chunks:
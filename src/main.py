@@ -1,4 +1,4 @@
-from agents import Agent, Runner
+from agents import Agent, Runner, set_default_openai_client
 from src.models.model import PatientQuery, MedicalContext, QueryClassification, TranslatedQuery
 from src.agents import (
     translator_agent,
@@ -7,9 +7,15 @@ from src.agents import (
     medical_assistant,
     native_language_agent,
 )
+from src.rag.config import get_settings
+from src.rag.openai_client import get_shared_async_openai
 
 import uuid
 
+# Agent model calls go through the same connection pool and host-wide rate limiter as the RAG service
+if get_settings().openai_api_key:
+    set_default_openai_client(get_shared_async_openai(get_settings()), use_for_tracing=False)
+
 def generate_session_id() -> str:
     """Generate a unique session ID"""
     return str(uuid.uuid4())
@@ -1,7 +1,7 @@
 """API models and dependencies."""
 
 from src.rag.api.models import AskRequest, AskResponse, SourceAttribution
-from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep
+from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep, get_lexical_index_dep
 
 __all__ = [
     "AskRequest",
@@ -10,4 +10,5 @@ __all__ = [
     "get_settings_dep",
     "get_vector_store_dep",
     "get_openai_client_dep",
+    "get_lexical_index_dep",
 ]
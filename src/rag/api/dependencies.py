@@ -1,32 +1,31 @@
 """Dependency injection factories for FastAPI endpoints."""
 
 from functools import lru_cache
+import logging
+import time
 
 from fastapi import Depends
 
 from src.rag.config import Settings, get_settings
-from src.rag.openai_client import OpenAIClient, OpenAIClientConfig
-from src.rag.vector_store import get_vector_store, VectorStore
+from src.rag.lexical import LexicalIndex, get_lexical_index
+from src.rag.openai_client import OpenAIClient, get_openai_client
+from src.rag.query_cache import cached_vector_store
+from src.rag.snapshot import get_serving_vector_store
+from src.rag.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
 
 
 @lru_cache(maxsize=1)
 def _get_vector_store_cached(settings: Settings) -> VectorStore:
-    """Cached factory for VectorStore singleton."""
-    return get_vector_store(settings)
+    """Cached factory for VectorStore singleton (behind the query cache when enabled)."""
+    return cached_vector_store(get_serving_vector_store(settings), settings)
 
 
 @lru_cache(maxsize=1)
 def _get_openai_client_cached(settings: Settings) -> OpenAIClient:
     """Cached factory for OpenAIClient singleton."""
-    if not settings.openai_api_key:
-        raise RuntimeError("OPENAI_API_KEY is not configured")
-    config = OpenAIClientConfig(
-        api_key=settings.openai_api_key,
-        embed_model=settings.embed_model,
-        timeout=settings.openai_timeout,
-        max_retries=settings.max_embed_retries,
-    )
-    return OpenAIClient(config)
+    return get_openai_client(settings)
 
 
 def get_settings_dep() -> Settings:
@@ -42,3 +41,26 @@ def get_vector_store_dep(settings: Settings = Depends(get_settings_dep)) -> Vect
 def get_openai_client_dep(settings: Settings = Depends(get_settings_dep)) -> OpenAIClient:
     """Dependency for injecting OpenAIClient."""
     return _get_openai_client_cached(settings)
+
+
+def get_lexical_index_dep(settings: Settings = Depends(get_settings_dep)) -> LexicalIndex | None:
+    """Dependency for injecting the BM25 index (None when LEXICAL_INDEX is off)."""
+    return get_lexical_index(settings)
+
+
+def warm_up(settings: Settings | None = None) -> None:
+    """Build the shared dependencies and load the index now, so the first request
+    doesn't pay for it. Failures are logged; requests will retry the same work."""
+    active_settings = settings or get_settings()
+    if not active_settings.warmup_on_start:
+        return
+    started = time.perf_counter()
+    try:
+        _get_vector_store_cached(active_settings).warmup()
+        get_lexical_index(active_settings)
+        if active_settings.openai_api_key:
+            _get_openai_client_cached(active_settings)
+    except Exception:
+        logger.exception("Warmup failed; dependencies will load on first use")
+        return
+    logger.info("Warmed up vector store and clients in %.2fs", time.perf_counter() - started)
@@ -9,7 +9,6 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from tenacity import RetryError
 
 logger = logging.getLogger(__name__)
 
@@ -81,15 +80,6 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     return _error_response(status_code=exc.status_code, message=message, details=details)
 
 
-async def retry_exception_handler(request: Request, exc: RetryError):
-    """Handle retry exhaustion errors."""
-    logger.error("Retries exhausted for request %s %s: %s", request.method, request.url, traceback.format_exc())
-    return _error_response(
-        status_code=status.HTTP_502_BAD_GATEWAY,
-        message="Upstream service temporarily unavailable; please retry later.",
-    )
-
-
 async def generic_exception_handler(request: Request, exc: Exception):
     """Handle all unhandled exceptions."""
     logger.exception("Unhandled exception handling request %s %s: %s", request.method, request.url, traceback.format_exc())
@@ -31,3 +31,5 @@ class AskResponse(BaseModel):
     """Response payload for /ask."""
     answer: str
     sources: list[SourceAttribution]
+    # True when vector retrieval timed out or failed and the context came from BM25
+    retrieval_fallback: bool = False
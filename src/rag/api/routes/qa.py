@@ -8,13 +8,17 @@ from typing import AsyncIterator
 from fastapi import Depends, HTTPException, Query, status
 from fastapi.responses import JSONResponse, StreamingResponse
 
-from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep
+from src.rag.api.dependencies import get_settings_dep, get_vector_store_dep, get_openai_client_dep, get_lexical_index_dep
 from src.rag.api.error_handlers import _error_payload
 from src.rag.api.models import AskRequest, AskResponse
 from src.rag.api.utils import serialize_event
 from src.rag.config import Settings
-from src.rag.core.services import retrieve_context, generate_answer, sources_from_chunks
+from src.rag.core.services import retrieve_context, generate_answer, served_from_fallback, sources_from_chunks, stream_answer
+from src.rag.lexical import LexicalIndex
 from src.rag.openai_client import OpenAIClient
+from src.rag.query_cache import get_query_cache
+from src.rag.retry import deadline_scope, time_remaining
+from src.rag.search_executor import get_search_executor
 from src.rag.vector_store import VectorStore
 
 logger = logging.getLogger(__name__)
@@ -26,6 +30,7 @@ async def ask_question(
     settings: Settings = Depends(get_settings_dep),
     vector_store: VectorStore = Depends(get_vector_store_dep),
     openai_client: OpenAIClient = Depends(get_openai_client_dep),
+    lexical_index: LexicalIndex | None = Depends(get_lexical_index_dep),
 ):
     """
     POST /ask - Answer a question using RAG.
@@ -35,24 +40,34 @@ async def ask_question(
     """
     logger.info("Received question request: %s", body.question)
 
-    # Retrieve context with retries handled in the wrapper
-    chunks = await retrieve_context(
-        question=body.question,
-        vector_store=vector_store,
-        openai_client=openai_client,
-        top_k=settings.top_k,
-        patient_id=body.patient_id, 
-    )
-
-    if not stream:
-        answer_text = await generate_answer(
+    # One deadline for every OpenAI call of this request, retries included
+    with deadline_scope(settings.request_deadline):
+        chunks = await retrieve_context(
             question=body.question,
-            chunks=chunks,
+            vector_store=vector_store,
             openai_client=openai_client,
+            top_k=settings.top_k,
+            patient_id=body.patient_id, 
+            lexical_index=lexical_index,
             settings=settings,
         )
-        response = AskResponse(answer=answer_text, sources=sources_from_chunks(chunks))
-        return JSONResponse(status_code=status.HTTP_200_OK, content=response.model_dump())
+
+        if not stream:
+            answer_text = await generate_answer(
+                question=body.question,
+                chunks=chunks,
+                openai_client=openai_client,
+                settings=settings,
+            )
+            response = AskResponse(
+                answer=answer_text,
+                sources=sources_from_chunks(chunks),
+                retrieval_fallback=served_from_fallback(chunks),
+            )
+            return JSONResponse(status_code=status.HTTP_200_OK, content=response.model_dump())
+
+        # The stream is produced after this handler returns, outside the scope above
+        remaining = time_remaining()
 
     async def event_stream() -> AsyncIterator[bytes]:
         sources = sources_from_chunks(chunks)
@@ -61,16 +76,25 @@ async def ask_question(
             {
                 "question": body.question,
                 "sources": [source.model_dump() for source in sources],
+                "retrieval_fallback": served_from_fallback(chunks),
             },
         )
 
         try:
-            answer_text = await generate_answer(
-                question=body.question,
-                chunks=chunks,
-                openai_client=openai_client,
-                settings=settings,
-            )
+            # Forward the model's text as it is generated, then the assembled answer
+            parts: list[str] = []
+            with deadline_scope(max(remaining, 0.001) if remaining is not None else None):
+                async for delta in stream_answer(
+                    question=body.question,
+                    chunks=chunks,
+                    openai_client=openai_client,
+                    settings=settings,
+                ):
+                    parts.append(delta)
+                    yield serialize_event("delta", {"text": delta})
+            answer_text = "".join(parts).strip()
+            if not answer_text:
+                raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Generation failed")
             yield serialize_event(
                 "answer",
                 {
@@ -124,6 +148,20 @@ async def health_check() -> JSONResponse:
     return JSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
 
 
+async def metrics(
+    settings: Settings = Depends(get_settings_dep),
+    openai_client: OpenAIClient = Depends(get_openai_client_dep),
+) -> JSONResponse:
+    """GET /metrics - Cache, search pool and OpenAI client statistics of this worker process."""
+    query_cache = get_query_cache(settings)
+    payload = {
+        "query_cache": query_cache.stats() if query_cache is not None else None,
+        "search_executor": get_search_executor().stats(),
+        "openai": openai_client.stats(),
+    }
+    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+
+
 async def root() -> JSONResponse:
     """GET / - Simple root endpoint with service info."""
     info = {
@@ -132,6 +170,7 @@ async def root() -> JSONResponse:
         "endpoints": {
             "/ask": "POST endpoint to ask a question",
             "/health": "GET health check endpoint",
+            "/metrics": "GET cache, search pool and OpenAI client statistics",
         },
     }
     return JSONResponse(content=info, status_code=status.HTTP_200_OK)
@@ -0,0 +1,376 @@
+""" Offline benchmarks: synthetic corpora and a stubbed embedder, no OpenAI calls. """
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import replace
+from pathlib import Path
+import argparse
+import asyncio
+import hashlib
+import logging
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from src.rag.config import Settings, get_settings
+from src.rag.hnsw_store import HnswVectorStore
+from src.rag.numpy_store import NumpyVectorStore
+from src.rag.partitioned_store import PartitionedChromaVectorStore
+from src.rag.profiling import IngestProfiler, StageStats
+from src.rag.quantized_store import QUANTIZATIONS, QuantizedVectorStore
+from src.rag.vector_store import ChromaVectorStore, DocumentChunk, VectorStore
+
+logger = logging.getLogger(__name__)
+
+_VOCABULARY = (
+    "patient presents with chest pain shortness of breath fever cough fatigue nausea "
+    "history hypertension diabetes asthma allergy penicillin ibuprofen metformin lisinopril "
+    "atorvastatin amoxicillin daily twice mg dose prescribed discontinued follow up weeks "
+    "blood pressure heart rate glucose hemoglobin creatinine platelets within normal range "
+    "elevated reduced imaging x-ray ct scan unremarkable discharged stable improved review"
+).split()
+
+
+class StubEmbedder:
+    """Stands in for OpenAIClient: deterministic unit vectors, optional fake latency."""
+
+    embedding_cache = None
+
+    def __init__(self, *, dimensions: int, latency: float = 0.0) -> None:
+        self._dimensions = dimensions
+        self._latency = latency
+
+    def embed_texts(self, texts: Sequence[str], *, model: str | None = None) -> list[list[float]]:
+        if self._latency:
+            time.sleep(self._latency)
+        return [self._vector(text).tolist() for text in texts]
+
+    def embed_text(self, text: str, *, model: str | None = None) -> list[float]:
+        return self.embed_texts([text])[0]
+
+    async def aembed_texts(self, texts: Sequence[str], *, model: str | None = None) -> list[list[float]]:
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return [self._vector(text).tolist() for text in texts]
+
+    async def aembed_text(self, text: str, *, model: str | None = None) -> list[float]:
+        return (await self.aembed_texts([text], model=model))[0]
+
+    def _vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self._dimensions).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+def write_synthetic_corpus(
+    root: Path,
+    *,
+    patients: int,
+    files_per_patient: int,
+    words_per_file: int,
+    seed: int = 7,
+) -> int:
+    """Write `patients` folders of markdown notes; returns the number of files."""
+    rng = random.Random(seed)
+    count = 0
+    for patient in range(patients):
+        folder = root / f"patient_{patient:04d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for index in range(files_per_patient):
+            paragraphs: list[str] = []
+            written = 0
+            while written < words_per_file:
+                sentences = []
+                for _ in range(rng.randint(2, 6)):
+                    length = rng.randint(6, 18)
+                    words = rng.choices(_VOCABULARY, k=length)
+                    sentences.append(" ".join(words).capitalize() + ".")
+                    written += length
+                paragraphs.append(" ".join(sentences))
+            (folder / f"note_{index:03d}.md").write_text("\n\n".join(paragraphs), encoding="utf-8")
+            count += 1
+    return count
+
+
+def run_ingest_benchmark(
+    *,
+    patients: int,
+    files_per_patient: int,
+    words_per_file: int,
+    workers: int,
+    embed_latency: float,
+    settings: Settings | None = None,
+) -> IngestProfiler:
+    """Ingest a synthetic corpus into a throwaway Chroma directory with a stubbed embedder."""
+    from src.rag.ingest import ingest_documents
+
+    base_settings = settings or get_settings()
+    with tempfile.TemporaryDirectory(prefix="ingest-bench-") as tmp:
+        root = Path(tmp)
+        files = write_synthetic_corpus(
+            root / "documents",
+            patients=patients,
+            files_per_patient=files_per_patient,
+            words_per_file=words_per_file,
+        )
+        bench_settings = replace(
+            base_settings,
+            docs_path=root / "documents",
+            embeddings_path=root / "embeddings",
+            lexical_index_path=root / "embeddings" / "lexical_index.sqlite3",
+            collection_name="benchmark",
+            openai_api_key=base_settings.openai_api_key or "benchmark",
+            embed_cache_max_entries=0,
+            ingest_workers=max(1, workers),
+        )
+        embedder = StubEmbedder(dimensions=bench_settings.embed_dimensions, latency=embed_latency)
+        profiler = IngestProfiler()
+
+        started = time.perf_counter()
+        chunks = ingest_documents(bench_settings, full=True, client=embedder, profiler=profiler)
+        elapsed = time.perf_counter() - started
+
+    logger.info(
+        "Benchmark: %s files, %s chunks in %.2fs (%.1f files/s, %.1f chunks/s)",
+        files,
+        chunks,
+        elapsed,
+        files / elapsed if elapsed else 0.0,
+        chunks / elapsed if elapsed else 0.0,
+    )
+    return profiler
+
+
+# Per-dimension scale that front-loads variance like a Matryoshka-trained model
+# (text-embedding-3): the leading dimensions carry most of the signal
+def _spectrum(dimensions: int) -> np.ndarray:
+    return (1.0 / (1.0 + np.arange(dimensions) / 32.0)).astype(np.float32)
+
+
+# Unit vectors clustered around one random centre per patient, like real notes
+def _synthetic_vectors(rng: np.random.Generator, count: int, dimensions: int) -> np.ndarray:
+    centre = rng.standard_normal(dimensions).astype(np.float32)
+    vectors = (centre + rng.standard_normal((count, dimensions)).astype(np.float32)) * _spectrum(dimensions)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _populate_stores(stores: Sequence[VectorStore], *, patients: int, chunks_per_patient: int, dimensions: int, seed: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    vectors_by_patient: dict[str, np.ndarray] = {}
+    for patient in range(patients):
+        patient_id = f"patient_{patient:04d}"
+        vectors = _synthetic_vectors(rng, chunks_per_patient, dimensions)
+        vectors_by_patient[patient_id] = vectors
+        chunks = [
+            DocumentChunk(
+                chunk_id=f"{patient_id}::note::{index}",
+                document_id=f"{patient_id}/note",
+                source_path=f"{patient_id}/note.md",
+                chunk_index=index,
+                content=f"synthetic chunk {index} of {patient_id}",
+                patient_id=patient_id,
+            )
+            for index in range(chunks_per_patient)
+        ]
+        for start in range(0, chunks_per_patient, 1000):
+            for store in stores:
+                store.upsert(chunks[start : start + 1000], vectors[start : start + 1000].tolist())
+    for store in stores:
+        store.persist()
+    return vectors_by_patient
+
+
+def run_search_benchmark(
+    *,
+    patients: int,
+    chunks_per_patient: int,
+    queries: int,
+    top_k: int,
+    dimensions: int,
+    quantization: str = "int8",
+    rescore_factor: int = 4,
+    search_dimensions: int = 0,
+    partitioned: bool = False,
+    hnsw: bool = False,
+    hnsw_m: int = 16,
+    hnsw_ef_construction: int = 100,
+    hnsw_ef_search: int = 64,
+    seed: int = 7,
+) -> dict[str, dict[str, float]]:
+    """Time patient-filtered queries on every vector backend over one synthetic index.
+
+    The Chroma-based backends read the same Chroma directory; `partitioned`
+    adds a collection-per-patient Chroma store, `search_dimensions` a quantized
+    store whose first pass reads only that many leading dimensions, and with `hnsw` the
+    self-contained HNSW store is built too (slow: pure Python inserts) and is
+    forced onto its graph path, since a single patient would otherwise be
+    scored exactly. `load_s` is the cold-start cost of a fresh store answering
+    one query per patient, `resident_mb` the memory its search structures keep
+    resident, and recall is measured against the exact (NumPy) results.
+    """
+    with tempfile.TemporaryDirectory(prefix="search-bench-") as tmp:
+        persist_directory = Path(tmp)
+        chroma = ChromaVectorStore(persist_directory=persist_directory, collection_name="benchmark")
+
+        def _hnsw_store() -> HnswVectorStore:
+            return HnswVectorStore(
+                directory=persist_directory / "hnsw",
+                m=hnsw_m,
+                ef_construction=hnsw_ef_construction,
+                ef_search=hnsw_ef_search,
+                exact_search_limit=0,
+            )
+
+        def _partitioned_store() -> PartitionedChromaVectorStore:
+            return PartitionedChromaVectorStore(persist_directory=persist_directory / "partitioned", collection_name="benchmark")
+
+        targets: list[VectorStore] = [chroma]
+        if partitioned:
+            targets.append(_partitioned_store())
+        if hnsw:
+            targets.append(_hnsw_store())
+        started = time.perf_counter()
+        vectors_by_patient = _populate_stores(
+            targets,
+            patients=patients,
+            chunks_per_patient=chunks_per_patient,
+            dimensions=dimensions,
+            seed=seed,
+        )
+        logger.info("Indexed %s vectors in %.2fs", patients * chunks_per_patient, time.perf_counter() - started)
+
+        rng = np.random.default_rng(seed + 1)
+        patient_ids = list(vectors_by_patient)
+        workload = []
+        for _ in range(queries):
+            patient_id = patient_ids[rng.integers(len(patient_ids))]
+            anchor = vectors_by_patient[patient_id][rng.integers(chunks_per_patient)]
+            noise = rng.standard_normal(dimensions).astype(np.float32) * _spectrum(dimensions)
+            query = anchor + 0.5 * noise / np.linalg.norm(noise)
+            workload.append((patient_id, (query / np.linalg.norm(query)).tolist()))
+
+        def _quantized_store(prefix: int = 0) -> QuantizedVectorStore:
+            return QuantizedVectorStore(
+                persist_directory=persist_directory,
+                collection_name="benchmark",
+                index_directory=persist_directory / "quantized" / f"benchmark-{prefix}d",
+                quantization=quantization,
+                rescore_factor=rescore_factor,
+                search_dimensions=prefix,
+            )
+
+        quantized = {f"quantized-{quantization}": 0}
+        if 0 < search_dimensions < dimensions:
+            quantized[f"quantized-{quantization}-{search_dimensions}d"] = search_dimensions
+
+        # Build the quantized indexes once so their cold start below measures opening them
+        quantized_build: dict[str, float] = {}
+        for backend, prefix in quantized.items():
+            started = time.perf_counter()
+            _quantized_store(prefix).index()
+            quantized_build[backend] = time.perf_counter() - started
+
+        backends = [
+            ("chroma", lambda: chroma),
+            ("numpy", lambda: NumpyVectorStore(persist_directory=persist_directory, collection_name="benchmark")),
+        ]
+        for backend, prefix in quantized.items():
+            backends.append((backend, lambda prefix=prefix: _quantized_store(prefix)))
+        if partitioned:
+            backends.append(("chroma-patient", _partitioned_store))
+        if hnsw:
+            backends.append(("hnsw-graph", _hnsw_store))
+
+        stores: dict[str, VectorStore] = {}
+        report: dict[str, dict[str, float]] = {}
+        for backend, factory in backends:
+            # First query per patient pays any loading; report it separately
+            started = time.perf_counter()
+            store = factory()
+            for patient_id in patient_ids:
+                store.similarity_search(workload[0][1], top_k=top_k, patient_id=patient_id)
+            stores[backend] = store
+            report[backend] = {"load_s": round(time.perf_counter() - started, 3)}
+
+        timings = {backend: StageStats() for backend in stores}
+        hits: dict[str, list[set[str]]] = {backend: [] for backend in stores}
+        for patient_id, query in workload:
+            for backend, store in stores.items():
+                started = time.perf_counter()
+                retrieved = store.similarity_search(query, top_k=top_k, patient_id=patient_id)
+                timings[backend].durations.append(time.perf_counter() - started)
+                hits[backend].append({hit.chunk_id for hit in retrieved})
+
+        resident = {"numpy": stores["numpy"].resident_bytes}
+        for backend in quantized:
+            resident[backend] = stores[backend].index().resident_bytes
+
+    exact = hits["numpy"]
+    for backend, stats in timings.items():
+        pairs = [(found, expected) for found, expected in zip(hits[backend], exact) if expected]
+        report[backend].update(
+            {
+                "p50_ms": round(stats.percentile(0.5) * 1000, 3),
+                "p95_ms": round(stats.percentile(0.95) * 1000, 3),
+                "qps": round(len(stats.durations) / stats.total, 1) if stats.total > 0 else 0.0,
+                "recall": round(float(np.mean([len(found & expected) / len(expected) for found, expected in pairs])), 4) if pairs else 0.0,
+            }
+        )
+        if backend in resident:
+            report[backend]["resident_mb"] = round(resident[backend] / 2**20, 2)
+    for backend, seconds in quantized_build.items():
+        report[backend]["build_s"] = round(seconds, 3)
+
+    logger.info(
+        "Search benchmark: %s patients x %s chunks, %s queries, top_k=%s, dim=%s",
+        patients, chunks_per_patient, queries, top_k, dimensions,
+    )
+    for backend, row in report.items():
+        logger.info("  %-22s %s", backend, "  ".join(f"{key}={value}" for key, value in row.items()))
+    return report
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmarks (no OpenAI calls)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    search = subparsers.add_parser("search", help="Compare patient-filtered query latency across vector backends")
+    search.add_argument("--patients", type=int, default=50, help="Number of patients")
+    search.add_argument("--chunks-per-patient", type=int, default=300, help="Stored chunks per patient")
+    search.add_argument("--queries", type=int, default=500, help="Number of timed queries")
+    search.add_argument("--top-k", type=int, default=10, help="Results per query")
+    search.add_argument("--dimensions", type=int, default=None, help="Vector size (defaults to EMBED_DIMENSIONS)")
+    search.add_argument("--quantization", choices=QUANTIZATIONS, default=None, help="Quantized backend format (defaults to VECTOR_QUANTIZATION)")
+    search.add_argument("--rescore-factor", type=int, default=None, help="Candidates rescored per result (defaults to QUANTIZED_RESCORE_FACTOR)")
+    search.add_argument("--search-dimensions", type=int, default=None, help="Also time a quantized store with a first pass over this many leading dimensions (defaults to SEARCH_DIMENSIONS)")
+    search.add_argument("--partitioned", action="store_true", help="Also time a Chroma store with one collection per patient")
+    search.add_argument("--hnsw", action="store_true", help="Also build and time the self-contained HNSW backend (HNSW_* settings)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.command == "search":
+        settings = get_settings()
+        run_search_benchmark(
+            patients=args.patients,
+            chunks_per_patient=args.chunks_per_patient,
+            queries=args.queries,
+            top_k=args.top_k,
+            dimensions=args.dimensions or settings.embed_dimensions,
+            quantization=args.quantization or settings.vector_quantization,
+            rescore_factor=args.rescore_factor or settings.quantized_rescore_factor,
+            search_dimensions=args.search_dimensions if args.search_dimensions is not None else settings.search_dimensions,
+            partitioned=args.partitioned,
+            hnsw=args.hnsw,
+            hnsw_m=settings.hnsw_m,
+            hnsw_ef_construction=settings.hnsw_ef_construction,
+            hnsw_ef_search=settings.hnsw_ef_search,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+""" Offset-based, token-aware text chunking. """
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from src.rag.tokens import iter_token_spans
+
+# Boundary strength after a token
+_NO_BREAK = 0
+_SENTENCE_BREAK = 1
+_PARAGRAPH_BREAK = 2
+
+_SENTENCE_END = {".", "!", "?"}
+
+
+@dataclass
+class _Token:
+    start: int
+    end: int
+    cost: int
+    boundary: int = _NO_BREAK
+
+
+def chunk_spans(text: str, *, chunk_size: int, chunk_overlap: int) -> Iterator[tuple[int, int]]:
+    """Yield (start, end) character offsets of chunks of at most ~`chunk_size` tokens.
+
+    The text is walked once; only the tokens of the current window are kept.
+    A chunk preferably ends at a paragraph break, then at a sentence end, as long
+    as that keeps at least half the window; otherwise it is cut at the token
+    limit. Consecutive chunks share about `chunk_overlap` tokens.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be greater than 0")
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+    window: list[_Token] = []
+    window_cost = 0
+    fresh = 0  # tokens in the window not covered by an emitted chunk
+
+    for start, end, cost in iter_token_spans(text):
+        if window:
+            previous = window[-1]
+            gap = text[previous.end:start]
+            if gap.count("\n") >= 2:
+                previous.boundary = _PARAGRAPH_BREAK
+            elif "\n" in gap or (text[previous.start:previous.end] in _SENTENCE_END and gap):
+                previous.boundary = _SENTENCE_BREAK
+
+        while window and window_cost + cost > chunk_size:
+            if not fresh:
+                # Only overlap left and the next token doesn't fit beside it: emitting
+                # would repeat text already in the previous chunk
+                window = []
+                window_cost = 0
+                break
+            cut = _pick_cut(window, first_fresh=len(window) - fresh)
+            yield window[0].start, window[cut].end
+
+            # Carry the overlap tail of the emitted chunk, always dropping at least one token
+            keep_from = cut + 1
+            overlap_cost = 0
+            while keep_from > 1 and overlap_cost + window[keep_from - 1].cost <= chunk_overlap:
+                keep_from -= 1
+                overlap_cost += window[keep_from].cost
+            fresh = len(window) - (cut + 1)
+            window = window[keep_from:]
+            window_cost = sum(token.cost for token in window)
+
+        window.append(_Token(start, end, cost))
+        window_cost += cost
+        fresh += 1
+
+    if window and fresh:
+        yield window[0].start, window[-1].end
+
+
+def _pick_cut(window: list[_Token], *, first_fresh: int) -> int:
+    """Index of the last token to include in the chunk being emitted.
+
+    Never before `first_fresh`, so every chunk carries at least one new token.
+    """
+    floor = max(len(window) // 2, first_fresh)
+    for strength in (_PARAGRAPH_BREAK, _SENTENCE_BREAK):
+        for index in range(len(window) - 1, floor - 1, -1):
+            if window[index].boundary >= strength:
+                return index
+    return len(window) - 1
+
+
+def chunk_text(text: str, *, chunk_size: int, chunk_overlap: int) -> list[str]:
+    """Chunk `text` and return the chunk strings (see `chunk_spans`)."""
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)]
@@ -0,0 +1,172 @@
+""" Circuit breaker that fails OpenAI calls fast while the error rate is high. """
+
+from __future__ import annotations
+
+from collections import deque
+from functools import lru_cache
+import logging
+import threading
+import time
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+from src.rag.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Errors that say the dependency is unhealthy (not the request): timeouts, connection errors, 5xx."""
+    if isinstance(exc, (APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code >= 500
+
+
+class CircuitBreaker:
+    """Closed -> open when failures pass `failure_rate` of the calls in the last
+    `window` seconds (at least `min_calls` of them); open rejects calls for
+    `reset_timeout` seconds, then half-open lets one probe through at a time
+    and closes again after `probes` successes in a row. Thread-safe.
+
+    `before_call` hands out a ticket that the outcome is reported with. Only
+    outcomes of calls admitted in the current state count: a slow call let
+    through before the last trip (or before the circuit closed again) is
+    ignored rather than mistaken for the half-open probe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float = 0.5,
+        min_calls: int = 20,
+        window: float = 30.0,
+        reset_timeout: float = 15.0,
+        probes: int = 3,
+    ) -> None:
+        self.name = name
+        self._failure_rate = failure_rate
+        self._min_calls = max(1, min_calls)
+        self._window = window
+        self._reset_timeout = reset_timeout
+        self._probes = max(1, probes)
+        self._lock = threading.Lock()
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        # Bumped on every trip, close and probe admission; tickets from older generations are stale
+        self._generation = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    # Caller holds the lock; moves open -> half-open once the reset timeout has passed
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self._reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+            self._probe_successes = 0
+        return self._state
+
+    def before_call(self) -> int:
+        """Ticket for a call that may go through now; raises CircuitOpenError otherwise."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return self._generation
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._generation += 1
+                return self._generation
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open; failing fast")
+
+    def record(self, ticket: int, exc: BaseException | None) -> None:
+        """Report how the call holding `ticket` ended (None for success)."""
+        failed = exc is not None and is_failure(exc)
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if ticket != self._generation:
+                return  # admitted before the last state change
+            if state == HALF_OPEN:
+                if not self._probe_in_flight:
+                    return
+                self._probe_in_flight = False
+                if failed:
+                    self._trip(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self._probes:
+                        logger.info("Circuit '%s' closed", self.name)
+                        self._state = CLOSED
+                        self._generation += 1
+                        self._outcomes.clear()
+                return
+            if state == OPEN:
+                return
+            self._outcomes.append((now, failed))
+            while self._outcomes and self._outcomes[0][0] <= now - self._window:
+                self._outcomes.popleft()
+            failures = sum(1 for _, outcome in self._outcomes if outcome)
+            if len(self._outcomes) >= self._min_calls and failures >= self._failure_rate * len(self._outcomes):
+                self._trip(now)
+
+    def abandon(self, ticket: int) -> None:
+        """The call holding `ticket` was cancelled; it says nothing about the dependency."""
+        with self._lock:
+            if ticket == self._generation and self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    # Caller holds the lock
+    def _trip(self, now: float) -> None:
+        logger.warning("Circuit '%s' opened for %ss", self.name, self._reset_timeout)
+        self._state = OPEN
+        self._opened_at = now
+        self._generation += 1
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self) -> dict[str, object]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, outcome in self._outcomes if outcome)
+            return {
+                "state": state,
+                "window_calls": calls,
+                "window_failure_rate": round(failures / calls, 4) if calls else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retry_in_s": round(max(0.0, self._reset_timeout - (now - self._opened_at)), 3) if state == OPEN else 0.0,
+            }
+
+
+@lru_cache()
+def get_circuit_breaker(name: str, settings: Settings | None = None) -> CircuitBreaker | None:
+    """Process-wide breaker for one kind of OpenAI call ("embeddings", "responses"); None when disabled."""
+    active_settings = settings or get_settings()
+    if not active_settings.circuit_breaker:
+        return None
+    return CircuitBreaker(
+        name,
+        failure_rate=active_settings.circuit_failure_rate,
+        min_calls=active_settings.circuit_min_calls,
+        window=active_settings.circuit_window,
+        reset_timeout=active_settings.circuit_reset_timeout,
+    )
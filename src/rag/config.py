@@ -31,20 +31,112 @@ load_dotenv()
 class Settings:
     docs_path: Path = Path(os.getenv("DOCS_PATH", "./documents"))
     embed_batch_size: int = int(os.getenv("EMBED_BATCH_SIZE", "30"))
-    chunk_size: int = int(os.getenv("CHUNK_SIZE", "50"))
-    chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "5"))
+    embed_max_batch_tokens: int = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "100000"))
+    embed_concurrency: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    # Chunk sizes are in (estimated) tokens; the defaults match the former 50-word chunks with a
+    # 5-word overlap (about 1.5 estimated tokens per word of clinical text)
+    chunk_size: int = int(os.getenv("CHUNK_SIZE", "75"))
+    chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "8"))
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "1"))
+    ingest_queue_size: int = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+    ingest_checkpoint_interval: float = float(os.getenv("INGEST_CHECKPOINT_INTERVAL", "10.0"))
+    # Opt-in: estimated Jaccard similarity above which a patient's chunk is a near-duplicate and is
+    # not indexed (0 disables). Longer chunks that differ in a single lab value score above 0.9,
+    # so for clinical text only values near 1.0 (e.g. 0.98+) are safe
+    dedup_threshold: float = float(os.getenv("DEDUP_THRESHOLD", "0"))
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
 
     embeddings_path: Path = Path(os.getenv("CHROMA_PATH", "embeddings"))
     collection_name: str = os.getenv("COLLECTION_NAME", "documents")
+    # "chroma" (filtered HNSW), "numpy" (exact search over in-memory per-patient matrices),
+    # "quantized" (memory-mapped int8/float16 first pass + float32 rescoring) or "hnsw" (self-contained graph)
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "chroma")
+    vector_quantization: str = os.getenv("VECTOR_QUANTIZATION", "int8")
+    # Candidates rescored in float32 per result (top_k * factor)
+    quantized_rescore_factor: int = int(os.getenv("QUANTIZED_RESCORE_FACTOR", "4"))
+    # Quantized backend: first pass over the leading N (Matryoshka) dimensions only; 0 uses them all
+    search_dimensions: int = int(os.getenv("SEARCH_DIMENSIONS", "0"))
+    # Chroma backend: "none" (one collection), "patient" (collection per patient) or
+    # "hash" (patients spread over VECTOR_PARTITION_BUCKETS collections)
+    vector_partitioning: str = os.getenv("VECTOR_PARTITIONING", "none")
+    vector_partition_buckets: int = int(os.getenv("VECTOR_PARTITION_BUCKETS", "64"))
+    # Partition indexes Chroma keeps loaded at once (least recently used evicted)
+    vector_max_open_partitions: int = int(os.getenv("VECTOR_MAX_OPEN_PARTITIONS", "32"))
+    # HNSW backend: links per node (M), candidate list sizes when building and searching
+    hnsw_m: int = int(os.getenv("HNSW_M", "16"))
+    hnsw_ef_construction: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+    hnsw_ef_search: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
     embed_model: str = os.getenv("EMBED_MODEL", "text-embedding-3-large")
+    embed_dimensions: int = int(os.getenv("EMBED_DIMENSIONS", "1536"))
+    # None keeps the cache under embeddings_path
+    embed_cache_path: Path | None = Path(os.environ["EMBED_CACHE_PATH"]) if os.getenv("EMBED_CACHE_PATH") else None
+    embed_cache_max_entries: int = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+    # BM25 keyword index built alongside the vector index
+    lexical_index: bool = os.getenv("LEXICAL_INDEX", "true").lower() in ("1", "true", "yes")
+    # None keeps the index under embeddings_path
+    lexical_index_path: Path | None = Path(os.environ["LEXICAL_INDEX_PATH"]) if os.getenv("LEXICAL_INDEX_PATH") else None
     openai_timeout: float = float(os.getenv("OPENAI_TIMEOUT", "30.0"))
+    # Retries of transient OpenAI failures, applied once in the client (no SDK or service-level retries)
     max_embed_retries: int = int(os.getenv("MAX_EMBED_RETRIES", "5"))
+    retry_initial_backoff: float = float(os.getenv("RETRY_INITIAL_BACKOFF", "0.5"))
+    retry_max_backoff: float = float(os.getenv("RETRY_MAX_BACKOFF", "8.0"))
+    # Query-path retries allowed per process as a fraction of calls over the last 10s, plus a
+    # small floor (batch ingest retries up to MAX_EMBED_RETRIES outside the budget)
+    retry_budget_ratio: float = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+    retry_budget_min_per_second: float = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1.0"))
+    # Time an /ask request may spend on OpenAI calls, retries included (0 disables)
+    request_deadline: float = float(os.getenv("REQUEST_DEADLINE", "30.0"))
+    # Duplicate a slow query-embedding call after the recent p95 latency and keep the first answer
+    hedge_embeddings: bool = os.getenv("HEDGE_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+    hedge_quantile: float = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+    hedge_min_delay_ms: float = float(os.getenv("HEDGE_MIN_DELAY_MS", "50"))
+    # Fail OpenAI calls fast once this fraction of the calls in the window failed (timeouts, 5xx)
+    circuit_breaker: bool = os.getenv("CIRCUIT_BREAKER", "true").lower() in ("1", "true", "yes")
+    circuit_failure_rate: float = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    circuit_min_calls: int = int(os.getenv("CIRCUIT_MIN_CALLS", "20"))
+    circuit_window: float = float(os.getenv("CIRCUIT_WINDOW", "30.0"))
+    circuit_reset_timeout: float = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "15.0"))
 
     stream_idle_timeout: float = float(os.getenv("STREAM_IDLE_TIMEOUT", "60.0"))
     stream_max_duration: float = float(os.getenv("STREAM_MAX_DURATION", "600.0"))
+    # Connection pool shared by the async OpenAI clients (HTTP/2 needs the `h2` package)
+    openai_max_connections: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    openai_max_keepalive_connections: int = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    openai_keepalive_expiry: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30.0"))
+    openai_http2: bool = os.getenv("OPENAI_HTTP2", "true").lower() in ("1", "true", "yes")
+    # Concurrent query embeddings arriving within this window go out as one request (0 disables)
+    embed_batch_window_ms: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    embed_batch_max_size: int = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+    # Token buckets in front of all OpenAI calls, shared by the processes on this host.
+    # Limits are learned from x-ratelimit-* headers; the per-minute values only seed unseen models (0 = unknown)
+    openai_rate_limit: bool = os.getenv("OPENAI_RATE_LIMIT", "true").lower() in ("1", "true", "yes")
+    # None keeps the buckets under embeddings_path
+    openai_rate_limit_path: Path | None = (
+        Path(os.environ["OPENAI_RATE_LIMIT_PATH"]) if os.getenv("OPENAI_RATE_LIMIT_PATH") else None
+    )
+    openai_requests_per_minute: float = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+    openai_tokens_per_minute: float = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+    # Fraction of the published limits actually used
+    openai_rate_limit_headroom: float = float(os.getenv("OPENAI_RATE_LIMIT_HEADROOM", "0.9"))
 
     top_k: int = int(os.getenv("TOP_K", "10"))
+    # Threads running vector searches for async callers
+    search_workers: int = int(os.getenv("SEARCH_WORKERS", "8"))
+    # "vector", "hybrid" (vector + BM25 fused by reciprocal rank) or "lexical" (BM25 only, no embedding call)
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "vector")
+    # Opt-in: seconds to wait for vector retrieval before answering from BM25 alone, also used
+    # when it fails (0 disables the fallback and surfaces the error)
+    retrieval_embed_timeout: float = float(os.getenv("RETRIEVAL_EMBED_TIMEOUT", "0"))
+    rrf_k: int = int(os.getenv("RRF_K", "60"))
+    # Single-file, memory-mapped copy of the index served by the API instead of the
+    # backend above; ingest rewrites it after every run (unset disables)
+    vector_snapshot_path: Path | None = Path(os.environ["VECTOR_SNAPSHOT_PATH"]) if os.getenv("VECTOR_SNAPSHOT_PATH") else None
+    snapshot_dtype: str = os.getenv("SNAPSHOT_DTYPE", "float32")
+    # Open the index and clients when the app starts rather than on the first request
+    warmup_on_start: bool = os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+    # Per-process cache of text-query results (0 entries disables; 0 ttl never expires)
+    query_cache_max_entries: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+    query_cache_ttl: float = float(os.getenv("QUERY_CACHE_TTL", "300"))
 
     response_instructions_path: Path = Path(os.getenv("RESPONSE_INSTRUCTIONS_PATH", "instruction.txt"))
     response_instructions: str = field(default_factory=_load_response_instructions)
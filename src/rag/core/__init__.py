@@ -1,5 +1,5 @@
 """Core business logic for RAG."""
 
-from src.rag.core.services import retrieve_context, generate_answer, sources_from_chunks
+from src.rag.core.services import retrieve_context, retrieve_context_many, generate_answer, sources_from_chunks
 
-__all__ = ["retrieve_context", "generate_answer", "sources_from_chunks"]
+__all__ = ["retrieve_context", "retrieve_context_many", "generate_answer", "sources_from_chunks"]
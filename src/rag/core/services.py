@@ -4,95 +4,189 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial
 
 from fastapi import HTTPException, status
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception, RetryError
 
 from src.rag.api.models import SourceAttribution
+from src.rag.circuit_breaker import CircuitOpenError
 from src.rag.config import Settings
+from src.rag.lexical import LexicalIndex, reciprocal_rank_fusion
 from src.rag.openai_client import OpenAIClient
-from src.rag.vector_store import VectorStore, RetrievedChunk
+from src.rag.retry import DeadlineExceeded
+from src.rag.search_executor import get_search_executor
+from src.rag.vector_store import VectorStore, RetrievedChunk, merge_results
 
 logger = logging.getLogger(__name__)
 
-# Retry/backoff configuration
-_MAX_RETRIES = 5
-_WAIT = wait_exponential(multiplier=1, min=1, max=30)  # exponential backoff with cap
+# Retries happen once, inside OpenAIClient (bounded attempts, request deadline,
+# retry budget); wrapping the calls again here would multiply them.
 
+# metadata["retrieval"] of chunks served by BM25 because vector retrieval was too slow or failed
+LEXICAL_FALLBACK = "lexical_fallback"
 
-def _should_retry(exc: Exception) -> bool:
-    """Return True if exception appears transient (429 or 5xx-like or network timeouts)."""
-    # If the exception has an HTTP-like status attribute
-    status_attr = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+
+# Async helpers awaited by the routes and agent tools
+async def _vector_retrieval(vector_store: VectorStore, question: str, client: OpenAIClient, top_k: int, patient_id: str | None) -> list[RetrievedChunk]:
     try:
-        if status_attr is not None:
-            code = int(status_attr)
-            if code == 429 or 500 <= code < 600:
-                return True
+        return await vector_store.asimilarity_search_text(question, client=client, top_k=top_k, patient_id=patient_id)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Context retrieval timed out") from e
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Context retrieval temporarily unavailable") from e
+    except Exception as e:
+        logger.exception("Error during context retrieval")
+        # Sanitize for client
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Context retrieval failed") from e
+
+
+async def _lexical_retrieval(lexical_index: LexicalIndex, question: str, top_k: int, patient_id: str | None) -> list[RetrievedChunk]:
+    """BM25 search; an unusable index yields no results rather than an error."""
+    try:
+        return await get_search_executor().run(partial(lexical_index.search, question, top_k=top_k, patient_id=patient_id))
     except Exception:
-        # ignore conversion errors and fall back to message-based checks
-        pass
-
-    msg = str(exc).lower()
-    if "rate limit" in msg or "too many requests" in msg or "429" in msg:
-        return True
-    if "server error" in msg or "internal" in msg or "temporar" in msg:
-        return True
-
-    # Common transient network errors - treat as retryable
-    if isinstance(exc, TimeoutError):
-        return True
-
-    return False
-
-
-# Synchronous wrappers with tenacity (called from threads)
-@retry(
-    reraise=True,
-    stop=stop_after_attempt(_MAX_RETRIES),
-    wait=_WAIT,
-    retry=retry_if_exception(_should_retry),
-)
-def _retrieve_context_sync(vector_store: VectorStore, question: str, client: OpenAIClient, top_k: int, patient_id: str | None = None):
-    """Synchronous retrieval call wrapped with retries. Intended to be run in a thread."""
-    return vector_store.similarity_search_text(question, client=client, top_k=top_k, patient_id=patient_id)
-
-
-@retry(
-    reraise=True,
-    stop=stop_after_attempt(_MAX_RETRIES),
-    wait=_WAIT,
-    retry=retry_if_exception(_should_retry),
-)
-def _generate_answer_sync(openai_client: OpenAIClient, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: float):
-    """Synchronous generation call wrapped with retries. Intended to be run in a thread."""
-    return openai_client.generate_answer(
-        instructions=instructions,
-        prompt=prompt,
-        model=model,
-        max_output_tokens=max_output_tokens,
-        temperature=temperature,
-    )
+        logger.exception("Error during lexical retrieval")
+        return []
+
+
+async def _lexical_retrieval_many(lexical_index: LexicalIndex, questions: list[str], top_k: int, patient_id: str | None) -> list[list[RetrievedChunk]]:
+    return list(await asyncio.gather(*(_lexical_retrieval(lexical_index, question, top_k, patient_id) for question in questions)))
 
 
-# Async helpers calling the sync wrappers via threads
-async def retrieve_context(*, question: str, patient_id: str | None = None, openai_client: OpenAIClient, vector_store: VectorStore, top_k: int) -> list[RetrievedChunk]:
-    """Retrieve relevant document chunks for the question (with retries for transient failures)."""
+async def _vector_retrieval_many(vector_store: VectorStore, questions: list[str], client: OpenAIClient, top_k: int, patient_id: str | None) -> list[list[RetrievedChunk]]:
     try:
-        chunks = await asyncio.to_thread(_retrieve_context_sync, vector_store, question, openai_client, top_k, patient_id)
-        return chunks
-    except RetryError as re:
-        logger.error("Retries exhausted during retrieval: %s", re)
-        # Do not expose internal exception text to the client
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Context retrieval failed after retries")
+        return await vector_store.asimilarity_search_texts(questions, client=client, top_k=top_k, patient_id=patient_id)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Context retrieval timed out") from e
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Context retrieval temporarily unavailable") from e
     except Exception as e:
         logger.exception("Error during context retrieval")
-        # Sanitize for client
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Context retrieval failed") from e
 
 
-async def generate_answer(*, question: str, chunks: list[RetrievedChunk], openai_client: OpenAIClient, settings: Settings) -> str:
-    """Generate an answer given the question and retrieved chunks (with retries for transient failures)."""
+# Applies settings.retrieval_mode and the opt-in BM25 fallback (see retrieve_context) to
+# each of `questions`; `vector_retrieval` returns one vector result list per question
+async def _retrieve_by_mode(
+    vector_retrieval: Callable[[], Awaitable[list[list[RetrievedChunk]]]],
+    *,
+    questions: list[str],
+    patient_id: str | None,
+    top_k: int,
+    lexical_index: LexicalIndex,
+    settings: Settings | None,
+) -> list[list[RetrievedChunk]]:
+    mode = settings.retrieval_mode if settings is not None else "vector"
+    if mode == "lexical":
+        return await _lexical_retrieval_many(lexical_index, questions, top_k, patient_id)
+
+    fallback_timeout = settings.retrieval_embed_timeout if settings is not None else 0.0
+    # In hybrid mode BM25 runs while the queries are being embedded
+    lexical_task = asyncio.create_task(_lexical_retrieval_many(lexical_index, questions, top_k, patient_id)) if mode == "hybrid" else None
+    try:
+        vector = vector_retrieval()
+        results = await (asyncio.wait_for(vector, fallback_timeout) if fallback_timeout > 0 else vector)
+    except (asyncio.TimeoutError, HTTPException) as exc:
+        if fallback_timeout <= 0:
+            if lexical_task is not None:
+                lexical_task.cancel()
+            raise
+        fallback = await (lexical_task or _lexical_retrieval_many(lexical_index, questions, top_k, patient_id))
+        if not any(fallback):
+            if isinstance(exc, HTTPException):
+                raise
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Context retrieval timed out") from exc
+        logger.warning(
+            "Vector retrieval %s for patient %s; answering from the lexical index",
+            "timed out" if isinstance(exc, asyncio.TimeoutError) else "failed",
+            patient_id,
+        )
+        return [[_mark_fallback(chunk) for chunk in chunks] for chunks in fallback]
+
+    if lexical_task is None:
+        return results
+    rrf_k = settings.rrf_k if settings is not None else 60
+    return [reciprocal_rank_fusion([chunks, lexical], top_k=top_k, k=rrf_k) for chunks, lexical in zip(results, await lexical_task)]
+
+
+async def retrieve_context(
+    *,
+    question: str,
+    patient_id: str | None = None,
+    openai_client: OpenAIClient,
+    vector_store: VectorStore,
+    top_k: int,
+    lexical_index: LexicalIndex | None = None,
+    settings: Settings | None = None,
+) -> list[RetrievedChunk]:
+    """Retrieve relevant document chunks for the question.
+
+    With a lexical index, `settings.retrieval_mode` selects "vector", "hybrid"
+    (vector and BM25 results fused by reciprocal rank) or "lexical" (BM25 only,
+    no embedding call). With `settings.retrieval_embed_timeout` > 0 (opt-in), a
+    vector search that fails or outlasts it falls back to BM25 results, marked
+    with metadata["retrieval"] == LEXICAL_FALLBACK; otherwise vector errors are raised.
+    """
+    if lexical_index is None:
+        return await _vector_retrieval(vector_store, question, openai_client, top_k, patient_id)
+
+    async def vector_retrieval() -> list[list[RetrievedChunk]]:
+        return [await _vector_retrieval(vector_store, question, openai_client, top_k, patient_id)]
+
+    results = await _retrieve_by_mode(
+        vector_retrieval, questions=[question], patient_id=patient_id, top_k=top_k, lexical_index=lexical_index, settings=settings
+    )
+    return results[0]
+
+
+def _mark_fallback(chunk: RetrievedChunk) -> RetrievedChunk:
+    metadata = dict(chunk.metadata)
+    metadata["retrieval"] = LEXICAL_FALLBACK
+    return RetrievedChunk(chunk_id=chunk.chunk_id, content=chunk.content, score=chunk.score, metadata=metadata)
+
+
+def served_from_fallback(chunks: list[RetrievedChunk]) -> bool:
+    """Whether `chunks` came from the BM25 fallback rather than the requested retrieval mode."""
+    return any(chunk.metadata.get("retrieval") == LEXICAL_FALLBACK for chunk in chunks)
+
+
+async def retrieve_context_many(
+    *,
+    questions: list[str],
+    patient_id: str | None = None,
+    openai_client: OpenAIClient,
+    vector_store: VectorStore,
+    top_k: int,
+    merge: bool = True,
+    max_chunks: int | None = None,
+    lexical_index: LexicalIndex | None = None,
+    settings: Settings | None = None,
+) -> list[RetrievedChunk] | list[list[RetrievedChunk]]:
+    """Retrieve context for several sub-queries in a single round trip.
+
+    The vector search embeds all questions in one call; with a lexical index,
+    `settings.retrieval_mode` and the fallback apply to each question as in
+    retrieve_context. Returns one result list per question, or (with `merge`) a
+    single list de-duplicated by chunk id, best score first, capped at `max_chunks`.
+    """
+    if lexical_index is None:
+        results = await _vector_retrieval_many(vector_store, questions, openai_client, top_k, patient_id)
+    else:
+        results = await _retrieve_by_mode(
+            partial(_vector_retrieval_many, vector_store, questions, openai_client, top_k, patient_id),
+            questions=questions,
+            patient_id=patient_id,
+            top_k=top_k,
+            lexical_index=lexical_index,
+            settings=settings,
+        )
+    if merge:
+        return merge_results(results, top_k=max_chunks)
+    return results
+
+
+def _build_prompt(question: str, chunks: list[RetrievedChunk]) -> str:
     if not chunks:
         context_prompt = "No context passages were retrieved. Answer conservatively."
     else:
@@ -108,29 +202,31 @@ async def generate_answer(*, question: str, chunks: list[RetrievedChunk], openai
             )
         context_prompt = "\n\n".join(formatted_chunks)
 
-    prompt = (
+    return (
         "Context passages:\n"
         f"{context_prompt}\n\n"
         f"Question: {question}\n"
         "Respond with a factual answer that cites chunk identifiers in parentheses."
     )
 
+
+async def generate_answer(*, question: str, chunks: list[RetrievedChunk], openai_client: OpenAIClient, settings: Settings) -> str:
+    """Generate an answer given the question and retrieved chunks."""
     try:
-        answer_text = await asyncio.to_thread(
-            _generate_answer_sync,
-            openai_client,
-            settings.response_instructions,
-            prompt,
-            settings.response_model,
-            settings.response_max_tokens,
-            settings.response_temperature,
+        answer_text = await openai_client.agenerate_answer(
+            instructions=settings.response_instructions,
+            prompt=_build_prompt(question, chunks),
+            model=settings.response_model,
+            max_output_tokens=settings.response_max_tokens,
+            temperature=settings.response_temperature,
         )
         if not answer_text:
             raise RuntimeError("Empty response from OpenAI")
         return answer_text.strip()
-    except RetryError as re:
-        logger.error("Retries exhausted during generation: %s", re)
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Generation failed after retries")
+    except DeadlineExceeded as exc:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Generation timed out") from exc
+    except CircuitOpenError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Generation temporarily unavailable") from exc
     except HTTPException:
         # propagate HTTPException unchanged
         raise
@@ -140,6 +236,30 @@ async def generate_answer(*, question: str, chunks: list[RetrievedChunk], openai
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Generation failed") from exc
 
 
+async def stream_answer(*, question: str, chunks: list[RetrievedChunk], openai_client: OpenAIClient, settings: Settings) -> AsyncIterator[str]:
+    """Yield the answer as text deltas while the model generates it.
+
+    Only opening the stream is retried (inside the client); once text has been
+    sent a failure surfaces as a 502 instead of a replayed answer.
+    """
+    try:
+        async for delta in openai_client.generate_answer_stream(
+            instructions=settings.response_instructions,
+            prompt=_build_prompt(question, chunks),
+            model=settings.response_model,
+            max_output_tokens=settings.response_max_tokens,
+            temperature=settings.response_temperature,
+        ):
+            yield delta
+    except DeadlineExceeded as exc:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Generation timed out") from exc
+    except CircuitOpenError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Generation temporarily unavailable") from exc
+    except Exception as exc:
+        logger.exception("Streaming generation failed")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Generation failed") from exc
+
+
 def sources_from_chunks(chunks: list[RetrievedChunk]) -> list[SourceAttribution]:
     """Convert retrieved chunks to source attributions."""
     sources: list[SourceAttribution] = []
@@ -0,0 +1,114 @@
+""" MinHash/LSH near-duplicate detection for chunks, scoped per patient. """
+
+from __future__ import annotations
+
+from collections import defaultdict
+import hashlib
+import re
+
+import numpy as np
+
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _shingles(text: str, size: int) -> set[int]:
+    """Hashed word `size`-grams of the lowercased text."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[index : index + size]) for index in range(len(words) - size + 1)]
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little")
+        for gram in grams
+    }
+
+
+def _lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """(bands, rows) whose S-curve inflection (1/b)^(1/r) is closest to `threshold`."""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """Finds chunks whose estimated Jaccard similarity meets `threshold`.
+
+    Each patient has its own LSH buckets, so documents are only ever compared
+    with other documents of the same patient.
+    """
+
+    def __init__(self, *, threshold: float, num_perm: int = 64, shingle_size: int = 3, seed: int = 1) -> None:
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self._threshold = threshold
+        self._shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._bands, self._rows = _lsh_bands(num_perm, threshold)
+        # patient_id -> (band, band bytes) -> chunk ids
+        self._buckets: dict[str, dict[tuple[int, bytes], list[str]]] = defaultdict(lambda: defaultdict(list))
+        self._signatures: dict[str, np.ndarray] = {}
+
+    def _signature(self, text: str) -> np.ndarray | None:
+        shingles = self._shingles_array(text)
+        if shingles is None:
+            return None
+        # (num_perm, n_shingles) universal hashes; a, b, x < 2^31 so int64 can't overflow
+        hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _shingles_array(self, text: str) -> np.ndarray | None:
+        shingles = _shingles(text, self._shingle_size)
+        if not shingles:
+            return None
+        return np.fromiter(shingles, dtype=np.int64, count=len(shingles)) % _MERSENNE_PRIME
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        return [
+            (band, signature[band * self._rows : (band + 1) * self._rows].tobytes())
+            for band in range(self._bands)
+        ]
+
+    def add(self, patient_id: str, chunk_id: str, text: str) -> None:
+        """Register a chunk as canonical without checking it."""
+        signature = self._signature(text)
+        if signature is not None:
+            self._insert(patient_id, chunk_id, signature)
+
+    def find_or_add(self, patient_id: str, chunk_id: str, text: str) -> str | None:
+        """Return the id of an earlier near-duplicate chunk, or register this one and return None."""
+        signature = self._signature(text)
+        if signature is None:
+            return None
+
+        buckets = self._buckets[patient_id]
+        checked: set[str] = set()
+        for key in self._band_keys(signature):
+            for candidate in buckets.get(key, ()):
+                if candidate in checked or candidate == chunk_id:
+                    continue
+                checked.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self._threshold:
+                    return candidate
+
+        self._insert(patient_id, chunk_id, signature)
+        return None
+
+    def _insert(self, patient_id: str, chunk_id: str, signature: np.ndarray) -> None:
+        self._signatures[chunk_id] = signature
+        buckets = self._buckets[patient_id]
+        for key in self._band_keys(signature):
+            buckets[key].append(chunk_id)
@@ -0,0 +1,140 @@
+""" Coalesces concurrent single-text embedding calls into batched requests. """
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets; larger batches land in "inf"
+_HISTOGRAM_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+@dataclass
+class _Batch:
+    loop: asyncio.AbstractEventLoop
+    waiters: dict[str, list[asyncio.Future]] = field(default_factory=dict)
+    timer: asyncio.TimerHandle | None = None
+
+
+class EmbedBatcher:
+    """Collects texts submitted within `window` seconds and embeds them with one call.
+
+    The first text of a batch starts the window; the batch is sent when the
+    window closes or once it holds `max_batch` distinct texts, whichever comes
+    first. Every caller gets its own vector back (or the batch's exception).
+    A caller that is cancelled while waiting does not cancel the batch.
+
+    When a batch of several texts fails with one of `split_on` (errors caused
+    by the input, such as a text over the token limit), each text is retried
+    alone so one bad query doesn't fail its neighbours.
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[Sequence[str]], Awaitable[list[list[float]]]],
+        *,
+        window: float,
+        max_batch: int,
+        split_on: tuple[type[Exception], ...] = (),
+    ) -> None:
+        self._embed_many = embed_many
+        self._split_on = split_on
+        self._window = max(0.0, window)
+        self._max_batch = max(1, max_batch)
+        # One open batch per event loop; futures can't cross loops
+        self._open: dict[asyncio.AbstractEventLoop, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._histogram = dict.fromkeys([str(bound) for bound in _HISTOGRAM_BOUNDS] + ["inf"], 0)
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+        self._failed_batches = 0
+        self._max_seen = 0
+
+    async def embed(self, text: str) -> list[float]:
+        """Embed one text as part of the next batch."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        batch = self._open.get(loop)
+        if batch is None:
+            batch = self._open[loop] = _Batch(loop=loop)
+            batch.timer = loop.call_later(self._window, self._flush, batch)
+        batch.waiters.setdefault(text, []).append(future)
+        if len(batch.waiters) >= self._max_batch:
+            self._flush(batch)
+        return await future
+
+    def _flush(self, batch: _Batch) -> None:
+        if self._open.get(batch.loop) is not batch:
+            return  # already sent
+        del self._open[batch.loop]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = batch.loop.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        texts = list(batch.waiters)
+        self._record(len(texts), sum(len(futures) for futures in batch.waiters.values()))
+        try:
+            vectors = await self._embed_many(texts)
+        except BaseException as exc:
+            with self._lock:
+                self._failed_batches += 1
+            if len(texts) > 1 and isinstance(exc, self._split_on):
+                await asyncio.gather(*(self._send_one(text, batch.waiters[text]) for text in texts))
+                return
+            for text in texts:
+                self._resolve(batch.waiters[text], error=exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for text, vector in zip(texts, vectors):
+            self._resolve(batch.waiters[text], result=vector)
+
+    async def _send_one(self, text: str, futures: list[asyncio.Future]) -> None:
+        try:
+            vectors = await self._embed_many([text])
+        except Exception as exc:
+            self._resolve(futures, error=exc)
+        else:
+            self._resolve(futures, result=vectors[0])
+
+    @staticmethod
+    def _resolve(futures: list[asyncio.Future], *, result: list[float] | None = None, error: BaseException | None = None) -> None:
+        for future in futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _record(self, size: int, requests: int) -> None:
+        bucket = next((str(bound) for bound in _HISTOGRAM_BOUNDS if size <= bound), "inf")
+        with self._lock:
+            self._histogram[bucket] += 1
+            self._batches += 1
+            self._requests += requests
+            self._texts += size
+            self._max_seen = max(self._max_seen, size)
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "window_ms": round(self._window * 1000, 3),
+                "max_batch": self._max_batch,
+                "requests": self._requests,
+                "batches": self._batches,
+                "failed_batches": self._failed_batches,
+                "avg_batch_size": round(self._texts / self._batches, 3) if self._batches else 0.0,
+                "max_batch_seen": self._max_seen,
+                "batch_size_histogram": dict(self._histogram),
+            }
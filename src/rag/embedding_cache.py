@@ -0,0 +1,186 @@
+""" Persistent, content-addressed cache of embedding vectors. """
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Sequence
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+from src.rag.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, dimensions, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+# Cache hits only record last_used in memory; it is written out with the next
+# put, or once this many keys or seconds have piled up
+_TOUCH_FLUSH_SIZE = 1000
+_TOUCH_FLUSH_INTERVAL = 30.0
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache keyed by (model, dimensions, sha256(text)).
+
+    Vectors are stored as packed float32. When the cache grows past `max_entries`
+    the least recently used rows are evicted. Hits don't write on every lookup:
+    their last_used times are batched and flushed before any eviction. Safe to
+    share between threads, and between processes on one host (WAL mode).
+    """
+
+    def __init__(self, path: Path, *, max_entries: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # (model, dimensions, text_hash) -> last hit, not yet written
+        self._touched: dict[tuple[str, int, str], float] = {}
+        self._flushed_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, model: str, dimensions: int, texts: Sequence[str]) -> list[list[float] | None]:
+        """Return cached vectors aligned with `texts`; None where missing."""
+        if not texts:
+            return []
+        hashes = [text_hash(text) for text in texts]
+        found: dict[str, list[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                part = unique[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    (model, dimensions, *part),
+                ).fetchall()
+                for hash_value, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[hash_value] = vector.tolist()
+
+            if found:
+                now = time.time()
+                for hash_value in found:
+                    self._touched[(model, dimensions, hash_value)] = now
+                if len(self._touched) >= _TOUCH_FLUSH_SIZE or time.monotonic() - self._flushed_at >= _TOUCH_FLUSH_INTERVAL:
+                    self._flush_touched()
+                    self._conn.commit()
+
+            results = [found.get(hash_value) for hash_value in hashes]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: int,
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ) -> None:
+        """Store vectors for `texts`, evicting old rows when over capacity."""
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (model, dimensions, text_hash(text), array("f", embedding).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._entries += self._conn.total_changes - before
+            self._flush_touched()
+            if self._entries > self._max_entries:
+                self._evict()
+            self._conn.commit()
+
+    # Caller holds the lock and commits. MAX keeps a newer put's timestamp.
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                [(used, model, dimensions, hash_value) for (model, dimensions, hash_value), used in self._touched.items()],
+            )
+            self._touched = {}
+        self._flushed_at = time.monotonic()
+
+    # Drops the least recently used rows, leaving ~10% headroom so eviction
+    # doesn't run on every insert once the cache is full.
+    def _evict(self) -> None:
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._entries <= self._max_entries:
+            return
+        overflow = self._entries - int(self._max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE (model, dimensions, text_hash) IN "
+            "(SELECT model, dimensions, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (overflow,),
+        )
+        self._entries -= overflow
+        self.evictions += overflow
+        logger.debug("Evicted %s embeddings from cache %s", overflow, self._path)
+
+    def stats(self) -> dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+@lru_cache()
+def get_embedding_cache(settings: Settings | None = None) -> EmbeddingCache | None:
+    """Shared cache for the configured path; None when disabled (max entries <= 0)."""
+    active_settings = settings or get_settings()
+    if active_settings.embed_cache_max_entries <= 0:
+        return None
+    return EmbeddingCache(
+        active_settings.embed_cache_path or active_settings.embeddings_path / "embedding_cache.sqlite3",
+        max_entries=active_settings.embed_cache_max_entries,
+    )
@@ -0,0 +1,96 @@
+""" Hedged requests: a second copy of a slow idempotent call, first result wins. """
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """Sends a duplicate of a call that has run longer than the recent
+    `quantile` latency and returns whichever copy finishes first, cancelling the
+    other. At p95 that is roughly 5% extra requests for a much shorter tail.
+
+    Only for idempotent calls. No hedging happens until `min_samples`
+    latencies have been seen, and the delay never drops below `min_delay`.
+    """
+
+    def __init__(self, *, quantile: float = 0.95, min_delay: float = 0.05, min_samples: int = 20, samples: int = 500) -> None:
+        self._quantile = min(0.999, max(0.5, quantile))
+        self._min_delay = min_delay
+        self._min_samples = max(1, min_samples)
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=samples)
+        self._delay: float | None = None
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> float | None:
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        with self._lock:
+            return self._delay
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            if len(self._latencies) >= self._min_samples:
+                ordered = sorted(self._latencies)
+                self._delay = max(self._min_delay, ordered[int(self._quantile * (len(ordered) - 1))])
+
+    async def run(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """Await `operation()`, hedged with a second call when the first is slow."""
+        delay = self.delay()
+        with self._lock:
+            self.calls += 1
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(operation())
+        hedge: asyncio.Future | None = None
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done():
+                result = await primary
+                self._observe(time.perf_counter() - started)
+                return result
+
+            with self._lock:
+                self.hedged += 1
+            hedge = asyncio.ensure_future(operation())
+            pending = {primary, hedge}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None and pending:
+                    continue  # one copy failed; the other may still succeed
+                result = (winner or next(iter(done))).result()  # raises when both copies failed
+                if winner is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                # Latency as the caller saw it, so the delay tracks what hedging delivers
+                self._observe(time.perf_counter() - started)
+                return result
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "quantile": self._quantile,
+                "delay_ms": round(self._delay * 1000, 3) if self._delay is not None else None,
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            }
@@ -0,0 +1,528 @@
+""" Self-contained HNSW vector store (NumPy graph, persisted to disk, no Chroma). """
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Sequence
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+
+from src.rag.numpy_store import _normalize
+from src.rag.quantized_store import _read_text, _replace_text, _prune_versions
+from src.rag.vector_store import (
+    DocumentChunk,
+    RecordBatch,
+    RetrievedChunk,
+    VectorStore,
+    _distance_to_similarity,
+    chunk_metadata,
+    metadata_filter,
+)
+
+logger = logging.getLogger(__name__)
+
+_CURRENT_FILENAME = "CURRENT"
+_RECORDS_FILENAME = "records.json"
+_RELOAD_CHECK_INTERVAL = 1.0  # seconds between checks for a newer persisted version
+_COMPACT_RATIO = 0.2  # persist() rebuilds the graph once this fraction of nodes are removed
+
+
+class HnswIndex:
+    """Hierarchical navigable small world graph over unit vectors (cosine distance).
+
+    Nodes are dense integers in insertion order. Removal is left to the caller
+    (filter the node out of results); removed nodes still route searches.
+    Searches may run while another thread adds nodes: they only follow links to
+    nodes that existed when the layer search started.
+    """
+
+    def __init__(self, *, dimensions: int, m: int = 16, ef_construction: int = 100, seed: int = 1) -> None:
+        self.dimensions = dimensions
+        self.m = max(2, m)
+        self.ef_construction = max(ef_construction, self.m)
+        self._level_mult = 1.0 / math.log(self.m)
+        self._rng = np.random.default_rng(seed)
+        self._size = 0
+        self._vectors = np.zeros((16, dimensions), dtype=np.float32)
+        self._levels = np.zeros(16, dtype=np.int8)
+        # layer -> (capacity, width) neighbour ids, -1 padded; layer 0 holds 2*M links
+        self._links: list[np.ndarray] = [np.full((16, 2 * self.m), -1, dtype=np.int32)]
+        self._entry = -1
+        self._max_level = -1
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: self._size]
+
+    def _width(self, layer: int) -> int:
+        return 2 * self.m if layer == 0 else self.m
+
+    def _ensure_capacity(self, size: int, level: int) -> None:
+        capacity = len(self._vectors)
+        if size > capacity:
+            capacity = max(size, capacity * 2)
+            self._vectors = np.resize(self._vectors, (capacity, self.dimensions))
+            self._levels = np.resize(self._levels, capacity)
+            for layer, links in enumerate(self._links):
+                grown = np.full((capacity, self._width(layer)), -1, dtype=np.int32)
+                grown[: len(links)] = links
+                self._links[layer] = grown
+        while len(self._links) <= level:
+            self._links.append(np.full((len(self._vectors), self.m), -1, dtype=np.int32))
+
+    def _neighbours(self, node: int, layer: int) -> np.ndarray:
+        links = self._links[layer][node]
+        return links[links >= 0]
+
+    def _distances(self, query: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        return 1.0 - self._vectors[nodes] @ query
+
+    def add(self, vector: np.ndarray) -> int:
+        """Insert a unit vector; returns its node id."""
+        node = self._size
+        level = min(int(-math.log(1.0 - self._rng.random()) * self._level_mult), 127)
+        self._ensure_capacity(node + 1, level)
+        self._vectors[node] = vector
+        self._levels[node] = level
+        self._size += 1
+
+        if self._entry < 0:
+            self._entry, self._max_level = node, level
+            return node
+
+        entry = self._entry
+        for layer in range(self._max_level, level, -1):
+            entry = self._search_layer(vector, [entry], 1, layer)[0][1]
+
+        for layer in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(vector, [entry], self.ef_construction, layer)
+            selected = self._select(vector, found, self._width(layer))
+            self._links[layer][node, : len(selected)] = selected
+            for neighbour in selected:
+                self._connect(neighbour, node, layer)
+            entry = found[0][1]
+
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+        return node
+
+    # Adds `node` to `neighbour`'s links, re-selecting them when the row is full
+    def _connect(self, neighbour: int, node: int, layer: int) -> None:
+        row = self._links[layer][neighbour]
+        free = np.flatnonzero(row < 0)
+        if len(free):
+            row[free[0]] = node
+            return
+        candidates = np.append(row, node)
+        distances = self._distances(self._vectors[neighbour], candidates)
+        ordered = sorted(zip(distances.tolist(), candidates.tolist()))
+        selected = self._select(self._vectors[neighbour], ordered, len(row))
+        row[:] = -1
+        row[: len(selected)] = selected
+
+    # Neighbour selection heuristic (Malkov & Yashunin, alg. 4): keep a candidate
+    # only if it is closer to the base than to every neighbour kept so far.
+    def _select(self, base: np.ndarray, candidates: list[tuple[float, int]], limit: int) -> list[int]:
+        selected: list[int] = []
+        for distance, candidate in candidates:
+            if len(selected) >= limit:
+                break
+            if selected:
+                to_selected = 1.0 - self._vectors[selected] @ self._vectors[candidate]
+                if np.any(to_selected < distance):
+                    continue
+            selected.append(candidate)
+        return selected
+
+    # Best-first search of one layer; returns up to `ef` (distance, node) pairs, closest first.
+    # With `allowed`, only nodes where allowed[node] is True are returned, but all nodes route.
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entries: list[int],
+        ef: int,
+        layer: int,
+        allowed: np.ndarray | None = None,
+    ) -> list[tuple[float, int]]:
+        visited = np.zeros(self._size, dtype=bool)
+        size = len(visited)
+        visited[entries] = True
+        entry_distances = self._distances(query, np.asarray(entries))
+        candidates = [(float(distance), node) for distance, node in zip(entry_distances, entries)]
+        heapq.heapify(candidates)
+        results: list[tuple[float, int]] = []  # max-heap via negated distance
+        for distance, node in candidates:
+            if _is_allowed(allowed, node):
+                heapq.heappush(results, (-distance, node))
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if len(results) >= ef and distance > -results[0][0]:
+                break
+            neighbours = self._neighbours(node, layer)
+            neighbours = neighbours[neighbours < size]
+            neighbours = neighbours[~visited[neighbours]]
+            if not len(neighbours):
+                continue
+            visited[neighbours] = True
+            for neighbour_distance, neighbour in zip(self._distances(query, neighbours).tolist(), neighbours.tolist()):
+                if len(results) < ef or neighbour_distance < -results[0][0]:
+                    heapq.heappush(candidates, (neighbour_distance, neighbour))
+                    if _is_allowed(allowed, neighbour):
+                        heapq.heappush(results, (-neighbour_distance, neighbour))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+
+        return sorted((-negated, node) for negated, node in results)
+
+    def search(self, query: np.ndarray, k: int, *, ef: int, allowed: np.ndarray | None = None) -> list[tuple[float, int]]:
+        """Approximate k nearest (cosine distance, node) pairs, closest first."""
+        if self._entry < 0 or k <= 0:
+            return []
+        entry = self._entry
+        for layer in range(self._max_level, 0, -1):
+            entry = self._search_layer(query, [entry], 1, layer)[0][1]
+        return self._search_layer(query, [entry], max(ef, k), 0, allowed)[:k]
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "vectors.npy", self._vectors[: self._size])
+        np.save(directory / "levels.npy", self._levels[: self._size])
+        for layer, links in enumerate(self._links):
+            np.save(directory / f"links_{layer}.npy", links[: self._size])
+        (directory / "graph.json").write_text(
+            json.dumps(
+                {
+                    "dimensions": self.dimensions,
+                    "m": self.m,
+                    "ef_construction": self.ef_construction,
+                    "layers": len(self._links),
+                    "entry": self._entry,
+                    "max_level": self._max_level,
+                }
+            ),
+            encoding="utf-8",
+        )
+
+    @classmethod
+    def load(cls, directory: Path) -> HnswIndex:
+        meta = json.loads((directory / "graph.json").read_text(encoding="utf-8"))
+        index = cls(dimensions=meta["dimensions"], m=meta["m"], ef_construction=meta["ef_construction"])
+        index._vectors = np.load(directory / "vectors.npy")
+        index._levels = np.load(directory / "levels.npy")
+        index._links = [np.load(directory / f"links_{layer}.npy") for layer in range(meta["layers"])]
+        index._size = len(index._vectors)
+        index._entry = int(meta["entry"])
+        index._max_level = int(meta["max_level"])
+        return index
+
+
+# Nodes added after `allowed` was taken are not allowed
+def _is_allowed(allowed: np.ndarray | None, node: int) -> bool:
+    return allowed is None or (node < len(allowed) and bool(allowed[node]))
+
+
+class HnswVectorStore(VectorStore):
+    """VectorStore backed by an in-process HNSW graph, with documents and metadata kept alongside.
+
+    State lives in memory and is written to `directory` by `persist()` as an
+    immutable version behind a CURRENT pointer; other processes reload the newer
+    version on their next query. Meant for one writer (the ingest job) at a time.
+
+    Deleted and replaced chunks stay in the graph as tombstones (their text is
+    dropped); once more than `compact_ratio` of the nodes are tombstones,
+    `persist()` rebuilds the graph from the live chunks.
+
+    Filters are equality matches on metadata. When few chunks match (a single
+    patient usually has a few hundred), they are scored exactly instead of
+    walking the graph. Searches resolve filters under the lock and then score or
+    walk the graph outside it, so concurrent searches don't serialize.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: Path,
+        m: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 64,
+        exact_search_limit: int = 2048,
+        compact_ratio: float = _COMPACT_RATIO,
+    ) -> None:
+        self._directory = directory
+        self._compact_ratio = compact_ratio
+        self._m = m
+        self._ef_construction = ef_construction
+        self._ef_search = ef_search
+        self._exact_search_limit = exact_search_limit
+        self._lock = threading.RLock()
+        self._checked_at = 0.0
+        self._reset()
+        self._load_current()
+
+    def _reset(self) -> None:
+        self._version = ""
+        self._dirty = False
+        self._index: HnswIndex | None = None
+        self._ids: list[str] = []
+        self._documents: list[str] = []
+        self._metadatas: list[dict[str, object]] = []
+        self._live = np.zeros(0, dtype=bool)
+        self._node_of: dict[str, int] = {}
+        # (metadata key, value) -> live nodes with that value
+        self._postings: dict[tuple[str, object], set[int]] = {}
+
+    def _load_current(self) -> None:
+        try:
+            version = (self._directory / _CURRENT_FILENAME).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return
+        if version == self._version:
+            return
+        started = time.perf_counter()
+        version_directory = self._directory / version
+        records = json.loads((version_directory / _RECORDS_FILENAME).read_text(encoding="utf-8"))
+        self._reset()
+        self._version = version
+        self._index = HnswIndex.load(version_directory)
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._live = np.ones(len(self._ids), dtype=bool)
+        self._live[records["removed"]] = False
+        for node in np.flatnonzero(self._live).tolist():
+            self._node_of[self._ids[node]] = node
+            self._index_metadata(node)
+        logger.info("Loaded HNSW index %s (%s live vectors) in %.2fs", version, len(self._node_of), time.perf_counter() - started)
+
+    # Picks up a version persisted by another process, unless we hold unsaved writes
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self._dirty or now - self._checked_at < _RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        self._load_current()
+
+    def _index_metadata(self, node: int) -> None:
+        for key, value in self._metadatas[node].items():
+            if isinstance(value, (str, int, float, bool)):
+                self._postings.setdefault((key, value), set()).add(node)
+
+    def _remove(self, node: int) -> None:
+        self._live[node] = False
+        del self._node_of[self._ids[node]]
+        for key, value in self._metadatas[node].items():
+            nodes = self._postings.get((key, value))
+            if nodes is not None:
+                nodes.discard(node)
+        # Only the vector is still needed, for routing
+        self._documents[node] = ""
+        self._metadatas[node] = {}
+
+    # Rebuilds the graph from the live nodes so tombstones stop costing memory,
+    # disk and search time. Lists are replaced, not mutated, so iter_records
+    # callers holding the old ones are unaffected.
+    def _compact(self) -> None:
+        assert self._index is not None
+        started = time.perf_counter()
+        old_index, old_ids, old_documents, old_metadatas = self._index, self._ids, self._documents, self._metadatas
+        live = np.flatnonzero(self._live[: len(old_ids)]).tolist()
+        self._index = HnswIndex(dimensions=old_index.dimensions, m=old_index.m, ef_construction=old_index.ef_construction)
+        self._ids = [old_ids[node] for node in live]
+        self._documents = [old_documents[node] for node in live]
+        self._metadatas = [old_metadatas[node] for node in live]
+        self._live = np.ones(len(live), dtype=bool)
+        self._node_of = {}
+        self._postings = {}
+        for node, old_node in enumerate(live):
+            self._index.add(old_index.vectors[old_node])
+            self._node_of[self._ids[node]] = node
+            self._index_metadata(node)
+        logger.info(
+            "Compacted HNSW index: dropped %s removed nodes, %s live, in %.2fs",
+            len(old_ids) - len(live),
+            len(live),
+            time.perf_counter() - started,
+        )
+
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        if not chunks:
+            return
+        if len(chunks) != len(embeddings):
+            raise ValueError("Chunks and embeddings must have equal length")
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._maybe_reload()
+            if self._index is None:
+                self._index = HnswIndex(dimensions=vectors.shape[1], m=self._m, ef_construction=self._ef_construction)
+            elif vectors.shape[1] != self._index.dimensions:
+                raise ValueError(f"Expected {self._index.dimensions}-dimensional embeddings, got {vectors.shape[1]}")
+
+            # Updated chunks get a fresh node; the old one stays in the graph only for routing
+            for chunk, vector in zip(chunks, vectors):
+                previous = self._node_of.get(chunk.chunk_id)
+                if previous is not None:
+                    self._remove(previous)
+                node = self._index.add(vector)
+                self._ids.append(chunk.chunk_id)
+                self._documents.append(chunk.content)
+                self._metadatas.append(chunk_metadata(chunk))
+                if node >= len(self._live):
+                    grown = np.zeros(max(node + 1, 2 * len(self._live)), dtype=bool)
+                    grown[: len(self._live)] = self._live
+                    self._live = grown
+                self._live[node] = True
+                self._node_of[chunk.chunk_id] = node
+                self._index_metadata(node)
+            self._dirty = True
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._maybe_reload()
+            for chunk_id in chunk_ids:
+                node = self._node_of.get(chunk_id)
+                if node is not None:
+                    self._remove(node)
+                    self._dirty = True
+
+    def clear(self) -> None:
+        """Forget every chunk; the next persisted version starts from an empty graph."""
+        with self._lock:
+            self._reset()
+            (self._directory / _CURRENT_FILENAME).unlink(missing_ok=True)
+
+    def persist(self) -> None:
+        """Write the current state as a new version and point CURRENT at it."""
+        with self._lock:
+            if not self._dirty or self._index is None:
+                return
+            if self._ids and len(self._ids) - len(self._node_of) > self._compact_ratio * len(self._ids):
+                self._compact()
+            started = time.perf_counter()
+            version = f"v{time.time_ns()}"
+            previous = _read_text(self._directory / _CURRENT_FILENAME)
+            version_directory = self._directory / version
+            self._index.save(version_directory)
+            (version_directory / _RECORDS_FILENAME).write_text(
+                json.dumps(
+                    {
+                        "ids": self._ids,
+                        "documents": self._documents,
+                        "metadatas": self._metadatas,
+                        "removed": np.flatnonzero(~self._live[: len(self._ids)]).tolist(),
+                    }
+                ),
+                encoding="utf-8",
+            )
+            _replace_text(self._directory / _CURRENT_FILENAME, version)
+            _prune_versions(self._directory, keep={version, previous})
+            self._version = version
+            self._dirty = False
+            logger.info("Persisted HNSW index (%s live vectors) in %.2fs", len(self._node_of), time.perf_counter() - started)
+
+    def iter_records(self, *, batch_size: int = 5000) -> Iterator[RecordBatch]:
+        with self._lock:
+            self._maybe_reload()
+            index = self._index
+            nodes = sorted(self._node_of.values())
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+        if index is None:
+            return
+        for start in range(0, len(nodes), batch_size):
+            batch = nodes[start : start + batch_size]
+            yield (
+                [ids[node] for node in batch],
+                np.array(index.vectors[batch], dtype=np.float32),
+                [documents[node] for node in batch],
+                [dict(metadatas[node]) for node in batch],
+            )
+
+    # Live nodes matching every equality filter; None means "all live nodes"
+    def _matching(self, filters: Mapping[str, object] | None) -> set[int] | None:
+        if not filters:
+            return None
+        matching: set[int] | None = None
+        for key, value in filters.items():
+            nodes = self._postings.get((key, value), set())
+            matching = set(nodes) if matching is None else matching & nodes
+            if not matching:
+                return set()
+        return matching
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Filtered top-k per query: exact over small match sets, graph search otherwise."""
+        if not embeddings:
+            return []
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._maybe_reload()
+            index = self._index
+            if index is None or top_k <= 0:
+                return [[] for _ in embeddings]
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            matching = self._matching(metadata_filter(patient_id, where))
+            exact = matching is not None and len(matching) <= self._exact_search_limit
+            if exact:
+                nodes = np.fromiter(matching, dtype=np.int64, count=len(matching))
+            elif matching is None:
+                allowed = self._live.copy()
+            else:
+                allowed = np.zeros(len(self._live), dtype=bool)
+                allowed[list(matching)] = True
+
+        # Scoring and the graph walk run unlocked, on the references taken above
+        ranked: list[list[tuple[float, int]]]
+        if exact:
+            ranked = []
+            if len(nodes):
+                distances = 1.0 - queries @ index.vectors[nodes].T
+                for row in distances:
+                    order = np.argsort(row, kind="stable")[:top_k]
+                    ranked.append([(float(row[position]), int(nodes[position])) for position in order])
+            else:
+                ranked = [[] for _ in queries]
+        else:
+            ranked = [index.search(query, top_k, ef=self._ef_search, allowed=allowed) for query in queries]
+
+        results: list[list[RetrievedChunk]] = []
+        with self._lock:
+            # Chunks removed from this graph meanwhile are dropped; a reload or
+            # compaction swaps in new lists, leaving the ones taken above intact
+            current = self._index is index
+            for hits in ranked:
+                retrieved: list[RetrievedChunk] = []
+                for cosine_distance, node in hits:
+                    if current and not self._live[node]:
+                        continue
+                    distance = max(0.0, 2.0 * cosine_distance)  # squared L2 between unit vectors
+                    metadata = dict(metadatas[node])
+                    metadata["distance"] = distance
+                    retrieved.append(
+                        RetrievedChunk(
+                            chunk_id=ids[node],
+                            content=documents[node],
+                            score=_distance_to_similarity(distance),
+                            metadata=metadata,
+                        )
+                    )
+                results.append(retrieved)
+        return results
@@ -1,15 +1,19 @@
 """ Document ingestion module. """
 
-from dataclasses import dataclass, replace
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 
 from openai import OpenAI
 
 import os
 import time
+import queue
 import argparse
+import threading
 
-from typing import Iterator, Sequence
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Sequence, TypeVar
 
 from pptx import Presentation
 from pypdf import PdfReader
@@ -17,9 +21,24 @@ from pypdf import PdfReader
 import math
 import logging
 
+from src.rag.chunking import chunk_spans
 from src.rag.config import Settings, get_settings
-from src.rag.vector_store import DocumentChunk, get_vector_store
-from src.rag.openai_client import OpenAIClient, OpenAIClientConfig
+from src.rag.dedup import NearDuplicateIndex
+from src.rag.lexical import LexicalIndex, get_lexical_index
+from src.rag.manifest import (
+    FileRecord,
+    IngestCheckpoint,
+    IngestManifest,
+    checkpoint_path,
+    hash_file,
+    hash_text,
+    manifest_path,
+)
+from src.rag.vector_store import DocumentChunk, VectorStore, get_vector_store
+from src.rag.openai_client import OpenAIClient, get_openai_client
+from src.rag.profiling import IngestProfiler
+from src.rag.snapshot import export_snapshot, is_current_snapshot
+from src.rag.tokens import EMBED_MAX_INPUT_TOKENS, EMBED_MAX_INPUTS, estimate_tokens, truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
@@ -28,6 +47,8 @@ logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(messag
 SUPPORTED_FILE_TYPES = {".txt", ".md", ".pdf", ".pptx"}
 DEFAULT_EMBED_BATCH_SIZE = get_settings().embed_batch_size or 64
 
+T = TypeVar("T")
+
 # Represents a document that has been loaded from a file
 # with its file path and content. 
 # It's immutable to ensure data integrity.
@@ -37,24 +58,35 @@ class LoadedDocument:
     content: str
 
 
-# Loads all text documents from the specified root directory.
-def load_documents(root: Path) -> list[LoadedDocument]:
-    documents: list[LoadedDocument] = []
+# Lists every supported file under the root directory.
+def discover_files(root: Path) -> list[Path]:
+    files: list[Path] = []
 
     # Check if the root path exists 
     if not root.exists():
         logger.warning(f"Documents Directory {root} does not exist.")
-        # print(f"Documents Directory {root} does not exist.")
-        return documents
-    
-    # Iterate and check if each file is supported or not
-    for file_path in root.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() not in SUPPORTED_FILE_TYPES:
+        return files
+
+    for file_path in sorted(root.rglob('*')):
+        if not file_path.is_file():
+            continue
+        if file_path.suffix.lower() not in SUPPORTED_FILE_TYPES:
             logger.info(f"Skipping unsupported file type: {file_path}")
             continue
+        files.append(file_path)
+    return files
+
+
+# Loads all text documents from the specified root directory,
+# or only the given paths when provided.
+# With workers > 1 files are parsed in a process pool.
+def load_documents(root: Path, paths: Sequence[Path] | None = None, *, workers: int = 1) -> list[LoadedDocument]:
+    documents: list[LoadedDocument] = []
+    file_paths = discover_files(root) if paths is None else paths
+
+    for file_path, text, elapsed in iter_parsed_files(file_paths, workers=workers):
         # print(f"Processing file: {file_path}")
-        logger.info(f"Processing file: {file_path}")
-        text = _read_text(file_path)
+        logger.info(f"Parsed file: {file_path} in {elapsed:.3f}s")
         if text.strip():
             documents.append(LoadedDocument(path=file_path, content=text))
         else:
@@ -63,7 +95,62 @@ def load_documents(root: Path) -> list[LoadedDocument]:
     # print(f"Loaded {len(documents)} documents.")
     logger.info(f"Loaded {len(documents)} documents.")
     return documents
-        
+
+
+# Parses a single file and measures how long extraction took.
+# Module-level so it can be pickled into pool workers.
+def _parse_file(path: Path) -> tuple[str, float]:
+    started = time.perf_counter()
+    text = _read_text(path)
+    return text, time.perf_counter() - started
+
+
+# Yields (path, text, parse_seconds) for each file.
+# With workers > 1 parsing fans out to a process pool; at most `workers * 2` files
+# are in flight so extracted text never piles up faster than it is consumed.
+# Results arrive in completion order unless `ordered` is set.
+def iter_parsed_files(
+    paths: Sequence[Path],
+    *,
+    workers: int = 1,
+    ordered: bool = False,
+) -> Iterator[tuple[Path, str, float]]:
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            text, elapsed = _parse_file(path)
+            yield path, text, elapsed
+        return
+
+    max_in_flight = workers * 2
+    pending_paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: dict[Future, Path] = {}
+        submitted: list[Future] = []  # submission order, only used when ordered
+
+        def _fill() -> None:
+            while len(in_flight) < max_in_flight:
+                path = next(pending_paths, None)
+                if path is None:
+                    return
+                future = executor.submit(_parse_file, path)
+                in_flight[future] = path
+                if ordered:
+                    submitted.append(future)
+
+        _fill()
+        while in_flight:
+            if ordered:
+                future = submitted.pop(0)
+                future.result()
+                done = [future]
+            else:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                text, elapsed = future.result()
+                yield path, text, elapsed
+            _fill()
+
 # Reads the text content from a file at the given path.
 def _read_text(path: Path)->str:
     suffix = path.suffix.lower()
@@ -89,136 +176,697 @@ def _read_text(path: Path)->str:
         logger.error(f"Error reading file {path}: {e}")
     return ""
 
-# Splits the given text into chunks of specified size with overlap.
-def chunk_text(text: str, *, chunk_size: int, chunk_overlap: int) -> list[str]:
-    words = text.split()
-    if not words:
-        return []
-    if chunk_size <= 0:
-        raise ValueError("chunk_size must be greater than 0")
-    if chunk_overlap >= chunk_size:
-        raise ValueError("chunk_overlap must be smaller than chunk_size")
-
-    step = chunk_size - chunk_overlap
-    chunks: list[str] = []
-    for start in range(0, len(words), step):
-        end = min(start + chunk_size, len(words))
-        chunk_words = words[start:end]
-        chunks.append(" ".join(chunk_words))
-        if end == len(words):
-            break
+# Yields the chunks of a single loaded document.
+def iter_document_chunks(doc: LoadedDocument, settings: Settings) -> Iterator[DocumentChunk]:
+    relative = doc.path.relative_to(settings.docs_path)
+    patient_id = relative.parts[0]  # folder Name = patient ID
+    document_id = relative.as_posix()
+    safe_document_id = document_id.replace("/", "__")
+    spans = chunk_spans(
+        doc.content,
+        chunk_size=settings.chunk_size,
+        chunk_overlap=settings.chunk_overlap,
+    )
 
-    # print(chunks)
-    return chunks
+    for index, (start, end) in enumerate(spans):
+        chunk_id = f"{safe_document_id}__chunk_{index}"
+        yield DocumentChunk(
+            chunk_id=chunk_id,
+            document_id=document_id,
+            source_path=str(relative),
+            chunk_index=index,
+            content=doc.content[start:end],
+            patient_id=patient_id,
+            start_offset=start,
+            end_offset=end,
+        )
 
 # Builds document chunks from loaded documents.
 def build_chunks(documents: Sequence[LoadedDocument], settings: Settings) -> list[DocumentChunk]:
-    active_settings = settings 
     chunks: list[DocumentChunk] = []
     for doc in documents:
-        relative = doc.path.relative_to(active_settings.docs_path)
-        patient_id = relative.parts[0]  # folder Name = patient ID
-        document_id = relative.as_posix()
-        safe_document_id = document_id.replace("/", "__")
-        text_chunks = chunk_text(
-            doc.content,
-            chunk_size=active_settings.chunk_size,
-            chunk_overlap=active_settings.chunk_overlap,
-        )
-
-        for index, chunk_content in enumerate(text_chunks):
-            chunk_id = f"{safe_document_id}__chunk_{index}"
-            chunks.append(
-                DocumentChunk(
-                    chunk_id=chunk_id,
-                    document_id=document_id,
-                    source_path=str(relative),
-                    chunk_index=index,
-                    content=chunk_content,
-                    patient_id=patient_id,
-                )
-            )
+        chunks.extend(iter_document_chunks(doc, settings))
     # print(chunks)
     logger.info("Built %d chunks from %d documents", len(chunks), len(documents))
     # print(f"Built {len(chunks)} chunks from {len(documents)} documents")
     return chunks 
-    
-# Yields successive n-sized chunks from iterable.
-def _batched(iterable: Sequence[DocumentChunk], batch_size: int) -> Iterator[Sequence[DocumentChunk]]:
-        for index in range(0, len(iterable), batch_size):
-            yield iterable[index : index + batch_size]
 
-# Main ingestion function
-def ingest_documents(settings: Settings | None = None) -> int:
 
-    active_settings = settings or get_settings()
+_PREFETCH_DONE = object()
+
+# Runs `iterable` in a background thread, buffering at most `maxsize` items.
+# Lets the next files parse while the current batch is being embedded.
+def _prefetch(iterable: Iterable[T], maxsize: int) -> Iterator[T]:
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except BaseException as exc:  # surfaced in the consumer
+            _put(exc)
+            return
+        _put(_PREFETCH_DONE)
+
+    producer = threading.Thread(target=_produce, name="ingest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _PREFETCH_DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+# Counters reported at the end of an ingestion run
+@dataclass
+class IngestStats:
+    skipped: int = 0
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    embedded_chunks: int = 0
+    reused_chunks: int = 0
+    duplicate_chunks: int = 0
+    removed_chunks: int = 0
+
+
+# Files that need (re-)indexing along with their raw content hash.
+# `rechecked` holds unchanged files queued again because a chunk they were
+# folded into as near-duplicates may be going away (key -> current record).
+@dataclass
+class _IngestPlan:
+    pending: dict[Path, str] = field(default_factory=dict)
+    stale_ids: list[str] = field(default_factory=list)
+    rechecked: dict[str, FileRecord] = field(default_factory=dict)
+
+
+# Relative posix path used as the manifest key (and document_id)
+def _relative_key(path: Path, root: Path) -> str:
+    return path.relative_to(root).as_posix()
+
+
+# Compares the documents tree with the previous manifest.
+# Unchanged files are carried over into `manifest`; everything else lands in the plan.
+def _plan_ingestion(
+    files: Sequence[Path],
+    root: Path,
+    previous: IngestManifest | None,
+    reusable: IngestManifest | None,
+    manifest: IngestManifest,
+    stats: IngestStats,
+    resumed: dict[str, FileRecord] | None = None,
+    scope: set[str] | None = None,
+) -> _IngestPlan:
+    plan = _IngestPlan()
+    seen: set[str] = set()
+
+    for file_path in files:
+        key = _relative_key(file_path, root)
+        seen.add(key)
+        stat = file_path.stat()
+
+        # Already fully upserted by the interrupted run we are resuming
+        done = resumed.get(key) if resumed else None
+        if done and done.size == stat.st_size and done.mtime_ns == stat.st_mtime_ns:
+            manifest.files[key] = done
+            old_record = previous.files.get(key) if previous else None
+            if old_record is not None:
+                plan.stale_ids.extend(chunk_id for chunk_id in old_record.chunk_ids if chunk_id not in done.chunks)
+                stats.updated += 1
+            else:
+                stats.added += 1
+            continue
 
-    # Load Documents
-    documents = load_documents(active_settings.docs_path)
-    if not documents:
-        logger.info("No documents found")
-        return 0
+        record = reusable.files.get(key) if reusable else None
 
-    # print("Chunking documents...")
-    logger.info("Chunking documents...")
+        # Fast path: size and mtime unchanged, don't even read the file
+        if record and record.size == stat.st_size and record.mtime_ns == stat.st_mtime_ns:
+            manifest.files[key] = record
+            stats.skipped += 1
+            continue
 
-    # Chunking the loaded documents
-    chunks = build_chunks(documents, active_settings)
-    if not chunks:
-        # print("No chunks created from documents.")
-        logger.warning("Documents yielded no content after chunkting")
-        return 0
+        content_hash = hash_file(file_path)
+        if record and record.content_hash == content_hash:
+            # Touched but identical bytes; only refresh the stat snapshot
+            manifest.files[key] = replace(record, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            stats.skipped += 1
+            continue
 
-    # Load API Key
-    openai_api_key = active_settings.openai_api_key
-    if not openai_api_key:
-        logger.error("OPENAI_API_KEY environment variable not set.")
-        raise RuntimeError("OPENAI_API_KEY environment variable not set.")
-
-    client = OpenAIClient(
-        OpenAIClientConfig(
-            api_key=openai_api_key,
-            embed_model=active_settings.embed_model,
-            timeout=active_settings.openai_timeout,
-            max_retries=active_settings.max_embed_retries,
+        plan.pending[file_path] = content_hash
+
+    # Files that disappeared since the last run (only those in scope, if limited)
+    if previous is not None:
+        for key, record in previous.files.items():
+            if key not in seen and (scope is None or key in scope):
+                plan.stale_ids.extend(record.chunk_ids)
+                stats.deleted += 1
+
+    # Chunks that may be removed this run: those of deleted files and every old
+    # chunk of a changed file. Files whose near-duplicates were folded into one of
+    # them are re-processed so the content is stored again if the canonical goes.
+    if previous is not None:
+        removed = set(plan.stale_ids)
+        for file_path in plan.pending:
+            old_record = previous.files.get(_relative_key(file_path, root))
+            if old_record is not None:
+                removed.update(old_record.chunks)
+        for key, record in list(manifest.files.items()):
+            if not removed.intersection(record.duplicates.values()) or not (root / key).is_file():
+                continue
+            del manifest.files[key]
+            plan.pending[root / key] = record.content_hash
+            plan.rechecked[key] = record
+        if plan.rechecked:
+            logger.info("Re-checking %s unchanged files whose near-duplicate chunks may lose their canonical copy", len(plan.rechecked))
+
+    return plan
+
+
+# Groups chunks into embedding batches, upserts them and tracks when every
+# chunk of a file has landed so its manifest record can be committed.
+# Batches are packed by estimated token count and up to `embed_concurrency`
+# embedding requests run at once; upserts stay on the calling thread, in order.
+# Progress is checkpointed every `ingest_checkpoint_interval` seconds (and on failure).
+# With a lexical index, every upserted batch is also written to the BM25 index.
+class _BatchWriter:
+    def __init__(
+        self,
+        *,
+        settings: Settings,
+        batch_size: int,
+        manifest: IngestManifest,
+        stats: IngestStats,
+        total_files: int,
+        checkpoint: IngestCheckpoint,
+        checkpoint_file: Path,
+        profiler: IngestProfiler,
+        client: OpenAIClient | None = None,
+        lexical: LexicalIndex | None = None,
+    ) -> None:
+        self._settings = settings
+        self._profiler = profiler
+        self._batch_size = min(batch_size, EMBED_MAX_INPUTS)
+        self._max_batch_tokens = max(EMBED_MAX_INPUT_TOKENS, settings.embed_max_batch_tokens)
+        self._concurrency = max(1, settings.embed_concurrency)
+        self._manifest = manifest
+        self._stats = stats
+        self._total_files = total_files
+        self._checkpoint = checkpoint
+        self._checkpoint_file = checkpoint_file
+        self._last_checkpoint = time.monotonic()
+        # (file key, chunk, chunk hash, text sent for embedding)
+        self._batch: list[tuple[str, DocumentChunk, str, str]] = []
+        self._batch_tokens = 0
+        self._in_flight: deque[tuple[list[tuple[str, DocumentChunk, str, str]], Future]] = deque()
+        self._executor: ThreadPoolExecutor | None = None
+        self._outstanding: dict[str, int] = {}
+        self._records: dict[str, FileRecord] = {}
+        self._files_done = 0
+        self._client = client
+        self._store: VectorStore | None = None
+        self._lexical = lexical
+        # Already-embedded chunks waiting to be added to an empty lexical index
+        self._lexical_backlog: list[DocumentChunk] = []
+
+    def __enter__(self) -> "_BatchWriter":
+        return self
+
+    def __exit__(self, exc_type: object, *exc_info: object) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if exc_type is not None:
+            # Keep whatever landed so `--resume` can pick up from here
+            self.save_checkpoint()
+
+    @property
+    def store(self) -> VectorStore:
+        if self._store is None:
+            # Load the Vector Store
+            self._store = get_vector_store(self._settings)
+        return self._store
+
+    @property
+    def client(self) -> OpenAIClient:
+        if self._client is None:
+            # Load API Key
+            if not self._settings.openai_api_key:
+                logger.error("OPENAI_API_KEY environment variable not set.")
+                raise RuntimeError("OPENAI_API_KEY environment variable not set.")
+            # Batch work: retries aren't drawn from the query path's retry budget
+            self._client = get_openai_client(self._settings, interactive=False)
+        return self._client
+
+    @property
+    def embedding_cache_stats(self) -> dict[str, object] | None:
+        if self._client is None or self._client.embedding_cache is None:
+            return None
+        return self._client.embedding_cache.stats()
+
+    def add(self, key: str, chunk: DocumentChunk, chunk_hash: str) -> None:
+        embed_input = chunk.content
+        tokens = estimate_tokens(embed_input)
+        if tokens > EMBED_MAX_INPUT_TOKENS:
+            logger.warning("Chunk %s exceeds the embedding input limit; embedding a truncated copy", chunk.chunk_id)
+            embed_input = truncate_to_tokens(embed_input, EMBED_MAX_INPUT_TOKENS)
+            tokens = estimate_tokens(embed_input)
+
+        if self._batch and (
+            len(self._batch) >= self._batch_size
+            or self._batch_tokens + tokens > self._max_batch_tokens
+        ):
+            self.flush()
+
+        self._outstanding[key] = self._outstanding.get(key, 0) + 1
+        self._batch.append((key, chunk, chunk_hash, embed_input))
+        self._batch_tokens += tokens
+
+    # Indexes an already-embedded chunk for keyword search only (lexical backfill)
+    def add_lexical(self, chunk: DocumentChunk) -> None:
+        if self._lexical is None:
+            return
+        self._lexical_backlog.append(chunk)
+        if len(self._lexical_backlog) >= self._batch_size:
+            self._flush_lexical()
+
+    def _flush_lexical(self) -> None:
+        if self._lexical is None or not self._lexical_backlog:
+            return
+        with self._profiler.stage("lexical", items=len(self._lexical_backlog)):
+            self._lexical.upsert(self._lexical_backlog)
+        self._lexical_backlog = []
+
+    # Called once all of a file's chunks have been handed to `add`
+    def finish_file(self, key: str, record: FileRecord) -> None:
+        self._records[key] = record
+        if not self._outstanding.get(key):
+            self._complete(key)
+
+    # Sends the current batch to the embedding pool, waiting for the oldest
+    # request first when `embed_concurrency` requests are already in flight.
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        client = self.client
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="ingest-embed")
+        while len(self._in_flight) >= self._concurrency:
+            self._collect_oldest()
+
+        entries = self._batch
+        logger.debug("Submitting batch of %s chunks (~%s tokens)", len(entries), self._batch_tokens)
+        future = self._executor.submit(self._embed, client, [embed_input for *_, embed_input in entries])
+        self._in_flight.append((entries, future))
+        self._batch = []
+        self._batch_tokens = 0
+
+    def _embed(self, client: OpenAIClient, texts: list[str]) -> list[list[float]]:
+        size = sum(len(text.encode("utf-8")) for text in texts)
+        with self._profiler.stage("embed", bytes=size, items=len(texts)):
+            return client.embed_texts(texts)
+
+    # Flushes the last partial batch and waits for every request to land
+    def drain(self) -> None:
+        self.flush()
+        while self._in_flight:
+            self._collect_oldest()
+        self._flush_lexical()
+
+    def _collect_oldest(self) -> None:
+        entries, future = self._in_flight.popleft()
+        embeddings = future.result()
+        batch = [chunk for _, chunk, _, _ in entries]
+        with self._profiler.stage("upsert", items=len(batch)):
+            self.store.upsert(batch, embeddings)
+        if self._lexical is not None:
+            with self._profiler.stage("lexical", items=len(batch)):
+                self._lexical.upsert(batch)
+        logger.debug("Embedded %s items in current batch", len(embeddings))
+        self._stats.embedded_chunks += len(batch)
+
+        for key, chunk, chunk_hash, _ in entries:
+            self._checkpoint.upserted[chunk.chunk_id] = chunk_hash
+            self._outstanding[key] -= 1
+            if not self._outstanding[key] and key in self._records:
+                self._complete(key)
+
+        if time.monotonic() - self._last_checkpoint >= self._settings.ingest_checkpoint_interval:
+            self.save_checkpoint()
+
+    # Makes upserts durable before anything (checkpoint, manifest) records them
+    def persist(self) -> None:
+        if self._store is not None:
+            with self._profiler.stage("persist"):
+                self._store.persist()
+
+    # Rebuilds derived search structures once, at the end of the run
+    def refresh(self) -> None:
+        if self._store is not None:
+            with self._profiler.stage("refresh"):
+                self._store.refresh()
+
+    def save_checkpoint(self) -> None:
+        self.persist()
+        self._checkpoint.save(self._checkpoint_file)
+        self._last_checkpoint = time.monotonic()
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        self.store.delete(chunk_ids)
+        if self._lexical is not None:
+            self._lexical.delete(chunk_ids)
+
+    def _complete(self, key: str) -> None:
+        self._outstanding.pop(key, None)
+        record = self._records.pop(key)
+        self._manifest.files[key] = record
+        self._checkpoint.files[key] = record
+        for chunk_id in record.chunks:
+            self._checkpoint.upserted.pop(chunk_id, None)
+        self._files_done += 1
+        percent = math.floor((self._files_done / self._total_files) * 100)
+        logger.info(
+            "Indexed %s/%s files (%s%%), %s chunks embedded so far",
+            self._files_done,
+            self._total_files,
+            percent,
+            self._stats.embedded_chunks,
         )
-    )
 
-    # Load the Vector Store
-    store = get_vector_store()
 
-    total_chunks = len(chunks)
-    batch_size = int(os.getenv("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE))
-    batch_size = max(1, batch_size)
+# Main ingestion function
+def ingest_documents(
+    settings: Settings | None = None,
+    *,
+    full: bool = False,
+    resume: bool = False,
+    paths: Sequence[Path] | None = None,
+    client: OpenAIClient | None = None,
+    profiler: IngestProfiler | None = None,
+) -> int:
+    """Index new and changed documents; returns the number of chunks embedded.
 
-    logger.info("Embedding %s chunks in batches of %s", total_chunks, batch_size)
+    Unchanged files (per the manifest) are skipped, changed files only re-embed the
+    chunks whose text changed, and chunks of deleted files are removed from the
+    collection. `full=True` re-embeds everything.
 
-    processed = 0
-    # max_retries = int(os.getenv("EMBED_MAX_RETRIES", 3))
-    # backoff_base = float(os.getenv("EMBED_BACKOFF_BASE", 1.0))  # seconds
+    Files stream through parse -> chunk -> embed -> upsert with bounded buffers in
+    between, so memory stays proportional to a batch rather than the corpus.
 
-    # Process chunks in batches
-    for batch in _batched(chunks, batch_size):
-        texts = [chunk.content for chunk in batch]
+    Progress is checkpointed while the run is going; `resume=True` continues an
+    interrupted run without re-embedding chunks it already upserted.
 
-        # print(texts)
+    `paths` limits the run to those files (existing or deleted); the rest of the
+    manifest is carried over untouched.
 
-        embeddings = client.embed_texts([chunk.content for chunk in batch])
-        
-        # print(embeddings)
+    A per-stage timing summary is logged at the end; pass `profiler` to inspect it,
+    and `client` to embed with something other than the configured OpenAI client.
 
-        store.upsert(batch, embeddings)
+    With VECTOR_SNAPSHOT_PATH set, the snapshot served by the API is re-exported
+    at the end of any run that changed the index (or when it doesn't exist yet).
 
-        logger.debug("Embedded %s items in current batch", len(embeddings))
-        # print(f"Embedded {len(embeddings)} items in current batch")
+    With LEXICAL_INDEX on, chunks are also written to the BM25 index. When that
+    index is empty (first run after enabling it) unchanged files are re-parsed
+    and their chunks added to it without being re-embedded.
+    """
 
-        processed += len(batch)
-        percent = math.floor((processed / total_chunks) * 100)
-        logger.info("Indexed %s/%s chunks (%s%%)", processed, total_chunks, percent)
+    active_settings = settings or get_settings()
+    profiler = profiler or IngestProfiler()
+    docs_root = active_settings.docs_path
+    manifest_file = manifest_path(active_settings)
+
+    previous = IngestManifest.load(manifest_file)
+    reusable = previous
+    # Stored vectors of another size can't be kept, or mixed with new ones, in the same index
+    clear_index = previous is not None and previous.embed_dimensions != active_settings.embed_dimensions
+    if clear_index:
+        logger.info(
+            "Embedding dimensions changed (%s -> %s); clearing the index and re-indexing all documents",
+            previous.embed_dimensions or "unknown",
+            active_settings.embed_dimensions,
+        )
+        paths = None
+    if full:
+        logger.info("Full re-index requested; ignoring manifest")
+        reusable = None
+    elif previous is not None and not previous.matches(active_settings):
+        logger.info("Embedding model or dimensions, chunk settings or index layout changed; re-indexing all documents")
+        reusable = None
+
+    manifest = IngestManifest.for_settings(active_settings)
+    stats = IngestStats()
+
+    checkpoint_file = checkpoint_path(active_settings)
+    checkpoint = IngestCheckpoint.for_settings(active_settings)
+    interrupted = IngestCheckpoint.load(checkpoint_file)
+    if interrupted is not None:
+        if not resume:
+            logger.info("Discarding checkpoint of an interrupted run (use --resume to continue it)")
+        elif not interrupted.matches(active_settings):
+            logger.warning("Checkpoint was written with different embedding/chunk/index settings; starting over")
+        else:
+            logger.info(
+                "Resuming interrupted run: %s files and %s chunks already upserted",
+                len(interrupted.files),
+                len(interrupted.upserted),
+            )
+            checkpoint = interrupted
+    resumed_files = dict(checkpoint.files)
+    resumed_chunks = dict(checkpoint.upserted)
+
+    scope: set[str] | None = None
+    if paths is None:
+        files = discover_files(docs_root)
+    else:
+        scope = {_relative_key(path, docs_root) for path in paths}
+        files = sorted(
+            path for path in set(paths)
+            if path.is_file() and path.suffix.lower() in SUPPORTED_FILE_TYPES
+        )
+        if previous is not None:
+            for key, record in previous.files.items():
+                if key not in scope:
+                    manifest.files[key] = record
+
+    if not files and previous is None:
+        logger.info("No documents found")
+        return 0
+
+    # Pre-scan: decides which files need work, which also gives progress its total
+    plan = _plan_ingestion(files, docs_root, previous, reusable, manifest, stats, resumed_files, scope)
+    total_files = len(plan.pending)
+
+    lexical = get_lexical_index(active_settings)
+    backfill_lexical = lexical is not None and reusable is not None and len(lexical) == 0
+
+    batch_size = int(os.getenv("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE))
+    batch_size = max(1, batch_size)
+    writer = _BatchWriter(
+        settings=active_settings,
+        batch_size=batch_size,
+        manifest=manifest,
+        stats=stats,
+        total_files=total_files,
+        checkpoint=checkpoint,
+        checkpoint_file=checkpoint_file,
+        profiler=profiler,
+        client=client,
+        lexical=lexical,
+    )
+
+    if clear_index:
+        writer.store.clear()
+
+    if total_files:
+        logger.info(
+            "Indexing %s new or changed files in batches of up to %s chunks / %s tokens, %s requests in flight",
+            total_files,
+            batch_size,
+            active_settings.embed_max_batch_tokens,
+            active_settings.embed_concurrency,
+        )
+
+    # Near-duplicate chunks of the same patient are folded into the first copy,
+    # including copies stored by earlier runs
+    dedup = None
+    if active_settings.dedup_threshold > 0 and plan.pending:
+        dedup = NearDuplicateIndex(threshold=min(active_settings.dedup_threshold, 1.0))
+        with profiler.stage("dedup"):
+            _seed_dedup(dedup, active_settings, manifest, skip=set(plan.pending))
+
+    with writer:
+        parsed = _prefetch(
+            iter_parsed_files(list(plan.pending), workers=active_settings.ingest_workers),
+            maxsize=active_settings.ingest_queue_size,
+        )
+        for file_path, text, elapsed in parsed:
+            key = _relative_key(file_path, docs_root)
+            stat = file_path.stat()
+            profiler.record("parse", elapsed, bytes=stat.st_size, items=1)
+            logger.info(f"Parsed file: {file_path} in {elapsed:.3f}s")
+
+            if key in plan.rechecked:
+                reusable_hashes = plan.rechecked[key].chunks
+            else:
+                reusable_hashes = reusable.files[key].chunks if reusable and key in reusable.files else {}
+            new_hashes: dict[str, str] = {}
+            duplicates: dict[str, str] = {}
+            if text.strip():
+                document_chunks = iter_document_chunks(LoadedDocument(path=file_path, content=text), active_settings)
+                for chunk in profiler.timed_iter("chunk", document_chunks):
+                    chunk_hash = hash_text(chunk.content)
+                    if chunk_hash in (reusable_hashes.get(chunk.chunk_id), resumed_chunks.get(chunk.chunk_id)):
+                        new_hashes[chunk.chunk_id] = chunk_hash
+                        stats.reused_chunks += 1
+                        if dedup is not None:
+                            dedup.add(chunk.patient_id, chunk.chunk_id, chunk.content)
+                        if backfill_lexical:
+                            writer.add_lexical(chunk)
+                        continue
+
+                    canonical = None
+                    if dedup is not None:
+                        with profiler.stage("dedup", items=1):
+                            canonical = dedup.find_or_add(chunk.patient_id, chunk.chunk_id, chunk.content)
+                    if canonical is not None:
+                        logger.debug("Chunk %s is a near-duplicate of %s; not embedding it", chunk.chunk_id, canonical)
+                        duplicates[chunk.chunk_id] = canonical
+                        stats.duplicate_chunks += 1
+                        continue
+
+                    new_hashes[chunk.chunk_id] = chunk_hash
+                    writer.add(key, chunk, chunk_hash)
+            else:
+                logger.debug(f"No content extracted from file: {file_path}. Skipping.")
+
+            old_record = plan.rechecked.get(key) or (previous.files.get(key) if previous else None)
+            if old_record is not None:
+                plan.stale_ids.extend(chunk_id for chunk_id in old_record.chunk_ids if chunk_id not in new_hashes)
+                if key not in plan.rechecked:  # its bytes did not change
+                    stats.updated += 1
+            else:
+                stats.added += 1
+
+            writer.finish_file(
+                key,
+                FileRecord(
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    content_hash=plan.pending[file_path],
+                    chunks=new_hashes,
+                    duplicates=duplicates,
+                ),
+            )
+
+        if backfill_lexical:
+            _backfill_lexical(writer, active_settings, manifest, skip=set(plan.pending), scope=scope)
+
+        writer.drain()
+
+    if plan.stale_ids:
+        writer.delete(plan.stale_ids)
+        stats.removed_chunks = len(plan.stale_ids)
+
+    writer.persist()
+    writer.refresh()
+    # Before the manifest, so readers that watch the manifest find the new snapshot.
+    # Only when the index changed (or there is no usable snapshot yet): exporting is O(corpus).
+    snapshot_file = active_settings.vector_snapshot_path
+    if snapshot_file is not None and (plan.pending or plan.stale_ids or clear_index or not is_current_snapshot(snapshot_file)):
+        with profiler.stage("snapshot"):
+            export_snapshot(writer.store, snapshot_file, dtype=active_settings.snapshot_dtype)
+    manifest.save(manifest_file)
+    checkpoint_file.unlink(missing_ok=True)
+
+    logger.info(
+        "Ingestion summary: %s skipped, %s added, %s updated, %s deleted files; "
+        "%s chunks embedded, %s reused, %s near-duplicates skipped (embeddings saved), %s removed",
+        stats.skipped,
+        stats.added,
+        stats.updated,
+        stats.deleted,
+        stats.embedded_chunks,
+        stats.reused_chunks,
+        stats.duplicate_chunks,
+        stats.removed_chunks,
+    )
+    profiler.log_summary(logger)
+    cache_stats = writer.embedding_cache_stats
+    if cache_stats:
+        logger.info(
+            "Embedding cache: %s hits, %s misses (hit rate %s), %s entries",
+            cache_stats["hits"],
+            cache_stats["misses"],
+            cache_stats["hit_rate"],
+            cache_stats["entries"],
+        )
+    return stats.embedded_chunks
+
+# Registers the stored chunks of files the run carries over unchanged, so new
+# chunks are checked against the whole corpus. Dedup is per patient, so only
+# patients with pending files are re-parsed.
+def _seed_dedup(dedup: NearDuplicateIndex, settings: Settings, manifest: IngestManifest, *, skip: set[Path]) -> None:
+    docs_root = settings.docs_path
+    patients = {_relative_key(path, docs_root).split("/", 1)[0] for path in skip}
+    paths = [
+        docs_root / key
+        for key, record in manifest.files.items()
+        if key.split("/", 1)[0] in patients and record.chunks and docs_root / key not in skip and (docs_root / key).is_file()
+    ]
+    if not paths:
+        return
+    logger.info("Loading chunks of %s unchanged files for near-duplicate detection", len(paths))
+    for file_path, text, _ in iter_parsed_files(paths, workers=settings.ingest_workers):
+        stored = manifest.files[_relative_key(file_path, docs_root)].chunks
+        if not text.strip():
+            continue
+        for chunk in iter_document_chunks(LoadedDocument(path=file_path, content=text), settings):
+            if stored.get(chunk.chunk_id) == hash_text(chunk.content):
+                dedup.add(chunk.patient_id, chunk.chunk_id, chunk.content)
+
+
+# Re-parses files the run skipped so their (already embedded) chunks reach an
+# empty lexical index; near-duplicates stay out, as they are of the vector index.
+def _backfill_lexical(
+    writer: _BatchWriter,
+    settings: Settings,
+    manifest: IngestManifest,
+    *,
+    skip: set[Path],
+    scope: set[str] | None,
+) -> None:
+    docs_root = settings.docs_path
+    paths = [
+        docs_root / key
+        for key in manifest.files
+        if (scope is None or key in scope) and docs_root / key not in skip and (docs_root / key).is_file()
+    ]
+    if not paths:
+        return
+    logger.info("Lexical index is empty; adding chunks of %s unchanged files", len(paths))
+    for file_path, text, _ in iter_parsed_files(paths, workers=settings.ingest_workers):
+        indexed = manifest.files[_relative_key(file_path, docs_root)].chunks
+        if not text.strip():
+            continue
+        for chunk in iter_document_chunks(LoadedDocument(path=file_path, content=text), settings):
+            if chunk.chunk_id in indexed:
+                writer.add_lexical(chunk)
 
-    logger.info("Completed ingestion for %s documents", len(documents))
-    # print(f"Completed ingestion for {len(documents)} documents")
-    return total_chunks
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Ingest project documents into Chroma")
@@ -232,6 +880,48 @@ def _parse_args() -> argparse.Namespace:
         type=int,
         help="Override embedding batch size",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Parse files in N worker processes (defaults to INGEST_WORKERS or 1)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-embed every document, ignoring the incremental manifest",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and ingest files as they are written to the docs directory",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between scans when native file events are unavailable (watch mode)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=1.0,
+        help="Seconds a file must stay unchanged before it is ingested (watch mode)",
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    benchmark = subparsers.add_parser(
+        "benchmark",
+        help="Ingest a synthetic corpus with a stubbed embedder and report per-stage timings",
+    )
+    benchmark.add_argument("--patients", type=int, default=20, help="Number of patient folders")
+    benchmark.add_argument("--files-per-patient", type=int, default=10, help="Documents per patient")
+    benchmark.add_argument("--words", type=int, default=1500, help="Approximate words per document")
+    benchmark.add_argument("--embed-latency", type=float, default=0.0, help="Simulated seconds per embedding request")
     return parser.parse_args()
 
 def main() -> None:
@@ -240,11 +930,31 @@ def main() -> None:
     overrides: dict[str, object] = {}
     if args.docs:
         overrides["docs_path"] = args.docs
+    if args.workers:
+        overrides["ingest_workers"] = max(1, args.workers)
     if args.batch_size:
         os.environ["EMBED_BATCH_SIZE"] = str(args.batch_size)
     if overrides:
         settings = replace(settings, **overrides)
-    ingest_documents(settings)
+
+    if args.command == "benchmark":
+        from src.rag.benchmarks import run_ingest_benchmark
+
+        run_ingest_benchmark(
+            patients=args.patients,
+            files_per_patient=args.files_per_patient,
+            words_per_file=args.words,
+            workers=settings.ingest_workers,
+            embed_latency=args.embed_latency,
+            settings=settings,
+        )
+        return
+
+    ingest_documents(settings, full=args.full, resume=args.resume)
+    if args.watch:
+        from src.rag.watch import watch_documents
+
+        watch_documents(settings, poll_interval=args.poll_interval, debounce=args.debounce)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+""" BM25 keyword index over chunks (SQLite FTS5) and reciprocal rank fusion. """
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+from pathlib import Path
+import json
+import logging
+import re
+import sqlite3
+import threading
+
+from src.rag.config import Settings, get_settings
+from src.rag.vector_store import DocumentChunk, RetrievedChunk, chunk_metadata
+
+logger = logging.getLogger(__name__)
+
+# Porter stemming so "allergies" matches "allergy". patient_id is UNINDEXED and
+# filtered with `=`: a tokenized match would let patient_001 match PATIENT_001,
+# patients_001 or patient_001_b
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    content,
+    patient_id UNINDEXED,
+    chunk_id UNINDEXED,
+    metadata UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+-- FTS5 can't index chunk_id, so deletes go through the rowid
+CREATE TABLE IF NOT EXISTS chunk_rows (
+    chunk_id TEXT PRIMARY KEY,
+    fts_rowid INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# bm25() weights per column, in schema order: only `content` contributes to the score
+_BM25 = "bm25(chunks, 1.0, 0.0, 0.0, 0.0)"
+_TERM_PATTERN = re.compile(r"\w+")
+_MAX_QUERY_TERMS = 32
+_STOPWORDS = frozenset(
+    "a an and are as at be by can did do does for from has have how i in is it its me my "
+    "of on or please show tell that the their there this to was were what when which who "
+    "why with you your".split()
+)
+
+
+def query_terms(text: str) -> list[str]:
+    """Distinct lowercase search terms of `text`, stopwords removed."""
+    terms = [term for term in _TERM_PATTERN.findall(text.lower()) if term not in _STOPWORDS]
+    return list(dict.fromkeys(terms))[:_MAX_QUERY_TERMS]
+
+
+def _match_expression(terms: Sequence[str]) -> str:
+    # Every term is quoted, so user text can never inject FTS5 syntax
+    quoted = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    return f"content : ({quoted})"
+
+
+# Indexes written before patient_id became UNINDEXED are dropped; ingest backfills
+# an empty index from the documents on its next run
+def _drop_tokenized_patient_index(conn: sqlite3.Connection) -> None:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'chunks'").fetchone()
+    if row is None or "patient_id UNINDEXED" in row[0]:
+        return
+    logger.warning("Lexical index uses a tokenized patient_id column; dropping it so the next ingest rebuilds it")
+    conn.executescript("DROP TABLE chunks; DROP TABLE IF EXISTS chunk_rows;")
+
+
+class LexicalIndex:
+    """Inverted BM25 index of chunk text, kept next to the vector index.
+
+    Answers keyword queries (drug names, lab codes) without an embedding round
+    trip. Safe to share between threads, and between processes on one host (WAL).
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        _drop_tokenized_patient_index(self._conn)
+        self._conn.executescript(_SCHEMA)
+
+    def upsert(self, chunks: Sequence[DocumentChunk]) -> None:
+        if not chunks:
+            return
+        latest = {chunk.chunk_id: chunk for chunk in chunks}
+        with self._lock:
+            self._delete_rows(latest)
+            for chunk in latest.values():
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (content, patient_id, chunk_id, metadata) VALUES (?, ?, ?, ?)",
+                    (chunk.content, chunk.patient_id, chunk.chunk_id, json.dumps(chunk_metadata(chunk))),
+                )
+                self._conn.execute(
+                    "INSERT INTO chunk_rows (chunk_id, fts_rowid) VALUES (?, ?)", (chunk.chunk_id, cursor.lastrowid)
+                )
+            self._conn.commit()
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._delete_rows(chunk_ids)
+            self._conn.commit()
+
+    # Caller holds the lock and commits
+    def _delete_rows(self, chunk_ids: Iterable[str]) -> None:
+        for chunk_id in chunk_ids:
+            row = self._conn.execute("SELECT fts_rowid FROM chunk_rows WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM chunks WHERE rowid = ?", row)
+            self._conn.execute("DELETE FROM chunk_rows WHERE chunk_id = ?", (chunk_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_rows").fetchone()[0]
+
+    def search(self, query: str, *, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
+        """Top-k chunks by BM25, best first.
+
+        `score` maps BM25 into [0,1) as bm25 / (1 + bm25) so it sorts with the
+        vector scores; the raw value is kept in metadata['bm25'].
+        """
+        terms = query_terms(query)
+        if not terms or top_k <= 0:
+            return []
+        sql = f"SELECT chunk_id, content, metadata, {_BM25} FROM chunks WHERE chunks MATCH ?"
+        params: list[object] = [_match_expression(terms)]
+        if patient_id:
+            sql += " AND patient_id = ?"
+            params.append(patient_id)
+        params.append(top_k)
+        with self._lock:
+            rows = self._conn.execute(f"{sql} ORDER BY {_BM25} LIMIT ?", params).fetchall()
+
+        retrieved: list[RetrievedChunk] = []
+        for chunk_id, content, metadata_json, rank in rows:
+            bm25 = max(0.0, -float(rank))  # FTS5 reports BM25 negated (lower is better)
+            metadata = json.loads(metadata_json)
+            metadata["bm25"] = bm25
+            retrieved.append(
+                RetrievedChunk(chunk_id=chunk_id, content=content, score=bm25 / (1.0 + bm25), metadata=metadata)
+            )
+        return retrieved
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def reciprocal_rank_fusion(
+    results: Sequence[Sequence[RetrievedChunk]],
+    *,
+    top_k: int | None = None,
+    k: int = 60,
+) -> list[RetrievedChunk]:
+    """Fuse ranked lists by summing 1 / (k + rank) per chunk (Cormack et al., 2009).
+
+    Each chunk keeps the first RetrievedChunk seen for it (so vector results,
+    passed first, keep their similarity score); the fused score is stored in
+    metadata['rrf_score'] and decides the order.
+    """
+    fused: dict[str, float] = {}
+    first_seen: dict[str, RetrievedChunk] = {}
+    for ranked in results:
+        for rank, chunk in enumerate(ranked, start=1):
+            fused[chunk.chunk_id] = fused.get(chunk.chunk_id, 0.0) + 1.0 / (k + rank)
+            first_seen.setdefault(chunk.chunk_id, chunk)
+
+    ordered = sorted(fused, key=lambda chunk_id: fused[chunk_id], reverse=True)
+    if top_k is not None:
+        ordered = ordered[:top_k]
+    merged: list[RetrievedChunk] = []
+    for chunk_id in ordered:
+        chunk = first_seen[chunk_id]
+        metadata = dict(chunk.metadata)
+        metadata["rrf_score"] = fused[chunk_id]
+        merged.append(RetrievedChunk(chunk_id=chunk.chunk_id, content=chunk.content, score=chunk.score, metadata=metadata))
+    return merged
+
+
+@lru_cache()
+def get_lexical_index(settings: Settings | None = None) -> LexicalIndex | None:
+    """Shared BM25 index for the configured path; None when disabled."""
+    active_settings = settings or get_settings()
+    if not active_settings.lexical_index:
+        return None
+    return LexicalIndex(active_settings.lexical_index_path or active_settings.embeddings_path / "lexical_index.sqlite3")
@@ -0,0 +1,241 @@
+""" Persisted ingestion manifest used for incremental re-indexing. """
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+
+from src.rag.config import Settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "ingest_manifest.json"
+CHECKPOINT_FILENAME = "ingest_checkpoint.json"
+DEFAULT_INDEX_LAYOUT = "chroma"
+
+
+def index_layout(settings: Settings) -> str:
+    """Where vectors are physically stored; switching layouts means re-indexing everything."""
+    if settings.vector_backend.lower() == "hnsw":
+        return "hnsw"
+    partitioning = settings.vector_partitioning.lower()
+    if partitioning == "patient":
+        return "chroma-patient"
+    if partitioning == "hash":
+        return f"chroma-hash{settings.vector_partition_buckets}"
+    return DEFAULT_INDEX_LAYOUT
+
+
+@dataclass(frozen=True)
+class FileRecord:
+    """Snapshot of a source file as of its last successful ingestion."""
+
+    size: int
+    mtime_ns: int
+    content_hash: str
+    # chunk_id -> sha256 of the chunk text that is stored under that id
+    chunks: dict[str, str] = field(default_factory=dict)
+    # chunk_id -> id of the stored near-duplicate it was folded into (not stored itself)
+    duplicates: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def chunk_ids(self) -> list[str]:
+        return list(self.chunks)
+
+
+@dataclass
+class IngestManifest:
+    """Per-file state of the vector index plus the settings it was built with."""
+
+    embed_model: str
+    chunk_size: int
+    chunk_overlap: int
+    # Relative (posix) document path -> record
+    files: dict[str, FileRecord] = field(default_factory=dict)
+    index_layout: str = DEFAULT_INDEX_LAYOUT
+    # 0 when unknown (manifests written before it was recorded)
+    embed_dimensions: int = 0
+
+    @classmethod
+    def for_settings(cls, settings: Settings) -> IngestManifest:
+        return cls(
+            embed_model=settings.embed_model,
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            index_layout=index_layout(settings),
+            embed_dimensions=settings.embed_dimensions,
+        )
+
+    def matches(self, settings: Settings) -> bool:
+        """True when chunks stored under this manifest are valid for `settings`."""
+        return (
+            self.embed_model == settings.embed_model
+            and self.embed_dimensions == settings.embed_dimensions
+            and self.chunk_size == settings.chunk_size
+            and self.chunk_overlap == settings.chunk_overlap
+            and self.index_layout == index_layout(settings)
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> IngestManifest | None:
+        """Load a manifest from disk; returns None when missing or unreadable."""
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable manifest %s: %s", path, exc)
+            return None
+
+        if payload.get("version") != MANIFEST_VERSION:
+            logger.info("Manifest %s has an unknown version; ignoring it", path)
+            return None
+
+        try:
+            files = {
+                name: FileRecord(**record)
+                for name, record in payload.get("files", {}).items()
+            }
+            return cls(
+                embed_model=payload["embed_model"],
+                chunk_size=int(payload["chunk_size"]),
+                chunk_overlap=int(payload["chunk_overlap"]),
+                files=files,
+                index_layout=payload.get("index_layout", DEFAULT_INDEX_LAYOUT),
+                embed_dimensions=int(payload.get("embed_dimensions", 0)),
+            )
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.warning("Ignoring malformed manifest %s: %s", path, exc)
+            return None
+
+    def save(self, path: Path) -> None:
+        """Atomically write the manifest so a crash never leaves a torn file."""
+        payload = {
+            "version": MANIFEST_VERSION,
+            "embed_model": self.embed_model,
+            "embed_dimensions": self.embed_dimensions,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "index_layout": self.index_layout,
+            "files": {name: asdict(record) for name, record in sorted(self.files.items())},
+        }
+        _write_atomic(path, payload)
+
+
+def changed_patients(old: IngestManifest | None, new: IngestManifest | None) -> set[str] | None:
+    """Patients whose indexed files differ between two manifests; None when every patient may have changed.
+
+    Patients are the first component of each document path, as in ingestion.
+    """
+    if old is None or new is None:
+        return None
+    if (old.embed_model, old.embed_dimensions, old.chunk_size, old.chunk_overlap, old.index_layout) != (
+        new.embed_model, new.embed_dimensions, new.chunk_size, new.chunk_overlap, new.index_layout
+    ):
+        return None
+    changed = {name for name in old.files.keys() | new.files.keys() if old.files.get(name) != new.files.get(name)}
+    return {Path(name).parts[0] for name in changed}
+
+
+@dataclass
+class IngestCheckpoint:
+    """Progress of an in-flight ingestion run, persisted so it can be resumed.
+
+    `files` holds records of files fully upserted during the run (the manifest
+    position); `upserted` holds chunk_id -> chunk hash for chunks already upserted
+    whose file is not complete yet.
+    """
+
+    embed_model: str
+    chunk_size: int
+    chunk_overlap: int
+    files: dict[str, FileRecord] = field(default_factory=dict)
+    upserted: dict[str, str] = field(default_factory=dict)
+    index_layout: str = DEFAULT_INDEX_LAYOUT
+    embed_dimensions: int = 0
+
+    @classmethod
+    def for_settings(cls, settings: Settings) -> IngestCheckpoint:
+        return cls(
+            embed_model=settings.embed_model,
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            index_layout=index_layout(settings),
+            embed_dimensions=settings.embed_dimensions,
+        )
+
+    def matches(self, settings: Settings) -> bool:
+        return (
+            self.embed_model == settings.embed_model
+            and self.embed_dimensions == settings.embed_dimensions
+            and self.chunk_size == settings.chunk_size
+            and self.chunk_overlap == settings.chunk_overlap
+            and self.index_layout == index_layout(settings)
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> IngestCheckpoint | None:
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            return cls(
+                embed_model=payload["embed_model"],
+                chunk_size=int(payload["chunk_size"]),
+                chunk_overlap=int(payload["chunk_overlap"]),
+                files={name: FileRecord(**record) for name, record in payload.get("files", {}).items()},
+                upserted=dict(payload.get("upserted", {})),
+                index_layout=payload.get("index_layout", DEFAULT_INDEX_LAYOUT),
+                embed_dimensions=int(payload.get("embed_dimensions", 0)),
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", path, exc)
+            return None
+
+    def save(self, path: Path) -> None:
+        _write_atomic(
+            path,
+            {
+                "version": MANIFEST_VERSION,
+                "embed_model": self.embed_model,
+                "embed_dimensions": self.embed_dimensions,
+                "chunk_size": self.chunk_size,
+                "chunk_overlap": self.chunk_overlap,
+                "index_layout": self.index_layout,
+                "files": {name: asdict(record) for name, record in sorted(self.files.items())},
+                "upserted": self.upserted,
+            },
+        )
+
+
+def _write_atomic(path: Path, payload: dict[str, object]) -> None:
+    """Write JSON via a temp file + rename so a crash never leaves a torn file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def checkpoint_path(settings: Settings) -> Path:
+    return settings.embeddings_path / CHECKPOINT_FILENAME
+
+
+def manifest_path(settings: Settings) -> Path:
+    """Location of the manifest, kept next to the Chroma data it describes."""
+    return settings.embeddings_path / MANIFEST_FILENAME
+
+
+def hash_file(path: Path) -> str:
+    """sha256 of the raw file bytes."""
+    with path.open("rb") as handle:
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """sha256 of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,208 @@
+""" In-memory exact-search backend: per-patient NumPy matrices, persisted in Chroma. """
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+import logging
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from src.rag.vector_store import ChromaVectorStore, DocumentChunk, RetrievedChunk, _distance_to_similarity, metadata_filter
+
+logger = logging.getLogger(__name__)
+
+_GENERATION_FILENAME = "GENERATION"
+_STALE_CHECK_INTERVAL = 1.0  # seconds between freshness checks while serving queries
+
+
+@dataclass(frozen=True)
+class _PatientMatrix:
+    """All chunks of one patient (or of the whole collection) ready for brute-force search."""
+
+    ids: list[str]
+    documents: list[str]
+    metadatas: list[dict[str, object]]
+    # (n, dim) float32, C-contiguous, rows L2-normalised
+    matrix: np.ndarray
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+class NumpyVectorStore(ChromaVectorStore):
+    """VectorStore that answers queries with an exact matmul over in-memory matrices.
+
+    Chroma stays the system of record: writes go through to the collection and
+    invalidate the affected in-memory matrices, which are reloaded on the next
+    query for that patient. Writes also bump a generation file next to the
+    collection; when it (or the collection size) changes under another process,
+    for example the ingest CLI or watch mode, every matrix is dropped and
+    reloaded on demand. The check runs at most once a second. A patient typically has a few hundred chunks, so a
+    dot product over a contiguous matrix beats Chroma's filtered HNSW path.
+    Distances reported in metadata are squared L2 between normalised vectors
+    (what Chroma's default space returns), so scores match the Chroma backend.
+    """
+
+    def __init__(self, *, persist_directory: Path, collection_name: str) -> None:
+        super().__init__(persist_directory=persist_directory, collection_name=collection_name)
+        self._lock = threading.Lock()
+        # patient_id -> matrix; the None key holds the whole collection (unfiltered queries)
+        self._matrices: dict[str | None, _PatientMatrix] = {}
+        self._generation_path = persist_directory / "numpy" / collection_name / _GENERATION_FILENAME
+        # (generation, collection count) the loaded matrices belong to
+        self._loaded_state: tuple[str, int] | None = None
+        self._checked_at = 0.0
+
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        super().upsert(chunks, embeddings)
+        if chunks:
+            self._bump_generation()
+        self._invalidate({chunk.patient_id for chunk in chunks})
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        super().delete(chunk_ids)
+        if not chunk_ids:
+            return
+        self._bump_generation()
+        doomed = set(chunk_ids)
+        with self._lock:
+            stale = {key for key, entry in self._matrices.items() if doomed.intersection(entry.ids)}
+        self._invalidate(stale)
+
+    def clear(self) -> None:
+        super().clear()
+        self._bump_generation()
+        with self._lock:
+            self._matrices.clear()
+
+    def refresh(self) -> None:
+        """Drop the loaded matrices if another process changed the collection."""
+        with self._lock:
+            self._checked_at = 0.0
+        self._drop_if_stale()
+
+    def _bump_generation(self) -> None:
+        self._generation_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._generation_path.with_name(f"{_GENERATION_FILENAME}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(f"{time.time_ns()}-{uuid.uuid4().hex}", encoding="utf-8")
+        os.replace(tmp_path, self._generation_path)
+
+    def _current_generation(self) -> str:
+        try:
+            return self._generation_path.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return ""
+
+    # Clears every matrix once the generation file or the collection size moved;
+    # rate-limited to one check per _STALE_CHECK_INTERVAL
+    def _drop_if_stale(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < _STALE_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+        state = (self._current_generation(), self._collection.count())
+        with self._lock:
+            if state == self._loaded_state:
+                return
+            if self._loaded_state is not None and self._matrices:
+                logger.info("Collection changed on disk; reloading %s patient matrices on demand", len(self._matrices))
+            self._matrices.clear()
+            self._loaded_state = state
+
+    @property
+    def resident_bytes(self) -> int:
+        """Bytes held by the loaded embedding matrices."""
+        with self._lock:
+            return sum(entry.matrix.nbytes for entry in self._matrices.values())
+
+    def _invalidate(self, patient_ids: set[str | None]) -> None:
+        with self._lock:
+            for patient_id in patient_ids | {None}:
+                self._matrices.pop(patient_id, None)
+
+    def _matrix_for(self, patient_id: str | None) -> _PatientMatrix:
+        self._drop_if_stale()
+        with self._lock:
+            entry = self._matrices.get(patient_id)
+        if entry is not None:
+            return entry
+
+        get_params: dict[str, object] = {"include": ["embeddings", "documents", "metadatas"]}
+        if patient_id:
+            get_params["where"] = {"patient_id": patient_id}
+        result = self._collection.get(**get_params)
+
+        embeddings = result.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        else:
+            matrix = _normalize(np.asarray(embeddings, dtype=np.float32))
+        entry = _PatientMatrix(
+            ids=list(result.get("ids") or []),
+            documents=list(result.get("documents") or []),
+            metadatas=[dict(metadata or {}) for metadata in result.get("metadatas") or []],
+            matrix=matrix,
+        )
+        logger.debug("Loaded %s vectors for patient %s", len(entry.ids), patient_id)
+        with self._lock:
+            self._matrices[patient_id] = entry
+        return entry
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Exact top-k per query over the patient's matrix (one matmul for all queries)."""
+        if not embeddings:
+            return []
+        filters = metadata_filter(patient_id, where) or {}
+        if set(filters) - {"patient_id"}:
+            # Filters on other metadata are answered by Chroma
+            return super().similarity_search_many(embeddings, top_k=top_k, patient_id=patient_id, where=where)
+        patient_id = filters.get("patient_id")
+        entry = self._matrix_for(patient_id or None)
+        count = len(entry.ids)
+        if count == 0 or top_k <= 0:
+            return [[] for _ in embeddings]
+
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        similarities = queries @ entry.matrix.T  # (queries, count) cosine similarities
+        k = min(top_k, count)
+        if k < count:
+            candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(count), (len(queries), count))
+
+        results: list[list[RetrievedChunk]] = []
+        for row, row_candidates in zip(similarities, candidates):
+            ordered = row_candidates[np.argsort(-row[row_candidates], kind="stable")]
+            retrieved: list[RetrievedChunk] = []
+            for index in ordered:
+                distance = max(0.0, 2.0 - 2.0 * float(row[index]))
+                metadata = dict(entry.metadatas[index])
+                metadata["distance"] = distance
+                retrieved.append(
+                    RetrievedChunk(
+                        chunk_id=entry.ids[index],
+                        content=entry.documents[index],
+                        score=_distance_to_similarity(distance),
+                        metadata=metadata,
+                    )
+                )
+            results.append(retrieved)
+        return results
@@ -2,14 +2,29 @@
 
 from __future__ import annotations
 import asyncio
-import random
+import logging
+import os
+import threading
 import time
+import weakref
 from dataclasses import dataclass
-from collections.abc import Callable, Sequence
-from typing import TypeVar, Optional, Union, AsyncGenerator
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from functools import lru_cache, partial
+from typing import TypeVar, Optional, Union, AsyncGenerator, AsyncIterator
 
-from openai import OpenAI
-from openai import APIError, RateLimitError, APIStatusError  # Try and modify if needed.
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
+from openai import APIError, RateLimitError, APIStatusError, BadRequestError  # Try and modify if needed.
+
+from src.rag.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from src.rag.config import Settings, get_settings
+from src.rag.embed_batcher import EmbedBatcher
+from src.rag.embedding_cache import EmbeddingCache, get_embedding_cache
+from src.rag.hedging import Hedger
+from src.rag.rate_limiter import AsyncRateLimitedTransport, RateLimiter, get_rate_limiter, rate_limited_http_client
+from src.rag.retry import RetryBudget, RetryPolicy, get_retry_budget
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar("T") # Generic type variable
 
@@ -17,33 +32,100 @@ T = TypeVar("T") # Generic type variable
 class OpenAIClientConfig:
     api_key: str
     embed_model: str
+    embed_dimensions: int = 1536
     timeout: float = 30.0
-    max_retries: int = 5
-    initial_backoff: float = 1.0
-    max_backoff: float = 30.0
+    # Retries of transient failures, bounded further by the request deadline and the retry budget
+    max_retries: int = 3
+    initial_backoff: float = 0.5
+    max_backoff: float = 8.0
     # new streaming timeout parameters:
     stream_idle_timeout: Optional[float] = None  # e.g., seconds of no chunks before abort
     stream_max_duration: Optional[float] = None  # e.g., max total streaming seconds
+    # connection pool shared by the async clients
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    # Coalescing of concurrent async embed_text calls (0 sends each call on its own)
+    embed_batch_window: float = 0.0
+    embed_batch_max_size: int = 64
+    # Hedging of async embedding calls: a duplicate is sent once a call outlasts
+    # the recent `hedge_quantile` latency (never sooner than hedge_min_delay)
+    hedge_embeddings: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_delay: float = 0.05
 
 class OpenAIClient:
     """Lightweight client with retry/backoff helpers for OpenAI operations."""
-    def __init__(self, config: OpenAIClientConfig) -> None:
+    def __init__(
+        self,
+        config: OpenAIClientConfig,
+        *,
+        embedding_cache: EmbeddingCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_budget: RetryBudget | None = None,
+        circuit_breakers: Mapping[str, CircuitBreaker] | None = None,
+    ) -> None:
         if not config.api_key:
             raise ValueError("OpenAI API key is required")
         self._config = config
-        self._client = OpenAI(api_key=config.api_key, timeout=config.timeout)
+        self._breakers = dict(circuit_breakers or {})
+        # SDK retries are off: _execute_with_retry is the one retry layer
+        self._client = OpenAI(
+            api_key=config.api_key,
+            timeout=config.timeout,
+            max_retries=0,
+            http_client=rate_limited_http_client(rate_limiter, timeout=config.timeout) if rate_limiter is not None else None,
+        )
+        self._embedding_cache = embedding_cache
+        self._retry_policy = _retry_policy(config, retry_budget)
+        # Async counterpart backing the a*/stream methods (same config, cache, limiter, budget and breakers)
+        self._aio = AsyncOpenAIClient(
+            config,
+            embedding_cache=embedding_cache,
+            rate_limiter=rate_limiter,
+            retry_budget=retry_budget,
+            circuit_breakers=circuit_breakers,
+        )
+
+    @property
+    def embedding_cache(self) -> EmbeddingCache | None:
+        return self._embedding_cache
+
+    @property
+    def aio(self) -> AsyncOpenAIClient:
+        return self._aio
+
+    def stats(self) -> dict[str, object]:
+        return self._aio.stats()
 
     def embed_texts(self, texts: Sequence[str], *, model: Optional[str] = None) -> list[list[float]]:
-        """Embed multiple texts"""
+        """Embed multiple texts, serving repeats from the embedding cache when configured."""
         if not texts:
             return []
         target_model = model or self._config.embed_model
+        dimensions = self._config.embed_dimensions
+
+        cache = self._embedding_cache
+        if cache is None:
+            return self._embed_uncached(texts, model=target_model, dimensions=dimensions)
 
-        def operation() -> list[list[float]]:
-            response = self._client.embeddings.create(model=target_model, input=list(texts), dimensions=1536)
+        results = cache.get_many(target_model, dimensions, texts)
+        # Each distinct missing text is sent once, even if repeated in the batch
+        missing = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+        if missing:
+            fresh = self._embed_uncached(missing, model=target_model, dimensions=dimensions)
+            cache.put_many(target_model, dimensions, missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            results = [result if result is not None else by_text[text] for text, result in zip(texts, results)]
+        return results
+
+    def _embed_uncached(self, texts: Sequence[str], *, model: str, dimensions: int) -> list[list[float]]:
+        def operation(timeout: float) -> list[list[float]]:
+            response = self._client.embeddings.create(model=model, input=list(texts), dimensions=dimensions, timeout=timeout)
             return [item.embedding for item in response.data]
 
-        return self._execute_with_retry(operation)
+        return self._execute_with_retry(operation, kind="embeddings")
 
     def embed_text(self, text: str, *, model: Optional[str] = None) -> list[float]:
         """Embed a single text"""
@@ -51,99 +133,425 @@ class OpenAIClient:
         embeddings = self.embed_texts([text], model=model)
         return embeddings[0]
 
+    async def aembed_texts(self, texts: Sequence[str], *, model: Optional[str] = None) -> list[list[float]]:
+        """Async `embed_texts` (see AsyncOpenAIClient)."""
+        return await self._aio.embed_texts(texts, model=model)
+
+    async def aembed_text(self, text: str, *, model: Optional[str] = None) -> list[float]:
+        """Async `embed_text` (see AsyncOpenAIClient)."""
+        return await self._aio.embed_text(text, model=model)
+
     def generate_answer(self, *, instructions: str,prompt: str, model: str, max_output_tokens: int, temperature: Optional[float] = None  ) -> str:
         """Synchronous generation (non-streaming)."""
         if max_output_tokens <= 0:
             raise ValueError("max_output_tokens must be positive")
 
-        def operation() -> str:
-            # Add Temperature if provided
-            response = self._client.responses.create( model=model, instructions=instructions, input=prompt, max_output_tokens=max_output_tokens)
+        params = _response_params(instructions=instructions, prompt=prompt, model=model, max_output_tokens=max_output_tokens, temperature=temperature)
+
+        def operation(timeout: float) -> str:
+            response = self._client.responses.create(**params, timeout=timeout)
             return getattr(response, "output_text", "").strip()
 
-        return self._execute_with_retry(operation)
+        return self._execute_with_retry(operation, kind="responses")
 
-    async def generate_answer_stream(self, *, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: float) -> AsyncGenerator[str, None]:
-        """Asynchronous streaming generation — yields chunks as they arrive."""
-        if max_output_tokens <= 0:
-            raise ValueError("max_output_tokens must be positive")
+    async def agenerate_answer(self, *, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: Optional[float] = None) -> str:
+        """Async `generate_answer` (see AsyncOpenAIClient)."""
+        return await self._aio.generate_answer(
+            instructions=instructions, prompt=prompt, model=model, max_output_tokens=max_output_tokens, temperature=temperature
+        )
+
+    async def generate_answer_stream(self, *, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """Streaming generation — yields text deltas as they arrive (see AsyncOpenAIClient)."""
+        async for delta in self._aio.generate_answer_stream(
+            instructions=instructions, prompt=prompt, model=model, max_output_tokens=max_output_tokens, temperature=temperature
+        ):
+            yield delta
+
+    def _execute_with_retry(self, operation: Callable[[float], T], *, kind: str) -> T:
+        """Run `operation(timeout)` under the client's retry policy (the only retry layer).
+
+        Each attempt passes the `kind` circuit breaker first; an open circuit
+        raises CircuitOpenError, which is not retried.
+        """
+        breaker = self._breakers.get(kind)
+
+        def attempt(remaining: float | None) -> T:
+            timeout = _attempt_timeout(self._config.timeout, remaining)
+            if breaker is None:
+                return operation(timeout)
+            ticket = breaker.before_call()
+            try:
+                result = operation(timeout)
+            except Exception as exc:
+                breaker.record(ticket, exc)
+                raise
+            except BaseException:
+                breaker.abandon(ticket)
+                raise
+            breaker.record(ticket, None)
+            return result
 
-        async def operation_stream() -> AsyncGenerator[str, None]:
-            resp = await self._client.responses.create(
-                model=model,
-                instructions=instructions,
-                input=prompt,
-                temperature=temperature,
-                max_output_tokens=max_output_tokens,
-                stream=True
+        return self._retry_policy.call(attempt)
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """Async transport with one connection pool per event loop and per process.
+
+    httpx connections belong to the loop that opened them, and a forked worker
+    must not reuse its parent's sockets, so the cached client below hands each
+    (process, loop) pair a pool of its own.
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncBaseTransport]) -> None:
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._pools: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncBaseTransport] = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> httpx.AsyncBaseTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pools = weakref.WeakKeyDictionary()
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = self._factory()
+            return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        # Pools of other loops can't be closed from this one; they go with their loop
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None) if self._pid == os.getpid() else None
+        if pool is not None:
+            await pool.aclose()
+
+
+# One client per distinct configuration, shared by every AsyncOpenAIClient in the
+# process; its connection pools are per event loop (see _LoopLocalTransport)
+@lru_cache()
+def _shared_http_client(
+    timeout: float,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    http2: bool,
+    rate_limiter: RateLimiter | None = None,
+) -> httpx.AsyncClient:
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.info("h2 not installed (pip install 'httpx[http2]'); OpenAI requests use HTTP/1.1 keep-alive")
+            http2 = False
+    transport: httpx.AsyncBaseTransport = _LoopLocalTransport(
+        partial(
+            httpx.AsyncHTTPTransport,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+    )
+    if rate_limiter is not None:
+        transport = AsyncRateLimitedTransport(transport, rate_limiter)
+    return DefaultAsyncHttpxClient(transport=transport, timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)))
+
+
+class AsyncOpenAIClient:
+    """OpenAIClient counterpart on AsyncOpenAI: embed, generate and stream without a thread per call.
+
+    Every instance with the same pool settings shares one httpx connection pool
+    per event loop (keep-alive, HTTP/2 when `h2` is installed), so concurrent
+    requests reuse warm TLS connections instead of opening their own.
+    """
+
+    def __init__(
+        self,
+        config: OpenAIClientConfig,
+        *,
+        embedding_cache: EmbeddingCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_budget: RetryBudget | None = None,
+        circuit_breakers: Mapping[str, CircuitBreaker] | None = None,
+    ) -> None:
+        if not config.api_key:
+            raise ValueError("OpenAI API key is required")
+        self._config = config
+        self._rate_limiter = rate_limiter
+        self._retry_policy = _retry_policy(config, retry_budget)
+        self._breakers = dict(circuit_breakers or {})
+        self._hedger = Hedger(quantile=config.hedge_quantile, min_delay=config.hedge_min_delay) if config.hedge_embeddings else None
+        self._client = AsyncOpenAI(
+            api_key=config.api_key,
+            timeout=config.timeout,
+            max_retries=0,
+            http_client=_shared_http_client(
+                config.timeout,
+                config.max_connections,
+                config.max_keepalive_connections,
+                config.keepalive_expiry,
+                config.http2,
+                rate_limiter,
+            ),
+        )
+        self._embedding_cache = embedding_cache
+        self._batcher = (
+            EmbedBatcher(
+                self.embed_texts,
+                window=config.embed_batch_window,
+                max_batch=config.embed_batch_max_size,
+                split_on=(BadRequestError,),
             )
-            async for event in resp:
-                # Extract chunk text from event structure
-                # Example: event.delta.text or event.output_text
-                delta = getattr(event, "delta", None)
-                if delta and hasattr(delta, "text"):
-                    yield delta.text
-                elif getattr(event, "output_text", None):
-                    yield event.output_text
-               # TODO: Handle Event types if needed.
-
-        return self._stream_with_retry(
-            operation_stream,
-            max_duration=self._config.stream_max_duration,
-            idle_timeout=self._config.stream_idle_timeout
+            if config.embed_batch_window > 0
+            else None
         )
 
-    def _execute_with_retry(self, operation: Callable[[], T]) -> T:
-        """Executes a synchronous operation with retry and exponential backoff."""
-        attempt = 0
-        backoff = self._config.initial_backoff
-        while True:
-            try:
-                return operation()
-            except (APIError, RateLimitError, APIStatusError) as exc:
-                attempt += 1
-                if attempt > self._config.max_retries:
-                    raise
-                jitter = random.uniform(0.0, 0.5)
-                sleep_for = min(backoff, self._config.max_backoff) + jitter
-                time.sleep(sleep_for)
-                backoff *= 2
-
-    async def _stream_with_retry( self, operation: Callable[[], AsyncGenerator[str, None]], *, max_duration: Optional[float] = None, idle_timeout: Optional[float] = None ) -> AsyncGenerator[str, None]:
-
-        """ Executes an asynchronous streaming operation with retry and exponential backoff."""
-        attempt = 0
-        backoff = self._config.initial_backoff
-
-        while True:
-            attempt += 1
-            start_time = time.monotonic()
-            last_chunk_time = start_time
+    @property
+    def embedding_cache(self) -> EmbeddingCache | None:
+        return self._embedding_cache
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "embed_batcher": self._batcher.stats() if self._batcher is not None else None,
+            "rate_limiter": self._rate_limiter.stats() if self._rate_limiter is not None else None,
+            "retry_budget": self._retry_policy.budget.stats() if self._retry_policy.budget is not None else None,
+            "hedging": self._hedger.stats() if self._hedger is not None else None,
+            "circuit_breakers": {kind: breaker.stats() for kind, breaker in self._breakers.items()},
+        }
+
+    async def embed_texts(self, texts: Sequence[str], *, model: Optional[str] = None) -> list[list[float]]:
+        """Embed multiple texts, serving repeats from the embedding cache when configured."""
+        if not texts:
+            return []
+        target_model = model or self._config.embed_model
+        dimensions = self._config.embed_dimensions
+
+        cache = self._embedding_cache
+        if cache is None:
+            return await self._embed_uncached(texts, model=target_model, dimensions=dimensions)
+
+        # SQLite I/O (and its busy waits while ingest writes) stays off the event loop
+        results = await asyncio.to_thread(cache.get_many, target_model, dimensions, texts)
+        missing = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+        if missing:
+            fresh = await self._embed_uncached(missing, model=target_model, dimensions=dimensions)
+            await asyncio.to_thread(cache.put_many, target_model, dimensions, missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            results = [result if result is not None else by_text[text] for text, result in zip(texts, results)]
+        return results
+
+    async def _embed_uncached(self, texts: Sequence[str], *, model: str, dimensions: int) -> list[list[float]]:
+        async def operation(timeout: float) -> list[list[float]]:
+            response = await self._client.embeddings.create(model=model, input=list(texts), dimensions=dimensions, timeout=timeout)
+            return [item.embedding for item in response.data]
+
+        # Embedding the same texts twice is harmless, so slow calls may be hedged
+        return await self._execute_with_retry(operation, kind="embeddings", hedge=True)
+
+    async def embed_text(self, text: str, *, model: Optional[str] = None) -> list[float]:
+        """Embed a single text, sharing one request with concurrent callers when batching is on."""
+        if self._batcher is None or (model and model != self._config.embed_model):
+            embeddings = await self.embed_texts([text], model=model)
+            return embeddings[0]
+        cache = self._embedding_cache
+        if cache is not None:
+            # A cache hit shouldn't wait out the batch window
+            cached = (await asyncio.to_thread(cache.get_many, self._config.embed_model, self._config.embed_dimensions, [text]))[0]
+            if cached is not None:
+                return cached
+        return await self._batcher.embed(text)
+
+    async def generate_answer(self, *, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: Optional[float] = None) -> str:
+        """Non-streaming generation."""
+        if max_output_tokens <= 0:
+            raise ValueError("max_output_tokens must be positive")
+
+        params = _response_params(instructions=instructions, prompt=prompt, model=model, max_output_tokens=max_output_tokens, temperature=temperature)
+
+        async def operation(timeout: float) -> str:
+            response = await self._client.responses.create(**params, timeout=timeout)
+            return getattr(response, "output_text", "").strip()
+
+        return await self._execute_with_retry(operation, kind="responses")
+
+    async def generate_answer_stream(self, *, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield answer text deltas as they arrive.
+
+        Opening the stream is retried like any other call. A failure after text
+        has been yielded is raised rather than retried, since a replay would
+        repeat output. `stream_idle_timeout` bounds the gap between events and
+        `stream_max_duration` the whole stream.
+        """
+        if max_output_tokens <= 0:
+            raise ValueError("max_output_tokens must be positive")
+        params = _response_params(instructions=instructions, prompt=prompt, model=model, max_output_tokens=max_output_tokens, temperature=temperature)
+        params["stream"] = True
+
+        async def operation(timeout: float):
+            # Bounds opening the stream; the stream itself is bounded by the stream timeouts
+            return await self._client.responses.create(**params, timeout=timeout)
+
+        stream = await self._execute_with_retry(operation, kind="responses")
+        idle_timeout = self._config.stream_idle_timeout
+        max_duration = self._config.stream_max_duration
+        started = time.monotonic()
+        events = stream.__aiter__()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), idle_timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No stream event received for {idle_timeout}s") from None
+                if max_duration is not None and time.monotonic() - started > max_duration:
+                    raise TimeoutError(f"Stream exceeded max duration of {max_duration}s")
+
+                event_type = getattr(event, "type", "")
+                if event_type == "response.output_text.delta":
+                    yield event.delta
+                elif event_type in ("error", "response.failed"):
+                    raise RuntimeError(f"Stream failed: {getattr(event, 'message', None) or event_type}")
+        finally:
+            await stream.close()
+
+    async def _execute_with_retry(self, operation: Callable[[float], Awaitable[T]], *, kind: str, hedge: bool = False) -> T:
+        """Await `operation(timeout)` under the client's retry policy (the only retry layer).
+
+        Each attempt passes the `kind` circuit breaker first (an open circuit
+        raises CircuitOpenError, which is not retried) and, with `hedge` and
+        hedging enabled, is hedged; the breaker sees a hedged pair as one call.
+        """
+        breaker = self._breakers.get(kind)
+        hedger = self._hedger if hedge else None
+
+        async def attempt(remaining: float | None) -> T:
+            timeout = _attempt_timeout(self._config.timeout, remaining)
+            call = partial(operation, timeout)
+            ticket = breaker.before_call() if breaker is not None else 0
             try:
-                async for chunk in await operation():
-                    now = time.monotonic()
-                    last_chunk_time = now
-                    yield chunk
+                result = await (hedger.run(call) if hedger is not None else call())
+            except Exception as exc:
+                if breaker is not None:
+                    breaker.record(ticket, exc)
+                raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.abandon(ticket)
+                raise
+            if breaker is not None:
+                breaker.record(ticket, None)
+            return result
+
+        return await self._retry_policy.acall(attempt)
+
+
+# Arguments of responses.create; temperature is only sent when set (some models reject it)
+def _response_params(*, instructions: str, prompt: str, model: str, max_output_tokens: int, temperature: Optional[float]) -> dict[str, object]:
+    params: dict[str, object] = {
+        "model": model,
+        "instructions": instructions,
+        "input": prompt,
+        "max_output_tokens": max_output_tokens,
+    }
+    if temperature is not None:
+        params["temperature"] = temperature
+    return params
+
+
+def _retry_policy(config: OpenAIClientConfig, budget: RetryBudget | None) -> RetryPolicy:
+    return RetryPolicy(
+        max_retries=config.max_retries,
+        initial_backoff=config.initial_backoff,
+        max_backoff=config.max_backoff,
+        budget=budget,
+    )
+
+
+# Per-attempt timeout: the configured one, cut short by the request deadline
+def _attempt_timeout(timeout: float, remaining: float | None) -> float:
+    return timeout if remaining is None else max(0.001, min(timeout, remaining))
+
+
+def _circuit_breakers(settings: Settings) -> dict[str, CircuitBreaker]:
+    breakers = {kind: get_circuit_breaker(kind, settings) for kind in ("embeddings", "responses")}
+    return {kind: breaker for kind, breaker in breakers.items() if breaker is not None}
+
+
+def _client_config(settings: Settings) -> OpenAIClientConfig:
+    if not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+    return OpenAIClientConfig(
+        api_key=settings.openai_api_key,
+        embed_model=settings.embed_model,
+        embed_dimensions=settings.embed_dimensions,
+        timeout=settings.openai_timeout,
+        max_retries=settings.max_embed_retries,
+        initial_backoff=settings.retry_initial_backoff,
+        max_backoff=settings.retry_max_backoff,
+        stream_idle_timeout=settings.stream_idle_timeout or None,
+        stream_max_duration=settings.stream_max_duration or None,
+        max_connections=settings.openai_max_connections,
+        max_keepalive_connections=settings.openai_max_keepalive_connections,
+        keepalive_expiry=settings.openai_keepalive_expiry,
+        http2=settings.openai_http2,
+        embed_batch_window=settings.embed_batch_window_ms / 1000.0,
+        embed_batch_max_size=settings.embed_batch_max_size,
+        hedge_embeddings=settings.hedge_embeddings,
+        hedge_quantile=settings.hedge_quantile,
+        hedge_min_delay=settings.hedge_min_delay_ms / 1000.0,
+    )
+
 
-                    # Check total duration
-                    if max_duration is not None and (now - start_time) > max_duration:
-                        raise RuntimeError(f"Stream exceeded max duration of {max_duration}s")
+def get_openai_client(settings: Settings | None = None, *, interactive: bool = True) -> OpenAIClient:
+    """Factory to build an OpenAIClient (with the shared embedding cache) from app settings.
 
-                # Completed the stream normally
-                return
+    The retry budget protects the query path during outages; batch callers pass
+    `interactive=False` to retry each call up to MAX_EMBED_RETRIES regardless.
+    """
+    active_settings = settings or get_settings()
+    return OpenAIClient(
+        _client_config(active_settings),
+        embedding_cache=get_embedding_cache(active_settings),
+        rate_limiter=get_rate_limiter(active_settings),
+        retry_budget=get_retry_budget(active_settings) if interactive else None,
+        circuit_breakers=_circuit_breakers(active_settings),
+    )
 
-            except (APIError, RateLimitError, APIStatusError, RuntimeError) as exc:
-                now = time.monotonic()
-                # Check idle timeout
-                if idle_timeout is not None and (now - last_chunk_time) > idle_timeout:
-                    exc = RuntimeError(f"No stream chunk received for {(now - last_chunk_time):.1f}s (> {idle_timeout}s)")
 
-                if attempt > self._config.max_retries:
-                    raise exc
+def get_async_openai_client(settings: Settings | None = None) -> AsyncOpenAIClient:
+    """Factory to build an AsyncOpenAIClient (shared connection pool and embedding cache) from app settings."""
+    active_settings = settings or get_settings()
+    return AsyncOpenAIClient(
+        _client_config(active_settings),
+        embedding_cache=get_embedding_cache(active_settings),
+        rate_limiter=get_rate_limiter(active_settings),
+        retry_budget=get_retry_budget(active_settings),
+        circuit_breakers=_circuit_breakers(active_settings),
+    )
 
-                jitter = random.uniform(0.0, 0.5)
-                sleep_for = min(backoff, self._config.max_backoff) + jitter
-                await asyncio.sleep(sleep_for)
-                backoff *= 2
-                # then retry loop continues
 
+@lru_cache()
+def get_shared_async_openai(settings: Settings | None = None) -> AsyncOpenAI:
+    """Bare AsyncOpenAI on the shared pool and rate limiter, for SDKs that take their own client."""
+    config = _client_config(settings or get_settings())
+    # SDK retries are off here too, so nothing retries outside the shared retry budget
+    return AsyncOpenAI(
+        api_key=config.api_key,
+        timeout=config.timeout,
+        max_retries=0,
+        http_client=_shared_http_client(
+            config.timeout,
+            config.max_connections,
+            config.max_keepalive_connections,
+            config.keepalive_expiry,
+            config.http2,
+            get_rate_limiter(settings or get_settings()),
+        ),
+    )
@@ -0,0 +1,298 @@
+""" Chroma store split into per-patient (or hash-bucketed) collections. """
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Sequence
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+
+import chromadb
+from chromadb.api import ServerAPI
+from chromadb.api.client import Client as ChromaClient
+from chromadb.api.shared_system_client import SharedSystemClient
+from chromadb.config import Settings as ChromaSettings, System
+from chromadb.telemetry.product import ProductTelemetryClient
+
+from src.rag.vector_store import (
+    DocumentChunk,
+    RecordBatch,
+    RetrievedChunk,
+    VectorStore,
+    _iter_collection,
+    _query_collection,
+    _upsert_collection,
+    metadata_filter,
+)
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MODES = ("patient", "hash")
+ROUTES_FILENAME = "partition_routes.sqlite3"
+
+# Keyed by collection name too: every collection in the directory shares the file
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_routes (
+    collection TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    patient_id TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunk_routes_patient ON chunk_routes (collection, patient_id);
+"""
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+_UNSAFE_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]+")
+
+
+# Persistent client whose backend keeps at most `max_open` HNSW indexes loaded,
+# evicting the least recently used. Chroma's Rust backend sizes that cache from
+# the open-file limit (RLIMIT_NOFILE / 5) and ignores chroma_memory_limit_bytes,
+# so the cache size is set on the API before the system starts.
+def _bounded_client(path: Path, max_open: int):
+    settings = ChromaSettings(is_persistent=True, persist_directory=str(path))
+    if SharedSystemClient._get_identifier_from_settings(settings) in SharedSystemClient._identifier_to_system:
+        logger.info("Chroma at %s is already open in this process; keeping its index cache size", path)
+        return chromadb.PersistentClient(path=str(path))
+    system = System(settings)
+    system.instance(ProductTelemetryClient)
+    server = system.instance(ServerAPI)
+    if hasattr(server, "hnsw_cache_size"):
+        server.hnsw_cache_size = max_open
+    system.start()
+    return ChromaClient.from_system(system)
+
+
+class PartitionedChromaVectorStore(VectorStore):
+    """Routes each patient's chunks to their own Chroma collection.
+
+    In "patient" mode every patient gets a collection, so a patient query walks
+    only that patient's index and needs no metadata filter, and dropping a
+    patient drops a collection. "hash" mode spreads patients over `buckets`
+    collections, for deployments with very many small patients; queries then
+    still filter by patient, but within one bucket.
+
+    Collections are opened lazily; at most `max_open` partition indexes stay
+    loaded in Chroma (least recently used first out) and as many handles are
+    kept here. A small SQLite table maps chunk ids to partitions so deletes by
+    id touch only the partitions that hold them. Queries without a patient fan
+    out to every partition.
+    """
+
+    def __init__(
+        self,
+        *,
+        persist_directory: Path,
+        collection_name: str,
+        mode: str = "patient",
+        buckets: int = 64,
+        max_open: int = 32,
+    ) -> None:
+        if mode not in PARTITION_MODES:
+            raise ValueError(f"Unknown partitioning mode {mode!r}; expected one of {PARTITION_MODES}")
+        persist_directory.mkdir(parents=True, exist_ok=True)
+        self._client = _bounded_client(persist_directory, max(1, max_open))
+        self._collection_name = collection_name
+        self._prefix = f"{collection_name}-{'p' if mode == 'patient' else 'b'}-"
+        self._mode = mode
+        self._buckets = max(1, buckets)
+        self._max_open = max(1, max_open)
+        self._open: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self._routes = sqlite3.connect(str(persist_directory / ROUTES_FILENAME), check_same_thread=False, timeout=30.0)
+        self._routes.execute("PRAGMA journal_mode=WAL")
+        self._routes.executescript(_SCHEMA)
+        self._migrate_routes()
+
+    # Routes written before they were keyed by collection: adopt the rows of our partitions
+    def _migrate_routes(self) -> None:
+        if self._routes.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'routes'").fetchone() is None:
+            return
+        with self._routes:
+            self._routes.execute(
+                "INSERT OR IGNORE INTO chunk_routes (collection, chunk_id, patient_id, partition) "
+                "SELECT ?, chunk_id, patient_id, partition FROM routes WHERE substr(partition, 1, ?) = ?",
+                (self._collection_name, len(self._prefix), self._prefix),
+            )
+            self._routes.execute("DELETE FROM routes WHERE substr(partition, 1, ?) = ?", (len(self._prefix), self._prefix))
+
+    def partition_for(self, patient_id: str) -> str:
+        """Collection name holding `patient_id`'s chunks (a valid Chroma name)."""
+        digest = hashlib.blake2b(patient_id.encode("utf-8"), digest_size=8).digest()
+        if self._mode == "hash":
+            return f"{self._prefix}{int.from_bytes(digest, 'little') % self._buckets:04d}"
+        slug = _UNSAFE_NAME_CHARS.sub("-", patient_id).strip("-_")[:48]
+        return f"{self._prefix}{slug}-{digest[:4].hex()}"
+
+    def partitions(self) -> list[str]:
+        """Names of every existing partition collection."""
+        return sorted(
+            collection.name for collection in self._client.list_collections() if collection.name.startswith(self._prefix)
+        )
+
+    # Opened collection handle, or None when it doesn't exist and `create` is False
+    def _collection(self, name: str, *, create: bool):
+        with self._lock:
+            collection = self._open.get(name)
+            if collection is not None:
+                self._open.move_to_end(name)
+                return collection
+        if create:
+            collection = self._client.get_or_create_collection(name=name)
+        else:
+            try:
+                collection = self._client.get_collection(name=name)
+            except Exception:
+                return None
+        with self._lock:
+            self._open[name] = collection
+            self._open.move_to_end(name)
+            while len(self._open) > self._max_open:
+                evicted, _ = self._open.popitem(last=False)
+                logger.debug("Closed partition %s (LRU)", evicted)
+        return collection
+
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        if not chunks:
+            return
+        if len(chunks) != len(embeddings):
+            raise ValueError("Chunks and embeddings must have equal length")
+
+        grouped: dict[str, tuple[list[DocumentChunk], list[Sequence[float]]]] = {}
+        for chunk, embedding in zip(chunks, embeddings):
+            group = grouped.setdefault(self.partition_for(chunk.patient_id), ([], []))
+            group[0].append(chunk)
+            group[1].append(embedding)
+
+        # A chunk that moved patient must leave its old partition
+        previous = self._lookup_routes([chunk.chunk_id for chunk in chunks])
+        moved: dict[str, list[str]] = {}
+        for chunk in chunks:
+            old_partition = previous.get(chunk.chunk_id)
+            if old_partition is not None and old_partition != self.partition_for(chunk.patient_id):
+                moved.setdefault(old_partition, []).append(chunk.chunk_id)
+        for partition, chunk_ids in moved.items():
+            collection = self._collection(partition, create=False)
+            if collection is not None:
+                collection.delete(ids=chunk_ids)
+
+        for partition, (partition_chunks, partition_embeddings) in grouped.items():
+            _upsert_collection(self._collection(partition, create=True), partition_chunks, partition_embeddings)
+
+        with self._lock:
+            self._routes.executemany(
+                "INSERT OR REPLACE INTO chunk_routes (collection, chunk_id, patient_id, partition) VALUES (?, ?, ?, ?)",
+                [
+                    (self._collection_name, chunk.chunk_id, chunk.patient_id, self.partition_for(chunk.patient_id))
+                    for chunk in chunks
+                ],
+            )
+            self._routes.commit()
+
+    def _lookup_routes(self, chunk_ids: Sequence[str]) -> dict[str, str]:
+        found: dict[str, str] = {}
+        unique = list(dict.fromkeys(chunk_ids))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                part = unique[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(part))
+                rows = self._routes.execute(
+                    f"SELECT chunk_id, partition FROM chunk_routes WHERE collection = ? AND chunk_id IN ({placeholders})",
+                    [self._collection_name, *part],
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        if not chunk_ids:
+            return
+        by_partition: dict[str, list[str]] = {}
+        for chunk_id, partition in self._lookup_routes(chunk_ids).items():
+            by_partition.setdefault(partition, []).append(chunk_id)
+        for partition, ids in by_partition.items():
+            collection = self._collection(partition, create=False)
+            if collection is not None:
+                collection.delete(ids=ids)
+        with self._lock:
+            self._routes.executemany(
+                "DELETE FROM chunk_routes WHERE collection = ? AND chunk_id = ?",
+                [(self._collection_name, chunk_id) for chunk_id in chunk_ids],
+            )
+            self._routes.commit()
+
+    def delete_patient(self, patient_id: str) -> None:
+        """Remove every chunk of a patient; in patient mode this drops one collection."""
+        partition = self.partition_for(patient_id)
+        if self._mode == "patient":
+            with self._lock:
+                self._open.pop(partition, None)
+            try:
+                self._client.delete_collection(name=partition)
+            except Exception:
+                logger.debug("Partition %s did not exist", partition)
+        else:
+            collection = self._collection(partition, create=False)
+            if collection is not None:
+                collection.delete(where={"patient_id": patient_id})
+        with self._lock:
+            self._routes.execute(
+                "DELETE FROM chunk_routes WHERE collection = ? AND patient_id = ?", (self._collection_name, patient_id)
+            )
+            self._routes.commit()
+
+    def clear(self) -> None:
+        """Drop every partition of this collection and its routes."""
+        with self._lock:
+            self._open.clear()
+        for partition in self.partitions():
+            self._client.delete_collection(name=partition)
+        with self._lock:
+            self._routes.execute("DELETE FROM chunk_routes WHERE collection = ?", (self._collection_name,))
+            self._routes.commit()
+
+    def iter_records(self, *, batch_size: int = 5000) -> Iterator[RecordBatch]:
+        for partition in self.partitions():
+            collection = self._collection(partition, create=False)
+            if collection is not None:
+                yield from _iter_collection(collection, batch_size=batch_size)
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Query the patient's partition, or every partition when no patient is given."""
+        if not embeddings:
+            return []
+        filters = metadata_filter(patient_id, where) or {}
+        patient = filters.get("patient_id")
+        if patient is not None:
+            if self._mode == "patient":
+                # Everything in the partition belongs to the patient; skip the filter
+                filters = {key: value for key, value in filters.items() if key != "patient_id"}
+            collection = self._collection(self.partition_for(str(patient)), create=False)
+            if collection is None:
+                return [[] for _ in embeddings]
+            return _query_collection(collection, embeddings, top_k=top_k, filters=filters or None)
+
+        merged: list[list[RetrievedChunk]] = [[] for _ in embeddings]
+        for partition in self.partitions():
+            collection = self._collection(partition, create=False)
+            if collection is None:
+                continue
+            for combined, found in zip(merged, _query_collection(collection, embeddings, top_k=top_k, filters=filters or None)):
+                combined.extend(found)
+        return [
+            sorted(found, key=lambda chunk: float(chunk.metadata.get("distance", 0.0)))[:top_k]
+            for found in merged
+        ]
@@ -0,0 +1,113 @@
+""" Per-stage timing for ingestion runs. """
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import logging
+import math
+import threading
+import time
+from typing import Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageStats:
+    """Durations and volume recorded for one pipeline stage."""
+
+    durations: list[float] = field(default_factory=list)
+    bytes: int = 0
+    items: int = 0
+
+    @property
+    def total(self) -> float:
+        return sum(self.durations)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+        return ordered[index]
+
+
+class IngestProfiler:
+    """Thread-safe collector of per-stage timings (parse, chunk, embed, upsert, ...)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: dict[str, StageStats] = {}
+        self._started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float, *, bytes: int = 0, items: int = 0) -> None:
+        with self._lock:
+            stats = self._stages.setdefault(stage, StageStats())
+            stats.durations.append(seconds)
+            stats.bytes += bytes
+            stats.items += items
+
+    @contextmanager
+    def stage(self, stage: str, *, bytes: int = 0, items: int = 0) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, bytes=bytes, items=items)
+
+    # Wraps an iterator, charging the time spent producing each item to `stage`.
+    # One sample per item; `items` counts the items produced.
+    def timed_iter(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, time.perf_counter() - started, items=1)
+            yield item
+
+    def summary(self) -> list[dict[str, object]]:
+        with self._lock:
+            rows = []
+            for name, stats in self._stages.items():
+                total = stats.total
+                rows.append(
+                    {
+                        "stage": name,
+                        "count": len(stats.durations),
+                        "total_s": round(total, 4),
+                        "p50_ms": round(stats.percentile(0.5) * 1000, 3),
+                        "p95_ms": round(stats.percentile(0.95) * 1000, 3),
+                        "bytes": stats.bytes,
+                        "items": stats.items,
+                        "items_per_s": round(stats.items / total, 1) if total > 0 else 0.0,
+                    }
+                )
+            return rows
+
+    @property
+    def wall_time(self) -> float:
+        return time.perf_counter() - self._started
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        rows = self.summary()
+        if not rows:
+            return
+        logger.info("Ingestion profile (wall %.2fs):", self.wall_time)
+        logger.info("  %-8s %8s %10s %10s %10s %12s %8s %10s", "stage", "count", "total s", "p50 ms", "p95 ms", "bytes", "items", "items/s")
+        for row in rows:
+            logger.info(
+                "  %-8s %8d %10.3f %10.3f %10.3f %12d %8d %10.1f",
+                row["stage"],
+                row["count"],
+                row["total_s"],
+                row["p50_ms"],
+                row["p95_ms"],
+                row["bytes"],
+                row["items"],
+                row["items_per_s"],
+            )
@@ -0,0 +1,467 @@
+""" Quantized, memory-mapped vector index searched with an exact float rescoring pass. """
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from src.rag.numpy_store import _normalize
+from src.rag.vector_store import ChromaVectorStore, DocumentChunk, RetrievedChunk, _distance_to_similarity, metadata_filter
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("int8", "float16")
+_CURRENT_FILENAME = "CURRENT"
+_GENERATION_FILENAME = "GENERATION"
+_INDEX_FILENAME = "index.json"
+_STALE_CHECK_INTERVAL = 1.0  # seconds between freshness checks while serving queries
+_SCAN_BLOCK_ROWS = 65536  # rows dequantized at a time during the first pass
+_CHROMA_PAGE_SIZE = 5000
+# Superseded versions younger than this are kept: another process may have just
+# read CURRENT and not opened the version yet
+_VERSION_GRACE_SECONDS = 300.0
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> tuple[np.ndarray, np.ndarray]:
+    """Quantize unit vectors; returns (codes, per-vector scales).
+
+    int8 uses a symmetric per-vector scale (max |x| / 127); float16 needs no
+    scale, so its scales are all ones.
+    """
+    if quantization == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    if quantization != "int8":
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+    scales = np.abs(vectors).max(axis=1, initial=0.0) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Leading `dimensions` components, re-normalised (a Matryoshka-shortened embedding).
+
+    text-embedding-3 models are trained so that these prefixes are embeddings in
+    their own right. Returns `vectors` unchanged when `dimensions` is 0 or not
+    shorter than the vectors.
+    """
+    if dimensions <= 0 or vectors.ndim != 2 or dimensions >= vectors.shape[1]:
+        return vectors
+    return _normalize(vectors[:, :dimensions])
+
+
+@dataclass(frozen=True)
+class QuantizedIndex:
+    """One immutable on-disk version of the index, opened with memory maps.
+
+    Rows are grouped by patient so a patient's vectors are one contiguous slice
+    of `codes` (first pass) and of `vectors` (float16, read only for rescoring).
+    With `search_dimensions`, `codes` hold only that many leading dimensions.
+    Each row's id, document and metadata are one JSON record in `records`,
+    decoded only for the rows a query returns.
+    """
+
+    directory: Path
+    generation: str
+    source_count: int
+    # patient_id -> (start, stop) row range
+    patient_ranges: dict[str, tuple[int, int]]
+    codes: np.ndarray
+    scales: np.ndarray
+    vectors: np.ndarray
+    # count + 1 byte offsets into `records`
+    offsets: np.ndarray
+    records: np.ndarray
+    search_dimensions: int = 0
+
+    @classmethod
+    def open(cls, directory: Path) -> QuantizedIndex:
+        payload = json.loads((directory / _INDEX_FILENAME).read_text(encoding="utf-8"))
+        codes = np.load(directory / "codes.npy", mmap_mode="r")
+        # float16 codes over every dimension double as the rescoring vectors
+        vectors_path = directory / "vectors.npy"
+        offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        records_path = directory / "records.bin"
+        return cls(
+            directory=directory,
+            generation=payload["generation"],
+            source_count=int(payload["source_count"]),
+            patient_ranges={key: (int(start), int(stop)) for key, (start, stop) in payload["patient_ranges"].items()},
+            codes=codes,
+            scales=np.load(directory / "scales.npy", mmap_mode="r"),
+            vectors=np.load(vectors_path, mmap_mode="r") if vectors_path.exists() else codes,
+            offsets=offsets,
+            records=np.memmap(records_path, dtype=np.uint8, mode="r") if records_path.stat().st_size else np.empty(0, dtype=np.uint8),
+            search_dimensions=int(payload.get("search_dimensions", 0)),
+        )
+
+    @classmethod
+    def write(
+        cls,
+        directory: Path,
+        *,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Mapping[str, object]],
+        vectors: np.ndarray,
+        quantization: str,
+        generation: str,
+        search_dimensions: int = 0,
+    ) -> None:
+        """Write a new version; `vectors` must already be L2-normalised float32."""
+        patient_ids = [str(metadata.get("patient_id", "")) for metadata in metadatas]
+        order = sorted(range(len(ids)), key=lambda index: (patient_ids[index], index))
+        ordered_vectors = np.ascontiguousarray(vectors[order], dtype=np.float32) if len(order) else vectors
+
+        patient_ranges: dict[str, list[int]] = {}
+        for row, index in enumerate(order):
+            patient_ranges.setdefault(patient_ids[index], [row, row])[1] = row + 1
+
+        codes, scales = quantize(truncate(ordered_vectors, search_dimensions), quantization)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "codes.npy", codes)
+        np.save(directory / "scales.npy", scales)
+        if quantization != "float16" or search_dimensions:
+            np.save(directory / "vectors.npy", ordered_vectors.astype(np.float16))
+
+        offsets = np.zeros(len(order) + 1, dtype=np.uint64)
+        with (directory / "records.bin").open("wb") as out:
+            for row, index in enumerate(order):
+                record = json.dumps([ids[index], documents[index], metadatas[index]], separators=(",", ":")).encode("utf-8")
+                out.write(record)
+                offsets[row + 1] = offsets[row] + len(record)
+        np.save(directory / "offsets.npy", offsets)
+
+        (directory / _INDEX_FILENAME).write_text(
+            json.dumps(
+                {
+                    "generation": generation,
+                    "source_count": len(order),
+                    "quantization": quantization,
+                    "search_dimensions": search_dimensions,
+                    "patient_ranges": patient_ranges,
+                }
+            ),
+            encoding="utf-8",
+        )
+
+    @property
+    def count(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def resident_bytes(self) -> int:
+        """Bytes scanned by the first pass (the rescoring vectors are only touched for the shortlist)."""
+        return self.codes.nbytes + self.scales.nbytes
+
+    def row_range(self, patient_id: str | None) -> tuple[int, int]:
+        if not patient_id:
+            return 0, self.count
+        return self.patient_ranges.get(patient_id, (0, 0))
+
+    def record(self, row: int) -> tuple[str, str, dict[str, object]]:
+        """(id, document, metadata) of one row, decoded from the mapped records."""
+        chunk_id, document, metadata = json.loads(self.records[int(self.offsets[row]) : int(self.offsets[row + 1])].tobytes())
+        return chunk_id, document, metadata
+
+
+class QuantizedVectorStore(ChromaVectorStore):
+    """VectorStore that searches an int8/float16 memory-mapped copy of the collection.
+
+    Chroma stays the system of record but is only opened for writes, rebuilds
+    and filters on metadata other than the patient. The quantized index lives
+    under `index_directory` as immutable versions holding the codes, float16
+    rescoring vectors (none for full-width float16 codes, which serve as both)
+    and each row's id, document and metadata. Writes through this class bump a
+    generation counter and the writer rebuilds the index in `refresh()` (ingest
+    calls it at the end of a run). Queries compare that generation file only;
+    when it says the index is stale they keep serving it while one background
+    thread rebuilds, and only build inline when there is no index at all. A
+    query takes the best `top_k * rescore_factor` rows by quantized score,
+    rescores them against the full vectors and reads the final `top_k` records
+    from the index, with no Chroma round trip.
+
+    `search_dimensions` shortens the first pass to that many leading
+    (Matryoshka) dimensions, which shrinks the resident codes and the scan in
+    proportion; rescoring still uses the full vectors.
+    """
+
+    def __init__(
+        self,
+        *,
+        persist_directory: Path,
+        collection_name: str,
+        index_directory: Path | None = None,
+        quantization: str = "int8",
+        rescore_factor: int = 4,
+        search_dimensions: int = 0,
+    ) -> None:
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+        self._persist_directory = persist_directory
+        self._collection_name = collection_name
+        self._chroma = None
+        self._chroma_lock = threading.Lock()
+        self._root = index_directory or persist_directory / "quantized" / collection_name
+        self._quantization = quantization
+        self._rescore_factor = max(1, rescore_factor)
+        self._search_dimensions = max(0, search_dimensions)
+        self._lock = threading.Lock()
+        self._index: QuantizedIndex | None = None
+        self._checked_at = 0.0
+        self._rebuilding = False
+
+    # Chroma is opened on first use; queries answered from the index never need it
+    @property
+    def _collection(self):
+        if self._chroma is None:
+            with self._chroma_lock:
+                if self._chroma is None:
+                    ChromaVectorStore.__init__(self, persist_directory=self._persist_directory, collection_name=self._collection_name)
+        return self._chroma
+
+    @_collection.setter
+    def _collection(self, collection) -> None:
+        self._chroma = collection
+
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        super().upsert(chunks, embeddings)
+        if chunks:
+            self._bump_generation()
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        super().delete(chunk_ids)
+        if chunk_ids:
+            self._bump_generation()
+
+    def clear(self) -> None:
+        super().clear()
+        self._bump_generation()
+
+    def _bump_generation(self) -> None:
+        self._root.mkdir(parents=True, exist_ok=True)
+        _replace_text(self._root / _GENERATION_FILENAME, f"{time.time_ns()}-{uuid.uuid4().hex}")
+        with self._lock:
+            self._checked_at = 0.0
+
+    def _current_generation(self) -> str:
+        try:
+            return (self._root / _GENERATION_FILENAME).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return ""
+
+    def _open_current(self) -> QuantizedIndex | None:
+        try:
+            name = (self._root / _CURRENT_FILENAME).read_text(encoding="utf-8").strip()
+            return QuantizedIndex.open(self._root / name)
+        except (FileNotFoundError, KeyError, ValueError) as exc:
+            if not isinstance(exc, FileNotFoundError):
+                logger.warning("Ignoring unreadable quantized index under %s: %s", self._root, exc)
+            return None
+
+    # Returns the newest index. Freshness is re-checked at most once per
+    # _STALE_CHECK_INTERVAL; a stale index keeps serving while it is rebuilt in
+    # the background, and the query only waits when there is no index yet.
+    def index(self) -> QuantizedIndex:
+        with self._lock:
+            now = time.monotonic()
+            if self._index is not None and now - self._checked_at < _STALE_CHECK_INTERVAL:
+                return self._index
+            self._checked_at = now
+
+            generation = self._current_generation()
+            index = self._index
+            if index is None or not self._is_current(index, generation):
+                index = self._open_current() or index
+            if index is None:
+                index = self._rebuild(generation)
+            elif not self._is_current(index, generation) and not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild_in_background, args=(generation,), name="quantized-rebuild", daemon=True).start()
+            self._index = index
+            return index
+
+    def _rebuild_in_background(self, generation: str) -> None:
+        try:
+            index = self._rebuild(generation)
+        except Exception:
+            logger.exception("Background rebuild of the quantized index failed; serving the previous version")
+            index = None
+        with self._lock:
+            if index is not None:
+                self._index = index
+            self._rebuilding = False
+
+    def refresh(self) -> None:
+        """Rebuild the quantized index now if writes made it stale, so queries don't have to.
+
+        Unlike the query path this also compares the collection size, which
+        catches writes made to the collection without going through this class.
+        """
+        with self._lock:
+            generation = self._current_generation()
+            count = self._collection.count()
+            index = self._index
+            if index is None or not self._is_current(index, generation, count):
+                index = self._open_current()
+            if index is None or not self._is_current(index, generation, count):
+                index = self._rebuild(generation)
+            self._index = index
+            self._checked_at = time.monotonic()
+
+    def warmup(self) -> None:
+        """Open (or build) the quantized index and fault its first-pass codes into memory."""
+        index = self.index()
+        for start in range(0, index.count, _SCAN_BLOCK_ROWS):
+            np.asarray(index.codes[start : start + _SCAN_BLOCK_ROWS]).sum()
+
+    def _is_current(self, index: QuantizedIndex, generation: str, count: int | None = None) -> bool:
+        return (
+            index.generation == generation
+            and (count is None or index.source_count == count)
+            and index.search_dimensions == self._search_dimensions
+        )
+
+    def _rebuild(self, generation: str) -> QuantizedIndex:
+        started = time.perf_counter()
+        ids: list[str] = []
+        documents: list[str] = []
+        metadatas: list[dict[str, object]] = []
+        blocks: list[np.ndarray] = []
+        offset = 0
+        while True:
+            page = self._collection.get(include=["embeddings", "documents", "metadatas"], limit=_CHROMA_PAGE_SIZE, offset=offset)
+            page_ids = page.get("ids") or []
+            if not page_ids:
+                break
+            ids.extend(page_ids)
+            documents.extend(document or "" for document in page.get("documents") or [])
+            metadatas.extend(dict(metadata or {}) for metadata in page.get("metadatas") or [])
+            blocks.append(_normalize(np.asarray(page["embeddings"], dtype=np.float32)))
+            offset += len(page_ids)
+
+        vectors = np.concatenate(blocks) if blocks else np.empty((0, 0), dtype=np.float32)
+        name = f"v{time.time_ns()}"
+        previous = _read_text(self._root / _CURRENT_FILENAME)
+        QuantizedIndex.write(
+            self._root / name,
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            vectors=vectors,
+            quantization=self._quantization,
+            generation=generation,
+            search_dimensions=self._search_dimensions,
+        )
+        _replace_text(self._root / _CURRENT_FILENAME, name)
+        _prune_versions(self._root, keep={name, previous})
+
+        logger.info("Built %s quantized index of %s vectors in %.2fs", self._quantization, len(ids), time.perf_counter() - started)
+        return QuantizedIndex.open(self._root / name)
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Quantized first pass over the patient's rows, exact float rescoring of the best candidates."""
+        if not embeddings:
+            return []
+        filters = metadata_filter(patient_id, where) or {}
+        if set(filters) - {"patient_id"}:
+            # Filters on other metadata are answered by Chroma
+            return super().similarity_search_many(embeddings, top_k=top_k, patient_id=patient_id, where=where)
+        patient_id = filters.get("patient_id")
+        index = self.index()
+        start, stop = index.row_range(patient_id)
+        if stop <= start or top_k <= 0:
+            return [[] for _ in embeddings]
+
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        first_pass = truncate(queries, index.search_dimensions)
+        approximate = np.empty((len(queries), stop - start), dtype=np.float32)
+        for block_start in range(start, stop, _SCAN_BLOCK_ROWS):
+            block_stop = min(stop, block_start + _SCAN_BLOCK_ROWS)
+            codes = np.asarray(index.codes[block_start:block_stop], dtype=np.float32)
+            scales = np.asarray(index.scales[block_start:block_stop])
+            approximate[:, block_start - start : block_stop - start] = (first_pass @ codes.T) * scales
+
+        count = stop - start
+        shortlist_size = min(count, top_k * self._rescore_factor)
+        k = min(top_k, count)
+
+        ranked: list[list[tuple[int, float]]] = []
+        for query, row in zip(queries, approximate):
+            if shortlist_size < count:
+                shortlist = np.argpartition(-row, shortlist_size - 1)[:shortlist_size]
+            else:
+                shortlist = np.arange(count)
+            rows = np.sort(shortlist) + start  # ascending rows keep mmap reads sequential
+            exact = np.asarray(index.vectors[rows], dtype=np.float32) @ query
+            best = np.argsort(-exact, kind="stable")[:k]
+            ranked.append([(int(rows[position]), float(exact[position])) for position in best])
+
+        results: list[list[RetrievedChunk]] = []
+        for hits in ranked:
+            retrieved: list[RetrievedChunk] = []
+            for row, similarity in hits:
+                chunk_id, document, metadata = index.record(row)
+                distance = max(0.0, 2.0 - 2.0 * similarity)
+                metadata["distance"] = distance
+                retrieved.append(
+                    RetrievedChunk(
+                        chunk_id=chunk_id,
+                        content=document,
+                        score=_distance_to_similarity(distance),
+                        metadata=metadata,
+                    )
+                )
+            results.append(retrieved)
+        return results
+
+
+def _read_text(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return ""
+
+
+def _prune_versions(root: Path, *, keep: set[str]) -> None:
+    """Remove superseded `v*` version directories under `root`.
+
+    Versions in `keep` (the current one and the one it replaced) and any
+    written in the last _VERSION_GRACE_SECONDS stay, so a process that read
+    CURRENT just before it moved can still open its version. Versions already
+    mapped by other processes stay readable after removal on POSIX.
+    """
+    cutoff = time.time() - _VERSION_GRACE_SECONDS
+    for version in root.glob("v*"):
+        if not version.is_dir() or version.name in keep:
+            continue
+        try:
+            if version.stat().st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(version, ignore_errors=True)
+
+
+def _replace_text(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
@@ -0,0 +1,314 @@
+""" In-process LRU/TTL cache of text-query search results, invalidated by writes. """
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Sequence
+import logging
+import threading
+import time
+
+from src.rag.config import Settings, get_settings
+from src.rag.manifest import IngestManifest, changed_patients, manifest_path
+from src.rag.openai_client import OpenAIClient
+from src.rag.vector_store import DocumentChunk, RecordBatch, RetrievedChunk, VectorStore
+
+logger = logging.getLogger(__name__)
+
+# How often (seconds) the ingest manifest is checked for runs in other processes
+_MANIFEST_CHECK_INTERVAL = 1.0
+
+# (patient_id, normalized query, top_k)
+QueryKey = tuple[str | None, str, int]
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as the cache key."""
+    return " ".join(query.split()).casefold()
+
+
+@dataclass(frozen=True)
+class _Entry:
+    chunks: tuple[RetrievedChunk, ...]
+    expires_at: float
+
+
+class QueryCache:
+    """Bounded LRU of search results keyed by (patient_id, normalized query, top_k).
+
+    Entries expire after `ttl` seconds (0 keeps them until evicted or
+    invalidated). Invalidation is per patient: a write for patient P drops P's
+    entries and the unfiltered ones, which may rank P's chunks. Thread-safe.
+    """
+
+    def __init__(self, *, max_entries: int, ttl: float) -> None:
+        self._max_entries = max(1, max_entries)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[QueryKey, _Entry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation; lets a search that overlapped a write skip `put`
+        self.generation = 0
+
+    def get(self, key: QueryKey) -> list[RetrievedChunk] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl > 0 and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry.chunks)
+
+    def put(self, key: QueryKey, chunks: Sequence[RetrievedChunk], *, generation: int | None = None) -> None:
+        """Store a result; ignored when `generation` (read before searching) is out of date."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = _Entry(chunks=tuple(chunks), expires_at=time.monotonic() + self._ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_patients(self, patient_ids: set[str]) -> None:
+        """Drop entries of these patients and every unfiltered entry."""
+        with self._lock:
+            doomed = [key for key in self._entries if key[0] is None or key[0] in patient_ids]
+            self._drop(doomed)
+
+    def invalidate_chunks(self, chunk_ids: set[str]) -> None:
+        """Drop entries whose results include any of these chunks.
+
+        Removing a chunk can only change results that contained it.
+        """
+        with self._lock:
+            doomed = [
+                key for key, entry in self._entries.items()
+                if any(chunk.chunk_id in chunk_ids for chunk in entry.chunks)
+            ]
+            self._drop(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._drop(list(self._entries))
+
+    # Caller holds the lock
+    def _drop(self, keys: Sequence[QueryKey]) -> None:
+        self.generation += 1
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += len(keys)
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "ttl_seconds": self._ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class CachedVectorStore(VectorStore):
+    """VectorStore wrapper that answers repeated text queries from a QueryCache.
+
+    A hit skips both the query embedding and the index search. Writes through
+    this wrapper invalidate the affected patients; writes by other processes
+    (the ingest CLI) are noticed through the ingest manifest, which every run
+    rewrites once its upserts are durable: the patients whose files it changed
+    are invalidated, and the whole cache only when the index settings changed.
+    `refresh()` and `clear()` are forwarded and clear the cache. Anything else
+    (backend-specific methods) is forwarded to the wrapped store.
+    """
+
+    def __init__(self, store: VectorStore, cache: QueryCache, *, manifest_file: Path | None = None) -> None:
+        self._store = store
+        self._cache = cache
+        self._manifest_file = manifest_file
+        self._manifest_lock = threading.Lock()
+        self._manifest_stamp = self._read_manifest_stamp()
+        self._manifest = IngestManifest.load(manifest_file) if manifest_file is not None else None
+        self._manifest_checked = time.monotonic()
+
+    @property
+    def inner(self) -> VectorStore:
+        return self._store
+
+    @property
+    def cache(self) -> QueryCache:
+        return self._cache
+
+    def __getattr__(self, name: str):
+        if name == "_store":
+            raise AttributeError(name)
+        return getattr(self._store, name)
+
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        self._store.upsert(chunks, embeddings)
+        if chunks:
+            self._cache.invalidate_patients({chunk.patient_id for chunk in chunks})
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        self._store.delete(chunk_ids)
+        if chunk_ids:
+            self._cache.invalidate_chunks(set(chunk_ids))
+
+    def persist(self) -> None:
+        self._store.persist()
+
+    def warmup(self) -> None:
+        self._store.warmup()
+
+    def refresh(self) -> None:
+        self._store.refresh()
+        self._cache.clear()
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._cache.clear()
+
+    def iter_records(self, *, batch_size: int = 5000) -> Iterator[RecordBatch]:
+        return self._store.iter_records(batch_size=batch_size)
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        return self._store.similarity_search_many(embeddings, top_k=top_k, patient_id=patient_id, where=where)
+
+    def similarity_search_text(self, query: str, *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
+        """Cached `similarity_search_text` of the wrapped store."""
+        self._check_manifest()
+        key = (patient_id or None, normalize_query(query), top_k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        generation = self._cache.generation
+        chunks = self._store.similarity_search_text(query, client=client, top_k=top_k, patient_id=patient_id)
+        self._cache.put(key, chunks, generation=generation)
+        return chunks
+
+    def similarity_search_texts(self, queries: Sequence[str], *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[list[RetrievedChunk]]:
+        """Cached `similarity_search_texts`; only the missed queries are embedded and searched."""
+        if not queries:
+            return []
+        self._check_manifest()
+        keys = [(patient_id or None, normalize_query(query), top_k) for query in queries]
+        results: list[list[RetrievedChunk] | None] = [self._cache.get(key) for key in keys]
+        missed = [index for index, found in enumerate(results) if found is None]
+        if missed:
+            generation = self._cache.generation
+            fresh = self._store.similarity_search_texts(
+                [queries[index] for index in missed], client=client, top_k=top_k, patient_id=patient_id
+            )
+            for index, chunks in zip(missed, fresh):
+                self._cache.put(keys[index], chunks, generation=generation)
+                results[index] = chunks
+        return [found or [] for found in results]
+
+    async def asimilarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        return await self._store.asimilarity_search_many(embeddings, top_k=top_k, patient_id=patient_id, where=where)
+
+    async def asimilarity_search_text(self, query: str, *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
+        """Cached `asimilarity_search_text` of the wrapped store."""
+        self._check_manifest()
+        key = (patient_id or None, normalize_query(query), top_k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        generation = self._cache.generation
+        chunks = await self._store.asimilarity_search_text(query, client=client, top_k=top_k, patient_id=patient_id)
+        self._cache.put(key, chunks, generation=generation)
+        return chunks
+
+    async def asimilarity_search_texts(self, queries: Sequence[str], *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[list[RetrievedChunk]]:
+        """Cached `asimilarity_search_texts`; only the missed queries are embedded and searched."""
+        if not queries:
+            return []
+        self._check_manifest()
+        keys = [(patient_id or None, normalize_query(query), top_k) for query in queries]
+        results: list[list[RetrievedChunk] | None] = [self._cache.get(key) for key in keys]
+        missed = [index for index, found in enumerate(results) if found is None]
+        if missed:
+            generation = self._cache.generation
+            fresh = await self._store.asimilarity_search_texts(
+                [queries[index] for index in missed], client=client, top_k=top_k, patient_id=patient_id
+            )
+            for index, chunks in zip(missed, fresh):
+                self._cache.put(keys[index], chunks, generation=generation)
+                results[index] = chunks
+        return [found or [] for found in results]
+
+    def _read_manifest_stamp(self) -> int | None:
+        if self._manifest_file is None:
+            return None
+        try:
+            return self._manifest_file.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_manifest(self) -> None:
+        if self._manifest_file is None:
+            return
+        with self._manifest_lock:
+            now = time.monotonic()
+            if now - self._manifest_checked < _MANIFEST_CHECK_INTERVAL:
+                return
+            self._manifest_checked = now
+            stamp = self._read_manifest_stamp()
+            if stamp == self._manifest_stamp:
+                return
+            self._manifest_stamp = stamp
+            previous, self._manifest = self._manifest, IngestManifest.load(self._manifest_file)
+            patients = changed_patients(previous, self._manifest)
+        if patients is None:
+            logger.info("Index changed on disk; clearing the query cache")
+            self._cache.clear()
+        elif patients:
+            logger.info("Index changed on disk for %s patients; invalidating their cached queries", len(patients))
+            self._cache.invalidate_patients(patients)
+
+
+@lru_cache()
+def get_query_cache(settings: Settings | None = None) -> QueryCache | None:
+    """Shared query cache for the app; None when disabled (max entries <= 0)."""
+    active_settings = settings or get_settings()
+    if active_settings.query_cache_max_entries <= 0:
+        return None
+    return QueryCache(max_entries=active_settings.query_cache_max_entries, ttl=active_settings.query_cache_ttl)
+
+
+def cached_vector_store(store: VectorStore, settings: Settings | None = None) -> VectorStore:
+    """Wrap `store` with the shared query cache, or return it unchanged when caching is off."""
+    active_settings = settings or get_settings()
+    cache = get_query_cache(active_settings)
+    if cache is None:
+        return store
+    return CachedVectorStore(store, cache, manifest_file=manifest_path(active_settings))
@@ -0,0 +1,293 @@
+""" Token-bucket rate limiting of OpenAI traffic, shared by every process on the host. """
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+import httpx
+from openai import DefaultHttpxClient
+
+from src.rag.config import Settings, get_settings
+from src.rag.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# One row per (model, kind) bucket. `level` is what can be spent now and goes
+# negative while callers wait on reservations; `rate` is per second.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    rate REAL NOT NULL,
+    capacity REAL NOT NULL,
+    level REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+_KINDS = ("requests", "tokens")
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: str | None) -> float | None:
+    """Seconds in an `x-ratelimit-reset-*` value such as "1s", "6m0s" or "20ms"."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> float | None:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def request_cost(request: httpx.Request) -> tuple[str, int]:
+    """(bucket name, estimated tokens) of an OpenAI API request.
+
+    Buckets are per model, as OpenAI's limits are. The token estimate covers the
+    prompt plus the requested completion budget, which OpenAI also counts.
+    Bodies that aren't JSON (audio uploads) are counted as requests only.
+    """
+    path = request.url.path.rsplit("/v1/", 1)[-1]
+    try:
+        body = json.loads(request.content)
+    except (httpx.RequestNotRead, ValueError, UnicodeDecodeError):
+        return path, 0
+    if not isinstance(body, dict):
+        return path, 0
+    completion = body.get("max_output_tokens") or body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    prompt = estimate_tokens(request.content.decode("utf-8", errors="ignore"))
+    return str(body.get("model") or path), prompt + int(completion)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets kept in SQLite.
+
+    Callers reserve capacity before sending and sleep for whatever the
+    reservation says, so concurrent callers queue up behind each other instead
+    of all hitting a 429. Limits are learned from the `x-ratelimit-*` headers of
+    every response (`requests_per_minute`/`tokens_per_minute` only seed models
+    not seen yet; 0 leaves them unlimited until their first response), and a
+    429 blocks the model until its reset. `headroom` is the fraction of the
+    published limit actually used. Safe to share between threads, and between
+    processes on one host (WAL mode).
+    """
+
+    def __init__(self, path: Path, *, requests_per_minute: float = 0, tokens_per_minute: float = 0, headroom: float = 0.9) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._defaults = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self._headroom = min(1.0, max(0.1, headroom))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.reservations = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+
+    def reserve(self, model: str, tokens: int = 0) -> float:
+        """Take one request and `tokens` from `model`'s buckets; returns seconds to wait first."""
+        now = time.time()
+        costs = {"requests": 1.0, "tokens": float(tokens)}
+        wait = 0.0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for kind in _KINDS:
+                    row = self._load(f"{model}:{kind}", kind, now)
+                    if row is None:
+                        continue
+                    rate, capacity, level, blocked_until = row
+                    level -= costs[kind]
+                    if rate > 0 and level < 0:
+                        wait = max(wait, -level / rate)
+                    wait = max(wait, blocked_until - now)
+                    self._conn.execute(
+                        "UPDATE buckets SET level = ?, updated = ? WHERE key = ?", (level, now, f"{model}:{kind}")
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.reservations += 1
+            if wait > 0:
+                self.throttled += 1
+                self.wait_seconds += wait
+        return wait
+
+    # Caller holds the lock inside a transaction; refills the bucket up to `now`
+    def _load(self, key: str, kind: str, now: float) -> tuple[float, float, float, float] | None:
+        row = self._conn.execute(
+            "SELECT rate, capacity, level, updated, blocked_until FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            per_minute = self._defaults[kind]
+            if per_minute <= 0:
+                return None
+            capacity = per_minute * self._headroom
+            self._conn.execute(
+                "INSERT INTO buckets (key, rate, capacity, level, updated) VALUES (?, ?, ?, ?, ?)",
+                (key, capacity / 60.0, capacity, capacity, now),
+            )
+            return capacity / 60.0, capacity, capacity, 0.0
+        rate, capacity, level, updated, blocked_until = row
+        return rate, capacity, min(capacity, level + rate * max(0.0, now - updated)), blocked_until
+
+    def observe(self, model: str, headers: Mapping[str, str], *, status_code: int = 200) -> None:
+        """Adopt the limits and remaining quota a response reports; a 429 blocks `model` until reset."""
+        now = time.time()
+        retry_after = _header_number(headers, "retry-after-ms")
+        retry_after = retry_after / 1000.0 if retry_after is not None else _header_number(headers, "retry-after")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for kind in _KINDS:
+                    limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+                    remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+                    reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                    exhausted = status_code == 429 and (remaining is None or remaining <= 0)
+                    if limit is None and not exhausted:
+                        continue
+                    self._update(f"{model}:{kind}", kind, now, limit, remaining, (retry_after or reset or 1.0) if exhausted else None)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if status_code == 429:
+                self.rate_limited += 1
+
+    # Caller holds the lock inside a transaction
+    def _update(self, key: str, kind: str, now: float, limit: float | None, remaining: float | None, block_for: float | None) -> None:
+        current = self._load(key, kind, now)
+        if limit is not None:
+            capacity = limit * self._headroom
+            rate = capacity / 60.0
+        elif current is not None:
+            rate, capacity = current[0], current[1]
+        else:
+            rate = capacity = 0.0
+        level = current[2] if current is not None else capacity
+        if remaining is not None:
+            # The server's view includes other hosts; never believe we have more than it says
+            level = min(level, remaining * self._headroom)
+        blocked_until = current[3] if current is not None else 0.0
+        if block_for is not None:
+            level = min(level, 0.0)
+            blocked_until = max(blocked_until, now + block_for)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO buckets (key, rate, capacity, level, updated, blocked_until) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, rate, capacity, min(level, capacity) if capacity > 0 else level, now, blocked_until),
+        )
+
+    def stats(self) -> dict[str, object]:
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT key, rate, capacity, level, updated, blocked_until FROM buckets").fetchall()
+            return {
+                "reservations": self.reservations,
+                "throttled": self.throttled,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "rate_limited_responses": self.rate_limited,
+                "buckets": {
+                    key: {
+                        "per_minute": round(capacity, 1),
+                        "available": round(min(capacity, level + rate * max(0.0, now - updated)), 1),
+                        "blocked_for_s": round(max(0.0, blocked_until - now), 3),
+                    }
+                    for key, rate, capacity, level, updated, blocked_until in rows
+                },
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that waits on a RateLimiter before each request and learns from each response.
+
+    Sits below the OpenAI SDK, so SDK retries are limited too.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: RateLimiter) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = request_cost(request)
+        wait = self._limiter.reserve(model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        response = self._transport.handle_request(request)
+        self._limiter.observe(model, response.headers, status_code=response.status_code)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of RateLimitedTransport; waiting doesn't block the event loop.
+
+    The SQLite transactions run in a worker thread: under contention from other
+    processes (an ingest run) they can wait on the database lock for seconds.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = request_cost(request)
+        wait = await asyncio.to_thread(self._limiter.reserve, model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        response = await self._transport.handle_async_request(request)
+        await asyncio.to_thread(self._limiter.observe, model, response.headers, status_code=response.status_code)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def rate_limited_http_client(limiter: RateLimiter | None, *, timeout: float = 600.0) -> httpx.Client:
+    """Sync httpx client for `OpenAI(http_client=...)`, limited when `limiter` is given."""
+    transport: httpx.BaseTransport = httpx.HTTPTransport()
+    if limiter is not None:
+        transport = RateLimitedTransport(transport, limiter)
+    return DefaultHttpxClient(transport=transport, timeout=timeout)
+
+
+@lru_cache()
+def get_rate_limiter(settings: Settings | None = None) -> RateLimiter | None:
+    """Shared limiter for the configured path; None when OPENAI_RATE_LIMIT is off."""
+    active_settings = settings or get_settings()
+    if not active_settings.openai_rate_limit:
+        return None
+    return RateLimiter(
+        active_settings.openai_rate_limit_path or active_settings.embeddings_path / "openai_rate_limits.sqlite3",
+        requests_per_minute=active_settings.openai_requests_per_minute,
+        tokens_per_minute=active_settings.openai_tokens_per_minute,
+        headroom=active_settings.openai_rate_limit_headroom,
+    )
@@ -0,0 +1,205 @@
+""" The one retry layer for OpenAI calls: bounded attempts, a per-request deadline and a retry budget. """
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TypeVar
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+from src.rag.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() by which the current request must finish (None = no deadline)
+_deadline: ContextVar[float | None] = ContextVar("rag_request_deadline", default=None)
+
+# An attempt isn't started with less time than this left
+_MIN_ATTEMPT_SECONDS = 0.05
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the operation could succeed."""
+
+
+@contextmanager
+def deadline_scope(seconds: float | None) -> Iterator[None]:
+    """Bound everything called inside the block to `seconds` (nested scopes keep the earlier deadline)."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    current = _deadline.get()
+    deadline = time.monotonic() + seconds
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> float | None:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient failures only: timeouts, connection errors, 408/409/429 and 5xx."""
+    if isinstance(exc, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000.0
+        return float(response.headers["retry-after"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """Caps retries at a fraction of the calls made in a sliding window.
+
+    While a dependency is healthy almost nothing is retried, so the budget is
+    never in the way; during an outage it keeps retries to about `ratio` extra
+    load instead of multiplying traffic. `min_per_second` lets low-traffic
+    processes still retry occasionally. Thread-safe.
+    """
+
+    def __init__(self, *, ratio: float, min_per_second: float, window: float = 10.0) -> None:
+        self._ratio = max(0.0, ratio)
+        self._min_per_window = max(0.0, min_per_second) * window
+        self._window = window
+        self._lock = threading.Lock()
+        self._calls: deque[float] = deque()
+        self._retries: deque[float] = deque()
+        self.calls = 0
+        self.retries = 0
+        self.denied = 0
+
+    def record_call(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._calls.append(now)
+            self.calls += 1
+            self._expire(now)
+
+    def try_retry(self) -> bool:
+        """Spend one retry if the budget allows it."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if len(self._retries) >= self._min_per_window + self._ratio * len(self._calls):
+                self.denied += 1
+                return False
+            self._retries.append(now)
+            self.retries += 1
+            return True
+
+    # Caller holds the lock
+    def _expire(self, now: float) -> None:
+        for events in (self._calls, self._retries):
+            while events and events[0] <= now - self._window:
+                events.popleft()
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "ratio": self._ratio,
+                "window_s": self._window,
+                "calls": self.calls,
+                "retries": self.retries,
+                "denied": self.denied,
+                "window_calls": len(self._calls),
+                "window_retries": len(self._retries),
+            }
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with jitter, at most `max_retries` times, within the deadline and budget."""
+
+    max_retries: int = 3
+    initial_backoff: float = 0.5
+    max_backoff: float = 8.0
+    budget: RetryBudget | None = None
+
+    def _next_delay(self, attempt: int, exc: BaseException) -> float | None:
+        """Seconds to wait before retry number `attempt`, or None to give up."""
+        if attempt > self.max_retries or not is_retryable(exc):
+            return None
+        backoff = min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+        delay = max(random.uniform(backoff / 2, backoff), _retry_after(exc) or 0.0)
+        remaining = time_remaining()
+        if remaining is not None and delay + _MIN_ATTEMPT_SECONDS > remaining:
+            return None
+        if self.budget is not None and not self.budget.try_retry():
+            logger.debug("Retry budget exhausted; not retrying %s", type(exc).__name__)
+            return None
+        return delay
+
+    def call(self, operation: Callable[[float | None], T]) -> T:
+        """Run `operation(timeout)` with retries; `timeout` is what is left of the deadline."""
+        attempt = 0
+        while True:
+            timeout = _attempt_timeout()
+            if self.budget is not None:
+                self.budget.record_call()
+            try:
+                return operation(timeout)
+            except Exception as exc:
+                attempt += 1
+                delay = self._next_delay(attempt, exc)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def acall(self, operation: Callable[[float | None], Awaitable[T]]) -> T:
+        """Async `call`; backoff sleeps don't block the event loop."""
+        attempt = 0
+        while True:
+            timeout = _attempt_timeout()
+            if self.budget is not None:
+                self.budget.record_call()
+            try:
+                return await operation(timeout)
+            except Exception as exc:
+                attempt += 1
+                delay = self._next_delay(attempt, exc)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+
+def _attempt_timeout() -> float | None:
+    remaining = time_remaining()
+    if remaining is not None and remaining < _MIN_ATTEMPT_SECONDS:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining
+
+
+@lru_cache()
+def get_retry_budget(settings: Settings | None = None) -> RetryBudget:
+    """Process-wide budget shared by every OpenAI client."""
+    active_settings = settings or get_settings()
+    return RetryBudget(ratio=active_settings.retry_budget_ratio, min_per_second=active_settings.retry_budget_min_per_second)
@@ -0,0 +1,101 @@
+""" Dedicated, sized thread pool that runs blocking vector searches for async callers. """
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import TypeVar
+import asyncio
+import logging
+import threading
+import time
+
+from src.rag.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SearchExecutor:
+    """Runs index searches off the event loop on its own pool.
+
+    Keeps searches out of asyncio's default executor (shared with every other
+    `to_thread` call) and counts what is running and waiting, so a saturated
+    pool shows up as queue depth instead of unexplained latency.
+    """
+
+    def __init__(self, *, workers: int) -> None:
+        self._workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="vector-search")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._wait_seconds = 0.0
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    async def run(self, function: Callable[[], T]) -> T:
+        """Run `function` on the pool and await its result."""
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+
+        def call() -> T:
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_seconds += time.perf_counter() - submitted
+            failed = True
+            try:
+                result = function()
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._failed += failed
+
+        # A job cancelled before a worker picked it up (the awaiting task was
+        # cancelled, or the pool shut down) never runs `call`
+        def settle(future: Future[T]) -> None:
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+                    self._cancelled += 1
+
+        future = self._pool.submit(call)
+        future.add_done_callback(settle)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                "workers": self._workers,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "avg_wait_ms": round(self._wait_seconds / started * 1000, 3) if started else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=1)
+def get_search_executor() -> SearchExecutor:
+    """Process-wide search pool, sized by SEARCH_WORKERS."""
+    return SearchExecutor(workers=get_settings().search_workers)
@@ -0,0 +1,391 @@
+""" Compact single-file index snapshot: export from any backend, memory-map to serve. """
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+import argparse
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from src.rag.config import Settings, get_settings
+from src.rag.numpy_store import _normalize
+from src.rag.vector_store import (
+    DocumentChunk,
+    RecordBatch,
+    RetrievedChunk,
+    VectorStore,
+    _distance_to_similarity,
+    get_vector_store,
+    metadata_filter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Layout: MAGIC padded to _VECTORS_OFFSET | vectors (count x dimensions, rows grouped
+# by patient) | record offsets (count + 1 x u64, 8-byte aligned) | records, one JSON
+# [id, document, metadata] per row | JSON footer | footer length (u64) | MAGIC.
+# Every section is memory-mapped; a record is only decoded when a query returns it.
+MAGIC = b"RAGSNAP2"
+SNAPSHOT_DTYPES = ("float32", "float16")
+_VECTORS_OFFSET = 64
+_TRAILER = struct.Struct("<Q8s")
+_WARMUP_BLOCK_ROWS = 65536
+_STAT_CHECK_INTERVAL = 1.0  # seconds between checks for a replaced snapshot file
+
+
+@dataclass(frozen=True)
+class SnapshotInfo:
+    """Footer of a snapshot file."""
+
+    count: int
+    dimensions: int
+    dtype: str
+    offsets_offset: int
+    records_offset: int
+    records_length: int
+    # patient_id -> (start, stop) row range
+    patient_ranges: dict[str, tuple[int, int]]
+    created_at: float
+
+
+def read_info(path: Path) -> SnapshotInfo:
+    """Read and validate the footer of the snapshot at `path`."""
+    with path.open("rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        if size < _VECTORS_OFFSET + _TRAILER.size:
+            raise ValueError(f"{path} is too small to be an index snapshot")
+        handle.seek(size - _TRAILER.size)
+        footer_length, magic = _TRAILER.unpack(handle.read(_TRAILER.size))
+        if magic != MAGIC:
+            if magic.startswith(MAGIC[:-1]):
+                raise ValueError(f"{path} is an older snapshot format; re-export it")
+            raise ValueError(f"{path} is not an index snapshot")
+        handle.seek(size - _TRAILER.size - footer_length)
+        footer = json.loads(handle.read(footer_length))
+    return SnapshotInfo(
+        count=int(footer["count"]),
+        dimensions=int(footer["dimensions"]),
+        dtype=footer["dtype"],
+        offsets_offset=int(footer["offsets_offset"]),
+        records_offset=int(footer["records_offset"]),
+        records_length=int(footer["records_length"]),
+        patient_ranges={key: (int(start), int(stop)) for key, (start, stop) in footer["patient_ranges"].items()},
+        created_at=float(footer["created_at"]),
+    )
+
+
+def is_current_snapshot(path: Path) -> bool:
+    """Whether `path` holds a snapshot this version can serve."""
+    try:
+        read_info(path)
+    except (OSError, ValueError, KeyError):
+        return False
+    return True
+
+
+def export_snapshot(store: VectorStore, path: Path, *, dtype: str = "float32", batch_size: int = 5000) -> SnapshotInfo:
+    """Write every record of `store` to a snapshot at `path` (replaced atomically).
+
+    Vectors are streamed to a scratch file and then copied out in patient order,
+    so memory holds one batch of vectors plus the documents and metadata.
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unknown snapshot dtype {dtype!r}; expected one of {SNAPSHOT_DTYPES}")
+    started = time.perf_counter()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token = uuid.uuid4().hex
+    scratch_path = path.with_name(f"{path.name}.{token}.vectors")
+    tmp_path = path.with_name(f"{path.name}.{token}.tmp")
+
+    ids: list[str] = []
+    documents: list[str] = []
+    metadatas: list[dict[str, object]] = []
+    dimensions = 0
+    try:
+        with scratch_path.open("wb") as scratch:
+            for batch_ids, embeddings, batch_documents, batch_metadatas in store.iter_records(batch_size=batch_size):
+                if not batch_ids:
+                    continue
+                if dimensions and embeddings.shape[1] != dimensions:
+                    raise ValueError(f"Mixed embedding sizes in the index ({dimensions} and {embeddings.shape[1]})")
+                dimensions = embeddings.shape[1]
+                scratch.write(_normalize(embeddings).astype(dtype).tobytes())
+                ids.extend(batch_ids)
+                documents.extend(batch_documents)
+                metadatas.extend(batch_metadatas)
+
+        patient_ids = [str(metadata.get("patient_id", "")) for metadata in metadatas]
+        order = sorted(range(len(ids)), key=lambda index: (patient_ids[index], index))
+        patient_ranges: dict[str, list[int]] = {}
+        for row, index in enumerate(order):
+            patient_ranges.setdefault(patient_ids[index], [row, row])[1] = row + 1
+
+        with tmp_path.open("wb") as out:
+            out.write(MAGIC.ljust(_VECTORS_OFFSET, b"\0"))
+            if ids:
+                source = np.memmap(scratch_path, dtype=dtype, mode="r", shape=(len(ids), dimensions))
+                for start in range(0, len(order), batch_size):
+                    out.write(np.ascontiguousarray(source[order[start : start + batch_size]]).tobytes())
+                del source
+            out.write(b"\0" * (-out.tell() % 8))
+            offsets_offset = out.tell()
+            offsets = np.zeros(len(ids) + 1, dtype="<u8")
+            encoded = []
+            for row, index in enumerate(order):
+                record = json.dumps([ids[index], documents[index], metadatas[index]], separators=(",", ":")).encode("utf-8")
+                encoded.append(record)
+                offsets[row + 1] = offsets[row] + len(record)
+            out.write(offsets.tobytes())
+            records_offset = out.tell()
+            for record in encoded:
+                out.write(record)
+            footer = json.dumps(
+                {
+                    "count": len(ids),
+                    "dimensions": dimensions,
+                    "dtype": dtype,
+                    "offsets_offset": offsets_offset,
+                    "records_offset": records_offset,
+                    "records_length": int(offsets[-1]),
+                    "patient_ranges": patient_ranges,
+                    "created_at": time.time(),
+                }
+            ).encode("utf-8")
+            out.write(footer)
+            out.write(_TRAILER.pack(len(footer), MAGIC))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        scratch_path.unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
+
+    info = read_info(path)
+    logger.info(
+        "Exported snapshot of %s vectors (%s x %s) to %s (%.1f MB) in %.2fs",
+        info.count, dimensions, dtype, path, path.stat().st_size / 2**20, time.perf_counter() - started,
+    )
+    return info
+
+
+@dataclass(frozen=True)
+class _LoadedSnapshot:
+    stamp: tuple[int, int]
+    info: SnapshotInfo
+    vectors: np.ndarray
+    # count + 1 byte offsets into `records`
+    offsets: np.ndarray
+    records: np.ndarray
+
+    def record(self, row: int) -> tuple[str, str, dict[str, object]]:
+        """(id, document, metadata) of one row, decoded from the mapped records."""
+        chunk_id, document, metadata = json.loads(self.records[int(self.offsets[row]) : int(self.offsets[row + 1])].tobytes())
+        return chunk_id, document, metadata
+
+
+def _map(path: Path, info: SnapshotInfo, stamp: tuple[int, int]) -> _LoadedSnapshot:
+    if not info.count:
+        empty = np.empty(0, dtype=np.uint8)
+        return _LoadedSnapshot(stamp=stamp, info=info, vectors=np.empty((0, 0), dtype=np.float32), offsets=np.zeros(1, dtype="<u8"), records=empty)
+    return _LoadedSnapshot(
+        stamp=stamp,
+        info=info,
+        vectors=np.memmap(path, dtype=info.dtype, mode="r", offset=_VECTORS_OFFSET, shape=(info.count, info.dimensions)),
+        offsets=np.memmap(path, dtype="<u8", mode="r", offset=info.offsets_offset, shape=(info.count + 1,)),
+        records=np.memmap(path, dtype=np.uint8, mode="r", offset=info.records_offset, shape=(max(1, info.records_length),)),
+    )
+
+
+class SnapshotVectorStore(VectorStore):
+    """Read-only VectorStore over a memory-mapped snapshot file.
+
+    Opening costs one footer read and three mmaps (vectors, record offsets,
+    records), with no database to start and nothing decoded up front: a
+    record's JSON is parsed only when a query returns it. Queries are exact over
+    the patient's contiguous rows. The file is re-opened when it is replaced
+    (checked at most once a second); if it disappears or can't be read, the last
+    good snapshot keeps serving. Writes go to the regular backend, and ingest
+    re-exports the snapshot afterwards.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._loaded: _LoadedSnapshot | None = None
+        self._checked_at = 0.0
+        self._reopen_error: str | None = None
+        self._snapshot()
+
+    @property
+    def info(self) -> SnapshotInfo:
+        return self._snapshot().info
+
+    def _snapshot(self) -> _LoadedSnapshot:
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded is not None and now - self._checked_at < _STAT_CHECK_INTERVAL:
+                return self._loaded
+            self._checked_at = now
+            try:
+                stat = self._path.stat()
+                stamp = (stat.st_mtime_ns, stat.st_ino)
+                if self._loaded is not None and self._loaded.stamp == stamp:
+                    return self._loaded
+                started = time.perf_counter()
+                loaded = _map(self._path, read_info(self._path), stamp)
+            except (OSError, ValueError, KeyError) as exc:
+                if self._loaded is None:
+                    raise
+                if str(exc) != self._reopen_error:
+                    logger.warning("Can't reopen snapshot %s (%s); serving the one opened before", self._path, exc)
+                    self._reopen_error = str(exc)
+                return self._loaded
+            self._loaded = loaded
+            self._reopen_error = None
+            logger.info("Opened snapshot %s (%s vectors) in %.3fs", self._path, loaded.info.count, time.perf_counter() - started)
+            return loaded
+
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        raise RuntimeError("Snapshots are read-only; ingest into the vector backend and re-export")
+
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        raise RuntimeError("Snapshots are read-only; ingest into the vector backend and re-export")
+
+    def warmup(self) -> None:
+        """Fault every vector page into memory so the first queries don't wait on disk."""
+        vectors = self._snapshot().vectors
+        for start in range(0, len(vectors), _WARMUP_BLOCK_ROWS):
+            np.asarray(vectors[start : start + _WARMUP_BLOCK_ROWS]).sum()
+
+    def iter_records(self, *, batch_size: int = 5000) -> Iterator[RecordBatch]:
+        snapshot = self._snapshot()
+        for start in range(0, snapshot.info.count, batch_size):
+            stop = min(start + batch_size, snapshot.info.count)
+            records = [snapshot.record(row) for row in range(start, stop)]
+            yield (
+                [chunk_id for chunk_id, _, _ in records],
+                np.asarray(snapshot.vectors[start:stop], dtype=np.float32),
+                [document for _, document, _ in records],
+                [metadata for _, _, metadata in records],
+            )
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Exact top-k per query over the patient's rows of the snapshot."""
+        if not embeddings:
+            return []
+        snapshot = self._snapshot()
+        filters = metadata_filter(patient_id, where) or {}
+        patient = filters.pop("patient_id", None)
+        if patient is not None:
+            start, stop = snapshot.info.patient_ranges.get(str(patient), (0, 0))
+        else:
+            start, stop = 0, snapshot.info.count
+        rows = np.arange(start, stop)
+        if filters:
+            rows = np.array(
+                [row for row in rows.tolist() if all(snapshot.record(row)[2].get(key) == value for key, value in filters.items())],
+                dtype=np.int64,
+            )
+        if not len(rows) or top_k <= 0:
+            return [[] for _ in embeddings]
+
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if filters:
+            candidates = np.asarray(snapshot.vectors[rows], dtype=np.float32)
+        else:
+            candidates = np.asarray(snapshot.vectors[start:stop], dtype=np.float32)
+        similarities = queries @ candidates.T
+        k = min(top_k, len(rows))
+
+        results: list[list[RetrievedChunk]] = []
+        for row_scores in similarities:
+            best = np.argpartition(-row_scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            best = best[np.argsort(-row_scores[best], kind="stable")]
+            retrieved: list[RetrievedChunk] = []
+            for position in best:
+                chunk_id, document, metadata = snapshot.record(int(rows[position]))
+                distance = max(0.0, 2.0 - 2.0 * float(row_scores[position]))
+                metadata["distance"] = distance
+                retrieved.append(
+                    RetrievedChunk(
+                        chunk_id=chunk_id,
+                        content=document,
+                        score=_distance_to_similarity(distance),
+                        metadata=metadata,
+                    )
+                )
+            results.append(retrieved)
+        return results
+
+
+def get_serving_vector_store(settings: Settings | None = None) -> VectorStore:
+    """Store for answering queries: the snapshot when one is configured and present, else the backend."""
+    active_settings = settings or get_settings()
+    path = active_settings.vector_snapshot_path
+    if path is not None:
+        try:
+            return SnapshotVectorStore(path)
+        except FileNotFoundError:
+            logger.warning("Snapshot %s not found; serving from the %s backend", path, active_settings.vector_backend)
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Can't open snapshot %s (%s); serving from the %s backend", path, exc, active_settings.vector_backend)
+    return get_vector_store(active_settings)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export or inspect a compact index snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Write the configured vector index to a snapshot file")
+    export.add_argument("--output", type=Path, help="Snapshot path (defaults to VECTOR_SNAPSHOT_PATH)")
+    export.add_argument("--dtype", choices=SNAPSHOT_DTYPES, help="Vector precision (defaults to SNAPSHOT_DTYPE)")
+    load = subparsers.add_parser("load", help="Open a snapshot, warm it up and report the timings")
+    load.add_argument("path", type=Path, nargs="?", help="Snapshot path (defaults to VECTOR_SNAPSHOT_PATH)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    settings = get_settings()
+    if args.command == "export":
+        output = args.output or settings.vector_snapshot_path
+        if output is None:
+            raise SystemExit("Pass --output or set VECTOR_SNAPSHOT_PATH")
+        export_snapshot(get_vector_store(settings), output, dtype=args.dtype or settings.snapshot_dtype)
+        return
+
+    path = args.path or settings.vector_snapshot_path
+    if path is None:
+        raise SystemExit("Pass a snapshot path or set VECTOR_SNAPSHOT_PATH")
+    started = time.perf_counter()
+    store = SnapshotVectorStore(path)
+    opened = time.perf_counter() - started
+    store.warmup()
+    warmed = time.perf_counter() - started - opened
+    info = store.info
+    logger.info(
+        "Snapshot %s: %s vectors x %s (%s), %s patients; opened in %.3fs, warmed in %.3fs",
+        path, info.count, info.dimensions, info.dtype, len(info.patient_ranges), opened, warmed,
+    )
+
+
+if __name__ == "__main__":
+    main()
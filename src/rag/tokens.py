@@ -0,0 +1,45 @@
+""" Cheap token-count estimates used to size embedding requests. """
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import math
+import re
+
+# Limits of the OpenAI embeddings endpoint
+EMBED_MAX_INPUT_TOKENS = 8191  # per input string
+EMBED_MAX_INPUTS = 2048  # strings per request
+
+# OpenAI tokenizers average ~4 bytes per token on English prose; clinical text
+# (numbers, units, abbreviations) tokenizes denser, so stay on the safe side.
+_BYTES_PER_TOKEN = 3.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Upper-bound style estimate of how many tokens `text` encodes to."""
+    if not text:
+        return 0
+    return math.ceil(len(text.encode("utf-8")) / _BYTES_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim `text` so its estimated token count stays within `max_tokens`."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    encoded = text.encode("utf-8")[: int(max_tokens * _BYTES_PER_TOKEN)]
+    return encoded.decode("utf-8", errors="ignore")
+
+
+# Word runs and single punctuation marks, roughly how BPE splits prose
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def iter_token_spans(text: str) -> Iterator[tuple[int, int, int]]:
+    """Yield (start, end, estimated_tokens) for each word or punctuation mark.
+
+    Long words (drug names, lab codes) split into several BPE tokens, so they
+    count as one token per ~6 characters.
+    """
+    for match in _TOKEN_PATTERN.finditer(text):
+        start, end = match.span()
+        yield start, end, 1 + (end - start - 1) // 6
@@ -1,16 +1,21 @@
-"""ChromaDB-backed vector store helpers."""
+"""Vector store interface and its ChromaDB-backed implementation."""
 
 from __future__ import annotations
 
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from typing import Sequence
 import logging
 
 import chromadb
+import numpy as np
 
 from src.rag.config import Settings, get_settings
 from src.rag.openai_client import OpenAIClient
+from src.rag.search_executor import SearchExecutor, get_search_executor
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,9 @@ class DocumentChunk:
     chunk_index: int
     content: str
     patient_id: str
+    # Character offsets of `content` within the extracted document text
+    start_offset: int = 0
+    end_offset: int = 0
 
 
 @dataclass(frozen=True)
@@ -64,7 +72,127 @@ def _distance_to_similarity(distance: object) -> float:
     return 1.0 / (1.0 + d)
 
 
-class VectorStore:
+# Equality filters for a search: `where` plus the patient shorthand, or None for no filter
+def metadata_filter(patient_id: str | None, where: Mapping[str, object] | None) -> dict[str, object] | None:
+    filters = dict(where or {})
+    if patient_id:
+        filters["patient_id"] = patient_id
+    return filters or None
+
+
+# (ids, (n, dim) float32 embeddings, documents, metadatas) for a run of stored chunks
+RecordBatch = tuple[list[str], np.ndarray, list[str], list[dict[str, object]]]
+
+
+class VectorStore(ABC):
+    """Index of chunk embeddings: upsert, delete, filtered similarity search, persist.
+
+    Implementations load their persisted state when constructed. Filters are
+    equality matches on chunk metadata; `patient_id` is shorthand for
+    `where={"patient_id": ...}`.
+
+    The `a`-prefixed methods are the async API: the query embedding is awaited
+    and the search runs on `search_executor` (the shared SEARCH_WORKERS pool by
+    default). Backends with a natively async client can override
+    `asimilarity_search_many` instead.
+    """
+
+    search_executor: SearchExecutor | None = None
+
+    @abstractmethod
+    def upsert(self, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+        """Insert or replace chunks (by chunk_id) with their embeddings."""
+
+    @abstractmethod
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        """Remove chunks by id; unknown ids are ignored."""
+
+    @abstractmethod
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Top-k RetrievedChunks per query embedding, best first (score in [0,1])."""
+
+    def persist(self) -> None:
+        """Make every write so far durable; a no-op for stores that write through."""
+
+    def warmup(self) -> None:
+        """Load whatever the first query would otherwise load; a no-op by default."""
+
+    def refresh(self) -> None:
+        """Bring derived search structures up to date with the writes so far; a no-op by default."""
+
+    def iter_records(self, *, batch_size: int = 5000) -> Iterator[RecordBatch]:
+        """Every stored chunk, as batches of (ids, embeddings, documents, metadatas)."""
+        raise NotImplementedError(f"{type(self).__name__} cannot enumerate its records")
+
+    def clear(self) -> None:
+        """Remove every chunk, and the embedding size the index was created with."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be cleared")
+
+    def similarity_search(
+        self,
+        embedding: Sequence[float],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[RetrievedChunk]:
+        """Return top-k RetrievedChunk with `score` in [0,1] (higher == more similar).
+        The raw distance is stored in metadata['distance'].
+        """
+        if not len(embedding):
+            return []
+        return self.similarity_search_many([embedding], top_k=top_k, patient_id=patient_id, where=where)[0]
+
+    def similarity_search_text(self, query: str, *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
+        """Embed the query and perform a similarity search."""
+        
+        embedding = client.embed_text(query)
+        return self.similarity_search(embedding, top_k=top_k, patient_id=patient_id)
+
+    def similarity_search_texts(self, queries: Sequence[str], *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[list[RetrievedChunk]]:
+        """Embed all queries in one request and search them in one query."""
+        if not queries:
+            return []
+        embeddings = client.embed_texts(list(queries))
+        return self.similarity_search_many(embeddings, top_k=top_k, patient_id=patient_id)
+
+    async def asimilarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Async `similarity_search_many`, run on the search executor."""
+        if not embeddings:
+            return []
+        executor = self.search_executor or get_search_executor()
+        return await executor.run(partial(self.similarity_search_many, embeddings, top_k=top_k, patient_id=patient_id, where=where))
+
+    async def asimilarity_search_text(self, query: str, *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
+        """Async `similarity_search_text`: awaits the embedding, then searches on the executor."""
+        embedding = await client.aembed_text(query)
+        if not len(embedding):
+            return []
+        return (await self.asimilarity_search_many([embedding], top_k=top_k, patient_id=patient_id))[0]
+
+    async def asimilarity_search_texts(self, queries: Sequence[str], *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[list[RetrievedChunk]]:
+        """Async `similarity_search_texts`: one awaited embedding request, one search."""
+        if not queries:
+            return []
+        embeddings = await client.aembed_texts(list(queries))
+        return await self.asimilarity_search_many(embeddings, top_k=top_k, patient_id=patient_id)
+
+
+class ChromaVectorStore(VectorStore):
     """Thin wrapper around a persistent ChromaDB collection."""
 
     def __init__(self, *, persist_directory: Path, collection_name: str) -> None:
@@ -78,90 +206,216 @@ class VectorStore:
             return
         if len(chunks) != len(embeddings):
             raise ValueError("Chunks and embeddings must have equal length")
+        _upsert_collection(self._collection, chunks, embeddings)
 
-        ids = [chunk.chunk_id for chunk in chunks]
-        documents = [chunk.content for chunk in chunks]
-        metadatas = [
-            {
-                "document_id": chunk.document_id,
-                "source_path": chunk.source_path,
-                "chunk_index": chunk.chunk_index,
-                "patient_id": chunk.patient_id,
-            }
-            for chunk in chunks
-        ]
-
-        # Update or insert into ChromaDB collection
-        self._collection.upsert(
-            ids=ids,
-            embeddings=list(embeddings),
-            documents=documents,
-            metadatas=metadatas,
-        )
-
-    def similarity_search(self, embedding: Sequence[float], *, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
-        """Return top-k RetrievedChunk with `score` in [0,1] (higher == more similar).
+    # Remove chunks by id (unknown ids are ignored by Chroma)
+    def delete(self, chunk_ids: Sequence[str]) -> None:
+        if not chunk_ids:
+            return
+        self._collection.delete(ids=list(chunk_ids))
+
+    def similarity_search_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        *,
+        top_k: int,
+        patient_id: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> list[list[RetrievedChunk]]:
+        """Run several queries in one Chroma call; returns one result list per embedding.
         The original raw distance returned by Chroma is stored in metadata['distance'].
         """
-        if not embedding:
+        if not embeddings:
             return []
+        return _query_collection(self._collection, embeddings, top_k=top_k, filters=metadata_filter(patient_id, where))
+
+    def warmup(self) -> None:
+        """Run one query for a stored patient so Chroma loads its index segments."""
+        sample = self._collection.peek(limit=1)
+        embeddings = sample.get("embeddings")
+        if embeddings is None or not len(embeddings):
+            return
+        patient_id = str((sample.get("metadatas") or [{}])[0].get("patient_id") or "") or None
+        self.similarity_search(list(embeddings[0]), top_k=1, patient_id=patient_id)
+
+    def iter_records(self, *, batch_size: int = 5000) -> Iterator[RecordBatch]:
+        yield from _iter_collection(self._collection, batch_size=batch_size)
+
+    def clear(self) -> None:
+        """Drop and recreate the collection (Chroma fixes its dimension on the first add)."""
+        name = self._collection.name
+        self._client.delete_collection(name=name)
+        self._collection = self._client.get_or_create_collection(name=name)
+
+
+def chunk_metadata(chunk: DocumentChunk) -> dict[str, object]:
+    """Metadata stored alongside a chunk's embedding."""
+    return {
+        "document_id": chunk.document_id,
+        "source_path": chunk.source_path,
+        "chunk_index": chunk.chunk_index,
+        "patient_id": chunk.patient_id,
+        "start_offset": chunk.start_offset,
+        "end_offset": chunk.end_offset,
+    }
+
+
+def _iter_collection(collection, *, batch_size: int) -> Iterator[RecordBatch]:
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        ids = list(page.get("ids") or [])
+        if not ids:
+            return
+        yield (
+            ids,
+            np.asarray(page["embeddings"], dtype=np.float32),
+            list(page.get("documents") or []),
+            [dict(metadata or {}) for metadata in page.get("metadatas") or []],
+        )
+        offset += len(ids)
+
+
+def _upsert_collection(collection, chunks: Sequence[DocumentChunk], embeddings: Sequence[Sequence[float]]) -> None:
+    # Chroma rejects repeated ids within one call; keep the last occurrence so
+    # replaying a partially applied batch is always safe.
+    latest = {chunk.chunk_id: index for index, chunk in enumerate(chunks)}
+    if len(latest) != len(chunks):
+        keep = sorted(latest.values())
+        chunks = [chunks[index] for index in keep]
+        embeddings = [embeddings[index] for index in keep]
+
+    # Update or insert into ChromaDB collection
+    collection.upsert(
+        ids=[chunk.chunk_id for chunk in chunks],
+        embeddings=list(embeddings),
+        documents=[chunk.content for chunk in chunks],
+        metadatas=[chunk_metadata(chunk) for chunk in chunks],
+    )
 
-        query_params = {
-            "query_embeddings": [list(embedding)],
-            "n_results": top_k,
-            "include": ["documents", "metadatas", "distances"],
-        }
 
-        if patient_id:
-            query_params["where"] = {"patient_id": patient_id}
+def _query_collection(
+    collection,
+    embeddings: Sequence[Sequence[float]],
+    *,
+    top_k: int,
+    filters: Mapping[str, object] | None,
+) -> list[list[RetrievedChunk]]:
+    query_params = {
+        "query_embeddings": [list(embedding) for embedding in embeddings],
+        "n_results": top_k,
+        "include": ["documents", "metadatas", "distances"],
+    }
+    if filters:
+        query_params["where"] = _chroma_where(filters)
+
+    result = collection.query(**query_params)
+
+    empty = [[] for _ in embeddings]
+    all_ids = result.get("ids") or empty
+    all_documents = result.get("documents") or empty
+    all_metadatas = result.get("metadatas") or empty
+    all_distances = result.get("distances") or empty
+
+    return [
+        _to_retrieved(ids, documents, metadatas, distances)
+        for ids, documents, metadatas, distances in zip(all_ids, all_documents, all_metadatas, all_distances)
+    ]
+
+
+# Chroma wants a single-key `where`, with several conditions combined under $and
+def _chroma_where(filters: Mapping[str, object]) -> dict[str, object]:
+    if len(filters) == 1:
+        return dict(filters)
+    return {"$and": [{key: value} for key, value in filters.items()]}
+
+
+# Builds RetrievedChunks for one query's slice of a Chroma result
+def _to_retrieved(ids: Sequence, documents: Sequence, metadatas: Sequence, distances: Sequence) -> list[RetrievedChunk]:
+    retrieved: list[RetrievedChunk] = []
+
+    for chunk_id, text, metadata, distance in zip(ids, documents, metadatas, distances):
+        if chunk_id is None or text is None or metadata is None or distance is None:
+            continue
         
-        result = self._collection.query(**query_params)
-
-        # result = self._collection.query(
-        #     query_embeddings=[list(embedding)],
-        #     n_results=top_k,
-        #     include=["documents", "metadatas", "distances"],
-        # )
-
-        ids = result.get("ids", [[]])[0]
-        documents = result.get("documents", [[]])[0]
-        metadatas = result.get("metadatas", [[]])[0]
-        distances = result.get("distances", [[]])[0]
-
-        retrieved: list[RetrievedChunk] = []
-
-        for chunk_id, text, metadata, distance in zip(ids, documents, metadatas, distances):
-            if chunk_id is None or text is None or metadata is None or distance is None:
-                continue
-            
-            # Convert distance to similarity score by Utlizing helper function
-            similarity = _distance_to_similarity(distance)
-
-            metadata_with_distance = dict(metadata)
-            metadata_with_distance["distance"] = distance  # keeps raw distance
-
-            retrieved.append(
-                RetrievedChunk(
-                    chunk_id=chunk_id,
-                    content=text,
-                    score=similarity,
-                    metadata=metadata_with_distance,
-                )
+        # Convert distance to similarity score by Utlizing helper function
+        similarity = _distance_to_similarity(distance)
+
+        metadata_with_distance = dict(metadata)
+        metadata_with_distance["distance"] = distance  # keeps raw distance
+
+        retrieved.append(
+            RetrievedChunk(
+                chunk_id=chunk_id,
+                content=text,
+                score=similarity,
+                metadata=metadata_with_distance,
             )
+        )
 
-        return retrieved
+    return retrieved
 
-    def similarity_search_text(self, query: str, *, client: OpenAIClient, top_k: int, patient_id: str | None = None) -> list[RetrievedChunk]:
-        """Embed the query and perform a similarity search."""
-        
-        embedding = client.embed_text(query)
-        return self.similarity_search(embedding, top_k=top_k, patient_id=patient_id)
+
+def merge_results(results: Sequence[Sequence[RetrievedChunk]], *, top_k: int | None = None) -> list[RetrievedChunk]:
+    """Merge per-query results, keeping each chunk once at its best score, best first."""
+    best: dict[str, RetrievedChunk] = {}
+    for chunks in results:
+        for chunk in chunks:
+            current = best.get(chunk.chunk_id)
+            if current is None or chunk.score > current.score:
+                best[chunk.chunk_id] = chunk
+    merged = sorted(best.values(), key=lambda chunk: chunk.score, reverse=True)
+    return merged[:top_k] if top_k is not None else merged
 
 
 def get_vector_store(settings: Settings | None = None) -> VectorStore:
-    """Factory to build a VectorStore from app settings."""
+    """Factory to build a VectorStore from app settings (backend chosen by VECTOR_BACKEND)."""
     active_settings = settings or get_settings()
-    return VectorStore(
-        persist_directory=active_settings.embeddings_path,
-        collection_name=active_settings.collection_name,
+    backend = active_settings.vector_backend.lower()
+    partitioning = active_settings.vector_partitioning.lower()
+    if partitioning != "none":
+        if backend != "chroma":
+            raise ValueError("VECTOR_PARTITIONING is only supported with VECTOR_BACKEND=chroma")
+        from src.rag.partitioned_store import PartitionedChromaVectorStore
+
+        return PartitionedChromaVectorStore(
+            persist_directory=active_settings.embeddings_path,
+            collection_name=active_settings.collection_name,
+            mode=partitioning,
+            buckets=active_settings.vector_partition_buckets,
+            max_open=active_settings.vector_max_open_partitions,
+        )
+    if backend == "chroma":
+        return ChromaVectorStore(
+            persist_directory=active_settings.embeddings_path,
+            collection_name=active_settings.collection_name,
+        )
+    if backend == "numpy":
+        from src.rag.numpy_store import NumpyVectorStore
+
+        return NumpyVectorStore(
+            persist_directory=active_settings.embeddings_path,
+            collection_name=active_settings.collection_name,
+        )
+    if backend == "quantized":
+        from src.rag.quantized_store import QuantizedVectorStore
+
+        return QuantizedVectorStore(
+            persist_directory=active_settings.embeddings_path,
+            collection_name=active_settings.collection_name,
+            quantization=active_settings.vector_quantization,
+            rescore_factor=active_settings.quantized_rescore_factor,
+            search_dimensions=active_settings.search_dimensions,
+        )
+    if backend == "hnsw":
+        from src.rag.hnsw_store import HnswVectorStore
+
+        return HnswVectorStore(
+            directory=active_settings.embeddings_path / "hnsw" / active_settings.collection_name,
+            m=active_settings.hnsw_m,
+            ef_construction=active_settings.hnsw_ef_construction,
+            ef_search=active_settings.hnsw_ef_search,
+        )
+    raise ValueError(
+        f"Unknown VECTOR_BACKEND {active_settings.vector_backend!r}; expected 'chroma', 'numpy', 'quantized' or 'hnsw'"
     )
@@ -0,0 +1,137 @@
+""" Watch mode: keep the index in sync with the documents directory. """
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import replace
+from pathlib import Path
+import logging
+import os
+import threading
+import time
+
+from src.rag.config import Settings
+from src.rag.ingest import SUPPORTED_FILE_TYPES, ingest_documents
+
+logger = logging.getLogger(__name__)
+
+
+def _is_supported(path: Path) -> bool:
+    return path.suffix.lower() in SUPPORTED_FILE_TYPES
+
+
+# Absolute, normalized form of an event path; None when it isn't under root
+def _normalize(path: Path, root: Path) -> Path | None:
+    resolved = (root / path).resolve()
+    return resolved if resolved.is_relative_to(root) else None
+
+
+# Stat snapshot of every supported file under root
+def _snapshot(root: Path) -> dict[Path, tuple[int, int]]:
+    snapshot: dict[Path, tuple[int, int]] = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(directory) / filename
+            if not _is_supported(path):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+# Yields the set of changed paths every `interval` seconds (possibly empty)
+def _poll_changes(root: Path, interval: float, stop: threading.Event) -> Iterator[set[Path]]:
+    previous = _snapshot(root)
+    while not stop.wait(interval):
+        current = _snapshot(root)
+        changed = {path for path, state in current.items() if previous.get(path) != state}
+        changed.update(path for path in previous if path not in current)
+        previous = current
+        yield changed
+
+
+# Native file events (inotify & co.) through watchfiles when it is installed,
+# otherwise stat polling. Yields at least every `interval` seconds.
+def _iter_changes(root: Path, interval: float, stop: threading.Event) -> Iterator[set[Path]]:
+    try:
+        import watchfiles
+    except ImportError:
+        logger.info("watchfiles not installed; polling %s every %.1fs", root, interval)
+        yield from _poll_changes(root, interval, stop)
+        return
+
+    logger.info("Watching %s for changes", root)
+    for changes in watchfiles.watch(
+        root,
+        stop_event=stop,
+        rust_timeout=max(1, int(interval * 1000)),
+        yield_on_timeout=True,
+        raise_interrupt=False,
+    ):
+        yield {Path(raw_path) for _, raw_path in changes if _is_supported(Path(raw_path))}
+
+
+def watch_documents(
+    settings: Settings,
+    *,
+    poll_interval: float = 2.0,
+    debounce: float = 1.0,
+    stop: threading.Event | None = None,
+) -> None:
+    """Ingest files under `settings.docs_path` as they are written, until interrupted.
+
+    A file is ingested once it has gone `debounce` seconds without changing, so a
+    burst of writes to the same file triggers one incremental ingest. Deleted files
+    have their chunks removed.
+    """
+    settings.docs_path.mkdir(parents=True, exist_ok=True)
+    # Events carry absolute paths; give ingest the same absolute root so relative keys line up
+    root = settings.docs_path.resolve()
+    settings = replace(settings, docs_path=root)
+    stop = stop or threading.Event()
+    tick = max(0.05, min(poll_interval, debounce / 2 if debounce > 0 else poll_interval))
+    touched: dict[Path, float] = {}  # path -> monotonic time of its last change
+
+    try:
+        for changed in _iter_changes(root, tick, stop):
+            now = time.monotonic()
+            for path in changed:
+                normalized = _normalize(path, root)
+                if normalized is not None:
+                    touched[normalized] = now
+
+            ready = sorted(path for path, changed_at in touched.items() if now - changed_at >= debounce)
+            if not ready:
+                continue
+            for path in ready:
+                del touched[path]
+            _ingest_touched(settings, ready, touched)
+    except KeyboardInterrupt:
+        pass
+    logger.info("Stopped watching %s", root)
+
+
+def _ingest_touched(settings: Settings, paths: list[Path], touched: dict[Path, float]) -> None:
+    logger.info("Ingesting %s changed files", len(paths))
+    try:
+        ingest_documents(settings, paths=paths)
+    except Exception:
+        logger.exception("Watch-mode ingest failed; will retry these files")
+        retry_at = time.monotonic()
+        for path in paths:
+            touched.setdefault(path, retry_at)
+        return
+
+    # End-to-end latency: file mtime -> chunks upserted and searchable
+    done = time.time()
+    for path in paths:
+        relative = path.relative_to(settings.docs_path)
+        try:
+            written = path.stat().st_mtime
+        except FileNotFoundError:
+            logger.info("Removed %s from the index", relative)
+            continue
+        logger.info("%s searchable %.2fs after it was written", relative, done - written)
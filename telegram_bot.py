@@ -24,6 +24,7 @@ from openai import OpenAI
 # medical AI system
 from src.main import process_patient_query
 from src.models.model import PatientQuery
+from src.rag.rate_limiter import get_rate_limiter, rate_limited_http_client
 
 
 load_dotenv()
@@ -52,7 +53,8 @@ class MedicalTelegramBot:
             mapper_mode: Patient ID mapping mode ('json', 'memory', 'env', 'phone')
         """
         self.telegram_token = telegram_token
-        self.openai_client = OpenAI(api_key=openai_api_key)
+        # Whisper calls share the host-wide OpenAI rate limiter with the RAG service
+        self.openai_client = OpenAI(api_key=openai_api_key, http_client=rate_limited_http_client(get_rate_limiter()))
         self.patient_mapper = get_patient_mapper(mapper_mode)
         self.whisper_model = os.getenv("WHISPER_MODEL", "whisper-1")
         self.app = None
@@ -0,0 +1,73 @@
+""" Token-aware chunker: sizes, boundaries, overlap and offsets. """
+
+import pytest
+
+from src.rag.chunking import chunk_spans, chunk_text
+from src.rag.tokens import iter_token_spans
+
+
+def _cost(text: str) -> int:
+    return sum(cost for _, _, cost in iter_token_spans(text))
+
+
+def _words(count: int) -> str:
+    return " ".join(f"w{index}" for index in range(count))
+
+
+def test_short_text_is_one_chunk() -> None:
+    assert chunk_text("Blood pressure stable.", chunk_size=75, chunk_overlap=8) == ["Blood pressure stable."]
+
+
+def test_empty_text_has_no_chunks() -> None:
+    assert chunk_text("  \n ", chunk_size=75, chunk_overlap=8) == []
+
+
+def test_chunks_respect_size_and_overlap() -> None:
+    text = _words(100)
+    chunks = chunk_text(text, chunk_size=20, chunk_overlap=5)
+
+    assert all(_cost(chunk) <= 20 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split()[0] in previous.split()[-5:]
+    assert chunks[-1].endswith("w99")
+
+
+def test_spans_are_offsets_into_the_text() -> None:
+    text = "First line.\n\nSecond paragraph here. " + _words(40)
+    for start, end in chunk_spans(text, chunk_size=15, chunk_overlap=3):
+        assert text[start:end] == text[start:end].strip()
+        assert 0 <= start < end <= len(text)
+
+
+def test_prefers_paragraph_breaks() -> None:
+    text = _words(12) + ".\n\n" + _words(12)
+    first = chunk_text(text, chunk_size=20, chunk_overlap=2)[0]
+    assert first.endswith("w11.")
+
+
+def test_long_token_after_emit_does_not_repeat_overlap() -> None:
+    # The last chunk before the long token ends exactly at the window limit; only its
+    # overlap tail is left in the window when a token wider than the chunk arrives
+    text = _words(10) + " " + "x" * 60 + " " + _words(3)
+    chunks = chunk_text(text, chunk_size=10, chunk_overlap=3)
+
+    assert chunks == [_words(10), "x" * 60, _words(3)]
+    for previous, current in zip(chunks, chunks[1:]):
+        assert not set(current.split()) <= set(previous.split())
+
+
+def test_boundary_inside_the_overlap_is_not_used_as_the_cut() -> None:
+    # The carried overlap ends on a paragraph break; cutting there would emit overlap only
+    text = _words(6) + "\n\n" + "a b c d e f g h"
+    chunks = chunk_text(text, chunk_size=7, chunk_overlap=4)
+
+    assert chunks[0] == _words(6)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert not set(current.split()) <= set(previous.split())
+    assert chunks[-1].endswith("h")
+
+
+@pytest.mark.parametrize("size, overlap", [(0, 0), (5, 5)])
+def test_rejects_invalid_sizes(size: int, overlap: int) -> None:
+    with pytest.raises(ValueError):
+        list(chunk_spans("text", chunk_size=size, chunk_overlap=overlap))
@@ -0,0 +1,82 @@
+""" Circuit breaker: tripping on the failure rate, failing fast, half-open probes and stale outcomes. """
+
+import httpx
+import pytest
+from openai import APITimeoutError, BadRequestError
+
+from src.rag.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+_REQUEST = httpx.Request("POST", "https://api.openai.test/v1/embeddings")
+
+
+def _timeout() -> APITimeoutError:
+    return APITimeoutError(request=_REQUEST)
+
+
+def _bad_request() -> BadRequestError:
+    return BadRequestError("bad input", response=httpx.Response(400, request=_REQUEST), body=None)
+
+
+def _call(breaker: CircuitBreaker, exc: BaseException | None) -> None:
+    breaker.record(breaker.before_call(), exc)
+
+
+def test_trips_once_the_failure_rate_is_reached() -> None:
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, reset_timeout=60.0)
+    _call(breaker, None)
+    _call(breaker, _timeout())
+    _call(breaker, None)
+    assert breaker.state == CLOSED
+
+    _call(breaker, _timeout())
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_request_errors_do_not_count_as_failures() -> None:
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=2)
+    for _ in range(5):
+        _call(breaker, _bad_request())
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_one_probe_and_closes_after_successes() -> None:
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=1, reset_timeout=0.0, probes=2)
+    _call(breaker, _timeout())
+    assert breaker.state == HALF_OPEN
+
+    ticket = breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(ticket, None)
+    _call(breaker, None)
+
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens() -> None:
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=1, reset_timeout=60.0)
+    _call(breaker, _timeout())
+    breaker._opened_at -= 60.0
+    assert breaker.state == HALF_OPEN
+
+    _call(breaker, _timeout())
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_outcomes_of_calls_admitted_before_a_trip_are_ignored() -> None:
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=1, reset_timeout=0.0, probes=1)
+    slow = breaker.before_call()
+    _call(breaker, _timeout())
+    assert breaker.state == HALF_OPEN
+
+    # The slow call admitted while closed must not pass for the probe
+    breaker.record(slow, None)
+
+    assert breaker.state == HALF_OPEN
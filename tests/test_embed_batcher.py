@@ -0,0 +1,73 @@
+""" Embedding batcher: concurrent texts share one request, and bad input is retried alone. """
+
+import asyncio
+from collections.abc import Sequence
+
+from src.rag.embed_batcher import EmbedBatcher
+
+
+class _InputError(ValueError):
+    pass
+
+
+class _Embedder:
+    def __init__(self, *, reject: str | None = None) -> None:
+        self.calls: list[list[str]] = []
+        self._reject = reject
+
+    async def __call__(self, texts: Sequence[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        if self._reject in texts:
+            raise _InputError(f"rejected {self._reject}")
+        return [[float(len(text))] for text in texts]
+
+
+def _embed_all(batcher: EmbedBatcher, texts: list[str]) -> list[object]:
+    async def run() -> list[object]:
+        return await asyncio.gather(*(batcher.embed(text) for text in texts), return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_concurrent_texts_share_one_request() -> None:
+    embedder = _Embedder()
+    batcher = EmbedBatcher(embedder, window=0.01, max_batch=64)
+
+    results = _embed_all(batcher, ["a", "bb", "a", "ccc"])
+
+    assert results == [[1.0], [2.0], [1.0], [3.0]]
+    assert embedder.calls == [["a", "bb", "ccc"]]
+    assert batcher.stats()["requests"] == 4
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window() -> None:
+    embedder = _Embedder()
+    batcher = EmbedBatcher(embedder, window=10.0, max_batch=2)
+
+    results = _embed_all(batcher, ["a", "bb"])
+
+    assert results == [[1.0], [2.0]]
+    assert embedder.calls == [["a", "bb"]]
+
+
+def test_input_errors_split_the_batch() -> None:
+    embedder = _Embedder(reject="bad")
+    batcher = EmbedBatcher(embedder, window=0.01, max_batch=64, split_on=(_InputError,))
+
+    results = _embed_all(batcher, ["a", "bad", "cc"])
+
+    assert results[0] == [1.0]
+    assert isinstance(results[1], _InputError)
+    assert results[2] == [2.0]
+    assert embedder.calls[0] == ["a", "bad", "cc"]
+    assert sorted(map(tuple, embedder.calls[1:])) == [("a",), ("bad",), ("cc",)]
+
+
+def test_other_errors_fail_the_whole_batch() -> None:
+    embedder = _Embedder(reject="bad")
+    batcher = EmbedBatcher(embedder, window=0.01, max_batch=64)
+
+    results = _embed_all(batcher, ["a", "bad"])
+
+    assert all(isinstance(result, _InputError) for result in results)
+    assert len(embedder.calls) == 1
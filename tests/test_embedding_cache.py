@@ -0,0 +1,63 @@
+""" Persistent embedding cache: lookups, deferred last-used writes and LRU eviction. """
+
+from pathlib import Path
+import sqlite3
+
+import pytest
+
+from src.rag import embedding_cache
+from src.rag.embedding_cache import EmbeddingCache
+
+
+def _last_used(path: Path, text: str) -> float:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_used FROM embeddings WHERE text_hash = ?", (embedding_cache.text_hash(text),)).fetchone()[0]
+
+
+def test_hits_and_misses_are_aligned_with_texts(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=10)
+    cache.put_many("m", 2, ["a"], [[0.5, 0.25]])
+
+    assert cache.get_many("m", 2, ["a", "b", "a"]) == [[0.5, 0.25], None, [0.5, 0.25]]
+    assert cache.get_many("m", 3, ["a"]) == [None]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_hits_do_not_write_until_flushed(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_entries=10)
+    cache.put_many("m", 2, ["a"], [[1.0, 0.0]])
+    stored = _last_used(path, "a")
+
+    changes = cache._conn.total_changes
+    for _ in range(20):
+        cache.get_many("m", 2, ["a"])
+
+    assert cache._conn.total_changes == changes
+    assert _last_used(path, "a") == stored
+    cache.close()
+    assert _last_used(path, "a") > stored
+
+
+def test_touches_flush_after_the_interval(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_entries=10)
+    cache.put_many("m", 2, ["a"], [[1.0, 0.0]])
+    stored = _last_used(path, "a")
+    monkeypatch.setattr(embedding_cache, "_TOUCH_FLUSH_INTERVAL", 0.0)
+
+    cache.get_many("m", 2, ["a"])
+
+    assert _last_used(path, "a") > stored
+
+
+def test_eviction_keeps_recently_hit_entries(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=10)
+    texts = [f"t{index}" for index in range(10)]
+    cache.put_many("m", 1, texts, [[float(index)] for index in range(10)])
+    cache.get_many("m", 1, ["t0"])  # only recorded in memory so far
+
+    cache.put_many("m", 1, ["new"], [[1.0]])
+
+    assert cache.get_many("m", 1, ["t0"]) == [[0.0]]
+    assert cache.stats()["entries"] <= 10
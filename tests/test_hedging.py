@@ -0,0 +1,73 @@
+""" Hedged requests: no hedging without samples, a duplicate for slow calls, first success wins. """
+
+import asyncio
+
+import pytest
+
+from src.rag.hedging import Hedger
+
+
+def _warm(hedger: Hedger, samples: int) -> None:
+    async def fast() -> str:
+        return "fast"
+
+    async def run() -> None:
+        for _ in range(samples):
+            await hedger.run(fast)
+
+    asyncio.run(run())
+
+
+def test_no_hedging_until_enough_samples() -> None:
+    hedger = Hedger(min_samples=5, min_delay=0.01)
+    _warm(hedger, 4)
+
+    assert hedger.delay() is None
+    assert hedger.stats()["hedged"] == 0
+
+    _warm(hedger, 1)
+    assert hedger.delay() == pytest.approx(0.01)
+
+
+def test_slow_call_is_hedged_and_the_duplicate_wins() -> None:
+    hedger = Hedger(min_samples=1, min_delay=0.01)
+    _warm(hedger, 1)
+    calls: list[int] = []
+
+    async def operation() -> str:
+        calls.append(len(calls))
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+            return "primary"
+        return "hedge"
+
+    assert asyncio.run(hedger.run(operation)) == "hedge"
+    assert len(calls) == 2
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_one_failed_copy_waits_for_the_other() -> None:
+    hedger = Hedger(min_samples=1, min_delay=0.01)
+    _warm(hedger, 1)
+    calls: list[int] = []
+
+    async def operation() -> str:
+        calls.append(len(calls))
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            return "primary"
+        raise RuntimeError("hedge failed")
+
+    assert asyncio.run(hedger.run(operation)) == "primary"
+
+
+def test_both_copies_failing_raises() -> None:
+    hedger = Hedger(min_samples=1, min_delay=0.01)
+    _warm(hedger, 1)
+
+    async def operation() -> str:
+        await asyncio.sleep(0.02)
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        asyncio.run(hedger.run(operation))
@@ -0,0 +1,106 @@
+""" Self-contained HNSW backend: filtering, persistence, compaction and concurrent search. """
+
+from pathlib import Path
+import threading
+
+import numpy as np
+
+from src.rag.hnsw_store import HnswIndex, HnswVectorStore
+from src.rag.vector_store import DocumentChunk
+
+
+def _chunk(chunk_id: str, patient_id: str) -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=chunk_id,
+        document_id=f"{patient_id}__note.txt",
+        source_path=f"{patient_id}/note.txt",
+        chunk_index=0,
+        content=f"content of {chunk_id}",
+        patient_id=patient_id,
+    )
+
+
+def _vectors(count: int, dimensions: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+
+
+def _store(tmp_path: Path, **kwargs) -> HnswVectorStore:
+    return HnswVectorStore(directory=tmp_path / "hnsw", m=8, ef_construction=50, ef_search=50, **kwargs)
+
+
+def test_graph_search_finds_exact_neighbours() -> None:
+    vectors = _vectors(500)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = HnswIndex(dimensions=16, m=8, ef_construction=50)
+    for vector in vectors:
+        index.add(vector)
+
+    hits = 0
+    for query in vectors[:50]:
+        exact = set(np.argsort(1.0 - vectors @ query)[:5].tolist())
+        hits += len(exact & {node for _, node in index.search(query, 5, ef=50)})
+    assert hits / 250 >= 0.9
+
+
+def test_results_stay_within_the_patient(tmp_path: Path) -> None:
+    store = _store(tmp_path, exact_search_limit=0)  # force the graph walk with an allowed mask
+    vectors = _vectors(200)
+    store.upsert([_chunk(f"c{index}", f"p{index % 4}") for index in range(200)], vectors)
+
+    results = store.similarity_search(vectors[0], top_k=10, patient_id="p1")
+
+    assert len(results) == 10
+    assert all(chunk.metadata["patient_id"] == "p1" for chunk in results)
+
+
+def test_persisted_version_is_loaded_by_another_instance(tmp_path: Path) -> None:
+    writer = _store(tmp_path)
+    vectors = _vectors(20)
+    writer.upsert([_chunk(f"c{index}", "p1") for index in range(20)], vectors)
+    writer.delete(["c0"])
+    writer.persist()
+
+    reader = _store(tmp_path)
+    results = reader.similarity_search(vectors[0], top_k=20, patient_id="p1")
+
+    assert len(results) == 19
+    assert "c0" not in {chunk.chunk_id for chunk in results}
+
+
+def test_persist_compacts_tombstones(tmp_path: Path) -> None:
+    store = _store(tmp_path, compact_ratio=0.2)
+    vectors = _vectors(50)
+    store.upsert([_chunk(f"c{index}", "p1") for index in range(50)], vectors)
+    store.delete([f"c{index}" for index in range(20)])
+    store.persist()
+
+    assert len(store._ids) == 30
+    assert {chunk.chunk_id for chunk in store.similarity_search(vectors[30], top_k=50)} == {f"c{index}" for index in range(20, 50)}
+
+
+def test_searches_run_while_another_thread_writes(tmp_path: Path) -> None:
+    store = _store(tmp_path, exact_search_limit=0)
+    vectors = _vectors(400)
+    store.upsert([_chunk(f"c{index}", "p1") for index in range(100)], vectors[:100])
+    errors: list[BaseException] = []
+    done = threading.Event()
+
+    def search() -> None:
+        try:
+            while not done.is_set():
+                for chunk in store.similarity_search(vectors[0], top_k=5, patient_id="p1"):
+                    assert chunk.content == f"content of {chunk.chunk_id}"
+        except BaseException as exc:  # surfaced below
+            errors.append(exc)
+
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for start in range(100, 400, 20):
+        store.upsert([_chunk(f"c{index}", "p1") for index in range(start, start + 20)], vectors[start : start + 20])
+        store.delete([f"c{start - 100}"])
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
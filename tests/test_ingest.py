@@ -0,0 +1,110 @@
+""" Incremental ingestion regression tests (stubbed embedder, no OpenAI calls). """
+
+from dataclasses import replace
+from pathlib import Path
+
+from src.rag.benchmarks import StubEmbedder
+from src.rag.config import get_settings
+from src.rag.ingest import ingest_documents
+from src.rag.vector_store import get_vector_store
+
+
+def _settings(tmp_path: Path):
+    return replace(
+        get_settings(),
+        docs_path=tmp_path / "documents",
+        embeddings_path=tmp_path / "embeddings",
+        collection_name="test",
+        vector_backend="chroma",
+        vector_partitioning="none",
+        vector_snapshot_path=None,
+        lexical_index=False,
+        dedup_threshold=0.9,
+        embed_dimensions=8,
+        chunk_size=200,
+        chunk_overlap=20,
+    )
+
+
+def _stored_ids(settings) -> set[str]:
+    return {chunk_id for ids, *_ in get_vector_store(settings).iter_records() for chunk_id in ids}
+
+
+def test_deleting_canonical_file_keeps_near_duplicate_content(tmp_path: Path) -> None:
+    settings = _settings(tmp_path)
+    client = StubEmbedder(dimensions=settings.embed_dimensions)
+    patient = settings.docs_path / "p1"
+    patient.mkdir(parents=True)
+    text = "Patient reports mild headache after starting lisinopril ten mg daily; advised to monitor blood pressure."
+    (patient / "a.txt").write_text(text, encoding="utf-8")
+    (patient / "b.txt").write_text(text, encoding="utf-8")
+
+    ingest_documents(settings, client=client)
+    assert _stored_ids(settings) == {"p1__a.txt__chunk_0"}
+
+    (patient / "a.txt").unlink()
+    ingest_documents(settings, client=client)
+    assert _stored_ids(settings) == {"p1__b.txt__chunk_0"}
+
+
+def test_new_file_dedupes_against_unchanged_files(tmp_path: Path) -> None:
+    settings = _settings(tmp_path)
+    client = StubEmbedder(dimensions=settings.embed_dimensions)
+    patient = settings.docs_path / "p1"
+    patient.mkdir(parents=True)
+    text = "Discharged stable on metformin five hundred mg twice daily with follow up in two weeks."
+    (patient / "a.txt").write_text(text, encoding="utf-8")
+    ingest_documents(settings, client=client)
+
+    (patient / "b.txt").write_text(text, encoding="utf-8")
+    assert ingest_documents(settings, client=client) == 0
+    assert _stored_ids(settings) == {"p1__a.txt__chunk_0"}
+
+
+def test_changing_embed_dimensions_reindexes_everything(tmp_path: Path) -> None:
+    settings = _settings(tmp_path)
+    patient = settings.docs_path / "p1"
+    patient.mkdir(parents=True)
+    (patient / "a.txt").write_text("Blood pressure within normal range at follow up.", encoding="utf-8")
+    ingest_documents(settings, client=StubEmbedder(dimensions=settings.embed_dimensions))
+
+    resized = replace(settings, embed_dimensions=12)
+    assert ingest_documents(resized, client=StubEmbedder(dimensions=12)) == 1
+    (_, embeddings, _, _), = get_vector_store(resized).iter_records()
+    assert embeddings.shape == (1, 12)
+
+
+def test_snapshot_is_only_exported_when_the_index_changes(tmp_path: Path) -> None:
+    settings = replace(_settings(tmp_path), vector_snapshot_path=tmp_path / "snapshot.npz")
+    client = StubEmbedder(dimensions=settings.embed_dimensions)
+    patient = settings.docs_path / "p1"
+    patient.mkdir(parents=True)
+    (patient / "a.txt").write_text("Allergic to penicillin; tolerates cephalexin.", encoding="utf-8")
+    ingest_documents(settings, client=client)
+    exported = settings.vector_snapshot_path.stat().st_mtime_ns
+
+    assert ingest_documents(settings, client=client) == 0
+    assert settings.vector_snapshot_path.stat().st_mtime_ns == exported
+
+    settings.vector_snapshot_path.unlink()
+    ingest_documents(settings, client=client)
+    assert settings.vector_snapshot_path.exists()
+
+
+def test_dedup_is_off_by_default(tmp_path: Path) -> None:
+    settings = replace(_settings(tmp_path), dedup_threshold=get_settings().dedup_threshold)
+    client = StubEmbedder(dimensions=settings.embed_dimensions)
+    patient = settings.docs_path / "p1"
+    patient.mkdir(parents=True)
+    report = (
+        "Basic metabolic panel drawn this morning. Sodium 139 mmol/L. Potassium {} mmol/L. Chloride 102 mmol/L. "
+        "Bicarbonate 24 mmol/L. BUN 14 mg/dL. Creatinine 0.9 mg/dL. Glucose 98 mg/dL. Calcium 9.4 mg/dL. "
+        "Magnesium 2.0 mg/dL. Phosphorus 3.5 mg/dL. Albumin 4.0 g/dL. Results reviewed with the attending."
+    )
+    (patient / "labs_monday.txt").write_text(report.format("4.1"), encoding="utf-8")
+    (patient / "labs_tuesday.txt").write_text(report.format("6.8"), encoding="utf-8")
+
+    ingest_documents(settings, client=client)
+
+    assert settings.dedup_threshold == 0
+    assert _stored_ids(settings) == {"p1__labs_monday.txt__chunk_0", "p1__labs_tuesday.txt__chunk_0"}
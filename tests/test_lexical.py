@@ -0,0 +1,73 @@
+""" BM25 index: patient isolation and rank fusion. """
+
+from pathlib import Path
+import sqlite3
+
+from src.rag.lexical import LexicalIndex, reciprocal_rank_fusion
+from src.rag.vector_store import DocumentChunk, RetrievedChunk
+
+
+def _chunk(patient_id: str, content: str) -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=f"{patient_id}__note.txt__chunk_0",
+        document_id=f"{patient_id}__note.txt",
+        source_path=f"{patient_id}/note.txt",
+        chunk_index=0,
+        content=content,
+        patient_id=patient_id,
+    )
+
+
+def test_patient_filter_is_exact(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    patients = ["patient_001", "PATIENT_001", "patients_001", "patient_001_b", "patient 001"]
+    index.upsert([_chunk(patient_id, "Potassium 6.8 mmol/L, repeat warfarin dose.") for patient_id in patients])
+
+    results = index.search("warfarin potassium", top_k=10, patient_id="patient_001")
+
+    assert [chunk.chunk_id for chunk in results] == ["patient_001__note.txt__chunk_0"]
+    assert len(index.search("warfarin", top_k=10)) == len(patients)
+
+
+def test_stemmed_terms_match_content(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    index.upsert([_chunk("p1", "Known allergies: penicillin.")])
+
+    assert [chunk.chunk_id for chunk in index.search("allergy", top_k=5, patient_id="p1")] == ["p1__note.txt__chunk_0"]
+    assert index.search("allergy", top_k=5, patient_id="p2") == []
+
+
+def test_upsert_replaces_and_delete_removes(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    index.upsert([_chunk("p1", "Started metformin.")])
+    index.upsert([_chunk("p1", "Stopped lisinopril.")])
+
+    assert len(index) == 1
+    assert index.search("metformin", top_k=5, patient_id="p1") == []
+    index.delete(["p1__note.txt__chunk_0"])
+    assert len(index) == 0
+
+
+def test_tokenized_patient_index_is_dropped(tmp_path: Path) -> None:
+    path = tmp_path / "lexical.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE VIRTUAL TABLE chunks USING fts5(content, patient_id, chunk_id UNINDEXED, metadata UNINDEXED)")
+    conn.execute("INSERT INTO chunks VALUES ('warfarin', 'p1', 'p1__note.txt__chunk_0', '{}')")
+    conn.commit()
+    conn.close()
+
+    index = LexicalIndex(path)
+
+    assert len(index) == 0
+    index.upsert([_chunk("p1", "warfarin")])
+    assert len(index.search("warfarin", top_k=5, patient_id="p1")) == 1
+
+
+def test_reciprocal_rank_fusion_orders_by_summed_reciprocal_rank() -> None:
+    def ranked(*ids: str) -> list[RetrievedChunk]:
+        return [RetrievedChunk(chunk_id=chunk_id, content=chunk_id, score=0.5, metadata={}) for chunk_id in ids]
+
+    fused = reciprocal_rank_fusion([ranked("a", "b"), ranked("b", "c")], top_k=2)
+
+    assert [chunk.chunk_id for chunk in fused] == ["b", "a"]
+    assert fused[0].metadata["rrf_score"] == 1 / 62 + 1 / 61
@@ -0,0 +1,62 @@
+""" NumPy exact-search backend: per-patient results and cross-process freshness. """
+
+from pathlib import Path
+
+import pytest
+
+from src.rag import numpy_store
+from src.rag.numpy_store import NumpyVectorStore
+from src.rag.vector_store import DocumentChunk
+
+
+def _chunk(chunk_id: str, patient_id: str = "p1") -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=chunk_id,
+        document_id=f"{patient_id}__note.txt",
+        source_path=f"{patient_id}/note.txt",
+        chunk_index=0,
+        content=f"content of {chunk_id}",
+        patient_id=patient_id,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _check_every_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(numpy_store, "_STALE_CHECK_INTERVAL", 0.0)
+
+
+def _ids(store: NumpyVectorStore, patient_id: str | None = "p1") -> list[str]:
+    return [chunk.chunk_id for chunk in store.similarity_search([1.0, 0.0, 0.0], top_k=10, patient_id=patient_id)]
+
+
+def test_search_is_scoped_to_the_patient(tmp_path: Path) -> None:
+    store = NumpyVectorStore(persist_directory=tmp_path, collection_name="test")
+    store.upsert([_chunk("a", "p1"), _chunk("b", "p2")], [[1.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+
+    assert _ids(store, "p1") == ["a"]
+    assert _ids(store, "p2") == ["b"]
+    assert sorted(_ids(store, None)) == ["a", "b"]
+
+
+def test_reader_sees_writes_from_another_instance(tmp_path: Path) -> None:
+    reader = NumpyVectorStore(persist_directory=tmp_path, collection_name="test")
+    writer = NumpyVectorStore(persist_directory=tmp_path, collection_name="test")
+    writer.upsert([_chunk("a")], [[1.0, 0.0, 0.0]])
+    assert _ids(reader) == ["a"]
+
+    writer.upsert([_chunk("b")], [[0.9, 0.1, 0.0]])
+    assert _ids(reader) == ["a", "b"]
+
+    writer.delete(["a"])
+    assert _ids(reader) == ["b"]
+
+
+def test_matrices_are_reused_until_the_collection_changes(tmp_path: Path) -> None:
+    store = NumpyVectorStore(persist_directory=tmp_path, collection_name="test")
+    store.upsert([_chunk("a")], [[1.0, 0.0, 0.0]])
+    _ids(store)
+    loaded = store._matrices["p1"]
+
+    _ids(store)
+
+    assert store._matrices["p1"] is loaded
@@ -0,0 +1,59 @@
+""" Async OpenAI client: per-loop connection pools and request parameters. """
+
+import asyncio
+
+import httpx
+
+from src.rag.openai_client import AsyncOpenAIClient, OpenAIClientConfig, _LoopLocalTransport
+
+
+class _Transport(httpx.AsyncBaseTransport):
+    def __init__(self) -> None:
+        self.loops: list[asyncio.AbstractEventLoop] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.loops.append(asyncio.get_running_loop())
+        return httpx.Response(200)
+
+
+class _Responses:
+    def __init__(self) -> None:
+        self.calls: list[dict[str, object]] = []
+
+    async def create(self, **params: object) -> object:
+        self.calls.append(params)
+        return type("Response", (), {"output_text": "answer"})()
+
+
+def test_each_event_loop_gets_its_own_pool() -> None:
+    pools: list[_Transport] = []
+
+    def factory() -> _Transport:
+        pools.append(_Transport())
+        return pools[-1]
+
+    client = httpx.AsyncClient(transport=_LoopLocalTransport(factory))
+
+    async def two_requests() -> None:
+        await client.get("https://example.test/a")
+        await client.get("https://example.test/b")
+
+    asyncio.run(two_requests())
+    asyncio.run(two_requests())
+
+    assert len(pools) == 2
+    assert [len(pool.loops) for pool in pools] == [2, 2]
+    assert pools[0].loops[0] is not pools[1].loops[0]
+
+
+def test_generate_answer_sends_the_temperature() -> None:
+    client = AsyncOpenAIClient(OpenAIClientConfig(api_key="test", embed_model="model", max_retries=0))
+    responses = _Responses()
+    client._client = type("Client", (), {"responses": responses})()
+
+    answer = asyncio.run(client.generate_answer(instructions="i", prompt="p", model="m", max_output_tokens=10, temperature=0.3))
+    asyncio.run(client.generate_answer(instructions="i", prompt="p", model="m", max_output_tokens=10))
+
+    assert answer == "answer"
+    assert responses.calls[0]["temperature"] == 0.3
+    assert "temperature" not in responses.calls[1]
@@ -0,0 +1,60 @@
+""" Partitioned Chroma backend: patients never see each other's chunks, in either partitioning mode. """
+
+from pathlib import Path
+
+import pytest
+
+from src.rag.partitioned_store import PartitionedChromaVectorStore
+from src.rag.vector_store import DocumentChunk
+
+
+def _chunk(chunk_id: str, patient_id: str) -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=chunk_id,
+        document_id=f"{patient_id}__note.txt",
+        source_path=f"{patient_id}/note.txt",
+        chunk_index=0,
+        content=f"content of {chunk_id}",
+        patient_id=patient_id,
+    )
+
+
+def _ids(store: PartitionedChromaVectorStore, patient_id: str | None) -> list[str]:
+    return sorted(chunk.chunk_id for chunk in store.similarity_search([1.0, 0.0, 0.0], top_k=10, patient_id=patient_id))
+
+
+@pytest.mark.parametrize("mode", ["patient", "hash"])
+def test_search_is_scoped_to_the_patient(tmp_path: Path, mode: str) -> None:
+    # "p.1" and "p 1" share a collection-name slug; "hash" with one bucket puts everyone together
+    store = PartitionedChromaVectorStore(persist_directory=tmp_path, collection_name="test", mode=mode, buckets=1)
+    store.upsert(
+        [_chunk("a", "p.1"), _chunk("b", "p 1"), _chunk("c", "p2")],
+        [[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 0.0, 0.0]],
+    )
+
+    assert _ids(store, "p.1") == ["a"]
+    assert _ids(store, "p 1") == ["b"]
+    assert _ids(store, "p2") == ["c"]
+    assert _ids(store, "p3") == []
+    assert _ids(store, None) == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("mode", ["patient", "hash"])
+def test_delete_patient_leaves_the_others(tmp_path: Path, mode: str) -> None:
+    store = PartitionedChromaVectorStore(persist_directory=tmp_path, collection_name="test", mode=mode, buckets=1)
+    store.upsert([_chunk("a", "p1"), _chunk("b", "p2")], [[1.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+
+    store.delete_patient("p1")
+
+    assert _ids(store, "p1") == []
+    assert _ids(store, "p2") == ["b"]
+
+
+def test_delete_by_id_uses_the_routes(tmp_path: Path) -> None:
+    store = PartitionedChromaVectorStore(persist_directory=tmp_path, collection_name="test")
+    store.upsert([_chunk("a", "p1"), _chunk("b", "p1"), _chunk("c", "p2")], [[1.0, 0.0, 0.0]] * 3)
+
+    store.delete(["a", "c"])
+
+    assert _ids(store, "p1") == ["b"]
+    assert _ids(store, "p2") == []
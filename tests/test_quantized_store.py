@@ -0,0 +1,71 @@
+""" Quantized backend: per-patient results served from the index files, without Chroma on the query path. """
+
+from pathlib import Path
+
+import pytest
+
+from src.rag import quantized_store
+from src.rag.quantized_store import QuantizedVectorStore
+from src.rag.vector_store import DocumentChunk
+
+
+def _chunk(chunk_id: str, patient_id: str = "p1") -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=chunk_id,
+        document_id=f"{patient_id}__note.txt",
+        source_path=f"{patient_id}/note.txt",
+        chunk_index=0,
+        content=f"content of {chunk_id}",
+        patient_id=patient_id,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _check_every_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(quantized_store, "_STALE_CHECK_INTERVAL", 0.0)
+
+
+def _store(tmp_path: Path, quantization: str = "int8") -> QuantizedVectorStore:
+    return QuantizedVectorStore(persist_directory=tmp_path, collection_name="test", quantization=quantization)
+
+
+def _ids(store: QuantizedVectorStore, patient_id: str | None = "p1") -> list[str]:
+    return [chunk.chunk_id for chunk in store.similarity_search([1.0, 0.0, 0.0], top_k=10, patient_id=patient_id)]
+
+
+def test_search_is_scoped_to_the_patient_and_returns_documents(tmp_path: Path) -> None:
+    writer = _store(tmp_path)
+    writer.upsert([_chunk("a", "p1"), _chunk("b", "p2"), _chunk("c", "p1")], [[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.6, 0.8, 0.0]])
+    writer.refresh()
+
+    results = writer.similarity_search([1.0, 0.0, 0.0], top_k=10, patient_id="p1")
+
+    assert [chunk.chunk_id for chunk in results] == ["a", "c"]
+    assert results[0].content == "content of a"
+    assert results[0].metadata["patient_id"] == "p1"
+    assert _ids(writer, "p2") == ["b"]
+
+
+def test_queries_do_not_open_chroma(tmp_path: Path) -> None:
+    writer = _store(tmp_path)
+    writer.upsert([_chunk("a")], [[1.0, 0.0, 0.0]])
+    writer.refresh()
+    reader = _store(tmp_path)
+
+    assert _ids(reader) == ["a"]
+
+    writer.upsert([_chunk("b")], [[0.9, 0.1, 0.0]])
+    writer.refresh()
+    assert _ids(reader) == ["a", "b"]
+    assert reader._chroma is None
+
+
+def test_full_width_float16_keeps_no_separate_rescoring_copy(tmp_path: Path) -> None:
+    store = _store(tmp_path, "float16")
+    store.upsert([_chunk("a"), _chunk("b")], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    store.refresh()
+
+    index = store.index()
+
+    assert not (index.directory / "vectors.npy").exists()
+    assert _ids(store) == ["a", "b"]
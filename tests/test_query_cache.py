@@ -0,0 +1,150 @@
+""" Query-result cache: LRU/TTL, per-patient invalidation and the CachedVectorStore wrapper. """
+
+from pathlib import Path
+import os
+import time
+
+import pytest
+
+from src.rag import query_cache
+from src.rag.manifest import FileRecord, IngestManifest, changed_patients
+from src.rag.query_cache import CachedVectorStore, QueryCache, normalize_query
+from src.rag.vector_store import RetrievedChunk, VectorStore
+
+
+def _chunk(chunk_id: str) -> RetrievedChunk:
+    return RetrievedChunk(chunk_id=chunk_id, content=chunk_id, score=0.5, metadata={})
+
+
+class _Client:
+    def embed_text(self, text: str) -> list[float]:
+        return [1.0, 0.0]
+
+
+class _CountingStore(VectorStore):
+    """Returns one chunk named after the patient and counts searches, refreshes and clears."""
+
+    def __init__(self) -> None:
+        self.searches = 0
+        self.refreshed = 0
+        self.cleared = 0
+
+    def upsert(self, chunks, embeddings) -> None:
+        pass
+
+    def delete(self, chunk_ids) -> None:
+        pass
+
+    def similarity_search_many(self, embeddings, *, top_k, patient_id=None, where=None):
+        self.searches += 1
+        return [[_chunk(f"{patient_id}__note.txt__chunk_0")] for _ in embeddings]
+
+    def refresh(self) -> None:
+        self.refreshed += 1
+
+    def clear(self) -> None:
+        self.cleared += 1
+
+
+def _search(store: CachedVectorStore, patient_id: str, query: str = "warfarin dose") -> list[RetrievedChunk]:
+    return store.similarity_search_text(query, client=_Client(), top_k=5, patient_id=patient_id)
+
+
+def test_normalize_query_ignores_case_and_spacing() -> None:
+    assert normalize_query("  Warfarin\tDOSE ") == normalize_query("warfarin dose")
+
+
+def test_lru_evicts_the_least_recently_used() -> None:
+    cache = QueryCache(max_entries=2, ttl=0)
+    cache.put(("p1", "a", 5), [_chunk("a")])
+    cache.put(("p1", "b", 5), [_chunk("b")])
+    cache.get(("p1", "a", 5))
+    cache.put(("p1", "c", 5), [_chunk("c")])
+
+    assert cache.get(("p1", "b", 5)) is None
+    assert cache.get(("p1", "a", 5)) is not None
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_the_ttl() -> None:
+    cache = QueryCache(max_entries=10, ttl=0.01)
+    cache.put(("p1", "a", 5), [_chunk("a")])
+    time.sleep(0.02)
+    assert cache.get(("p1", "a", 5)) is None
+
+
+def test_invalidation_is_per_patient_plus_unfiltered() -> None:
+    cache = QueryCache(max_entries=10, ttl=0)
+    for patient_id in ("p1", "p2", None):
+        cache.put((patient_id, "a", 5), [_chunk("a")])
+
+    cache.invalidate_patients({"p1"})
+
+    assert cache.get(("p1", "a", 5)) is None
+    assert cache.get((None, "a", 5)) is None
+    assert cache.get(("p2", "a", 5)) is not None
+
+
+def test_put_after_an_overlapping_invalidation_is_dropped() -> None:
+    cache = QueryCache(max_entries=10, ttl=0)
+    generation = cache.generation
+    cache.invalidate_patients({"p1"})
+    cache.put(("p1", "a", 5), [_chunk("stale")], generation=generation)
+    assert cache.get(("p1", "a", 5)) is None
+
+
+def test_repeated_queries_are_served_from_the_cache() -> None:
+    inner = _CountingStore()
+    store = CachedVectorStore(inner, QueryCache(max_entries=10, ttl=0))
+
+    _search(store, "p1")
+    _search(store, "p1", "  WARFARIN dose")
+
+    assert inner.searches == 1
+
+
+@pytest.mark.parametrize("method, counter", [("refresh", "refreshed"), ("clear", "cleared")])
+def test_refresh_and_clear_are_forwarded_and_drop_cached_results(method: str, counter: str) -> None:
+    inner = _CountingStore()
+    store = CachedVectorStore(inner, QueryCache(max_entries=10, ttl=0))
+    _search(store, "p1")
+
+    getattr(store, method)()
+    _search(store, "p1")
+
+    assert getattr(inner, counter) == 1
+    assert inner.searches == 2
+
+
+def _manifest(files: dict[str, str], **overrides) -> IngestManifest:
+    fields = {"embed_model": "m", "chunk_size": 75, "chunk_overlap": 8, **overrides}
+    return IngestManifest(
+        files={name: FileRecord(size=1, mtime_ns=1, content_hash=content_hash) for name, content_hash in files.items()},
+        **fields,
+    )
+
+
+def test_changed_patients_compares_file_records() -> None:
+    old = _manifest({"p1/a.txt": "x", "p2/b.txt": "y", "p3/c.txt": "z"})
+    new = _manifest({"p1/a.txt": "x2", "p2/b.txt": "y", "p4/d.txt": "w"})
+
+    assert changed_patients(old, new) == {"p1", "p3", "p4"}
+    assert changed_patients(old, _manifest({"p1/a.txt": "x"}, chunk_size=200)) is None
+    assert changed_patients(None, new) is None
+
+
+def test_ingest_in_another_process_invalidates_only_its_patients(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(query_cache, "_MANIFEST_CHECK_INTERVAL", 0.0)
+    manifest_file = tmp_path / "ingest_manifest.json"
+    _manifest({"p1/a.txt": "x", "p2/b.txt": "y"}).save(manifest_file)
+    inner = _CountingStore()
+    store = CachedVectorStore(inner, QueryCache(max_entries=10, ttl=0), manifest_file=manifest_file)
+    _search(store, "p1")
+    _search(store, "p2")
+
+    _manifest({"p1/a.txt": "x2", "p2/b.txt": "y"}).save(manifest_file)
+    os.utime(manifest_file, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    _search(store, "p1")
+    _search(store, "p2")
+
+    assert inner.searches == 3
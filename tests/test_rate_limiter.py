@@ -0,0 +1,91 @@
+""" Host-wide token buckets: reservations, learned limits, 429 blocking and the async transport. """
+
+import asyncio
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.rag.rate_limiter import AsyncRateLimitedTransport, RateLimiter, parse_reset, request_cost
+
+
+@pytest.mark.parametrize("value, seconds", [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m", 3720.0), ("2.5", 2.5), ("", None), ("soon", None)])
+def test_parse_reset(value: str, seconds: float | None) -> None:
+    assert parse_reset(value) == pytest.approx(seconds) if seconds is not None else parse_reset(value) is None
+
+
+def test_request_cost_counts_prompt_and_completion_budget() -> None:
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses", json={"model": "gpt-4.1-nano", "input": "hi", "max_output_tokens": 100})
+    model, tokens = request_cost(request)
+    assert model == "gpt-4.1-nano"
+    assert tokens > 100
+
+
+def test_unknown_models_are_unlimited_until_seen(tmp_path: Path) -> None:
+    limiter = RateLimiter(tmp_path / "limits.sqlite3")
+    assert [limiter.reserve("m") for _ in range(100)] == [0.0] * 100
+
+
+def test_exhausted_bucket_returns_a_wait(tmp_path: Path) -> None:
+    limiter = RateLimiter(tmp_path / "limits.sqlite3", requests_per_minute=60, headroom=1.0)
+    waits = [limiter.reserve("m") for _ in range(61)]
+    assert waits[:60] == [0.0] * 60
+    assert waits[60] == pytest.approx(1.0, abs=0.1)
+
+
+def test_headers_teach_limits_and_429_blocks_until_reset(tmp_path: Path) -> None:
+    limiter = RateLimiter(tmp_path / "limits.sqlite3", headroom=1.0)
+    limiter.observe("m", {"x-ratelimit-limit-requests": "600", "x-ratelimit-remaining-requests": "600"})
+    assert limiter.reserve("m") == 0.0
+
+    limiter.observe("m", {"x-ratelimit-remaining-requests": "0", "retry-after-ms": "2000"}, status_code=429)
+
+    assert limiter.reserve("m") == pytest.approx(2.0, abs=0.2)
+    assert limiter.stats()["rate_limited_responses"] == 1
+
+
+def test_limiter_is_shared_across_instances_on_one_path(tmp_path: Path) -> None:
+    first = RateLimiter(tmp_path / "limits.sqlite3", requests_per_minute=60, headroom=1.0)
+    second = RateLimiter(tmp_path / "limits.sqlite3", requests_per_minute=60, headroom=1.0)
+    for _ in range(60):
+        first.reserve("m")
+    assert second.reserve("m") > 0
+
+
+class _OkTransport(httpx.AsyncBaseTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"x-ratelimit-limit-requests": "600"})
+
+
+def test_async_transport_keeps_the_event_loop_free_while_the_database_is_locked(tmp_path: Path) -> None:
+    path = tmp_path / "limits.sqlite3"
+    transport = AsyncRateLimitedTransport(_OkTransport(), RateLimiter(path))
+    # Another process (an ingest run) holds the write lock for a while
+    holder = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, lambda: holder.execute("COMMIT")).start()
+
+    async def scenario() -> tuple[int, httpx.Response]:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        response = await transport.handle_async_request(httpx.Request("POST", "https://api.openai.com/v1/embeddings", json={"model": "m"}))
+        ticking.cancel()
+        return ticks, response
+
+    started = time.perf_counter()
+    ticks, response = asyncio.run(scenario())
+    holder.close()
+
+    assert response.status_code == 200
+    assert time.perf_counter() - started >= 0.25
+    assert ticks >= 10
@@ -0,0 +1,76 @@
+""" Retry policy: bounded attempts, the retry budget and which clients draw from it. """
+
+from pathlib import Path
+import time
+
+import httpx
+import pytest
+from openai import APITimeoutError
+
+from src.rag.config import Settings
+from src.rag.openai_client import get_openai_client
+from src.rag.retry import DeadlineExceeded, RetryBudget, RetryPolicy, deadline_scope
+
+
+def _failing(failures: int) -> tuple[list[float | None], object]:
+    calls: list[float | None] = []
+
+    def operation(timeout: float | None) -> str:
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise APITimeoutError(request=httpx.Request("POST", "https://api.openai.test/v1/embeddings"))
+        return "ok"
+
+    return calls, operation
+
+
+def test_transient_failures_are_retried_up_to_max_retries() -> None:
+    calls, operation = _failing(2)
+    assert RetryPolicy(max_retries=2, initial_backoff=0.0, max_backoff=0.0).call(operation) == "ok"
+    assert len(calls) == 3
+
+    calls, operation = _failing(3)
+    with pytest.raises(APITimeoutError):
+        RetryPolicy(max_retries=2, initial_backoff=0.0, max_backoff=0.0).call(operation)
+    assert len(calls) == 3
+
+
+def test_non_transient_errors_are_not_retried() -> None:
+    calls: list[float | None] = []
+
+    def operation(timeout: float | None) -> str:
+        calls.append(timeout)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        RetryPolicy(max_retries=5, initial_backoff=0.0, max_backoff=0.0).call(operation)
+    assert len(calls) == 1
+
+
+def test_spent_budget_stops_retries() -> None:
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0)
+    policy = RetryPolicy(max_retries=5, initial_backoff=0.0, max_backoff=0.0, budget=budget)
+    calls, operation = _failing(5)
+
+    with pytest.raises(APITimeoutError):
+        policy.call(operation)
+
+    # Each call earns half a retry: the first failure may retry, the second may not
+    assert len(calls) == 2
+    assert budget.stats()["denied"] == 1
+
+
+def test_passed_deadline_raises_before_calling() -> None:
+    calls, operation = _failing(0)
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            RetryPolicy().call(operation)
+    assert calls == []
+
+
+def test_only_interactive_clients_draw_from_the_budget(tmp_path: Path) -> None:
+    settings = Settings(openai_api_key="test", embeddings_path=tmp_path, openai_rate_limit=False, embed_cache_max_entries=0, circuit_breaker=False)
+
+    assert get_openai_client(settings)._retry_policy.budget is not None
+    assert get_openai_client(settings, interactive=False)._retry_policy.budget is None
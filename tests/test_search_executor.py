@@ -0,0 +1,43 @@
+""" Search pool: results, errors and queue accounting under cancellation. """
+
+import asyncio
+import threading
+
+import pytest
+
+from src.rag.search_executor import SearchExecutor
+
+
+def test_runs_jobs_and_counts_outcomes() -> None:
+    executor = SearchExecutor(workers=2)
+
+    async def scenario() -> None:
+        assert await executor.run(lambda: 42) == 42
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert (stats["completed"], stats["failed"], stats["queued"], stats["active"]) == (2, 1, 0, 0)
+    executor.shutdown()
+
+
+def test_cancelled_queued_job_leaves_the_queue() -> None:
+    executor = SearchExecutor(workers=1)
+    release = threading.Event()
+
+    async def scenario() -> None:
+        blocker = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        # The only worker is busy, so this job is still queued when its waiter gives up
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(executor.run(lambda: "never"), 0.05)
+        release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert stats["queued"] == 0
+    assert stats["cancelled"] == 1
+    assert stats["peak_queued"] == 1
+    executor.shutdown()
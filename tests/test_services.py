@@ -0,0 +1,127 @@
+""" Retrieval modes (single and batched questions) and the opt-in BM25 fallback. """
+
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+from src.rag.config import get_settings
+from src.rag.core.services import LEXICAL_FALLBACK, retrieve_context, retrieve_context_many, served_from_fallback
+from src.rag.lexical import LexicalIndex
+from src.rag.vector_store import DocumentChunk, RetrievedChunk
+
+
+class _SlowVectorStore:
+    """Stands in for a vector store whose query embedding is slow or failing."""
+
+    def __init__(self, *, delay: float = 0.0, error: Exception | None = None) -> None:
+        self._delay = delay
+        self._error = error
+
+    async def asimilarity_search_text(self, question, *, client, top_k, patient_id=None):
+        await asyncio.sleep(self._delay)
+        if self._error is not None:
+            raise self._error
+        return [RetrievedChunk(chunk_id="p1__vector", content="vector hit", score=0.9, metadata={})]
+
+
+def _lexical_index(tmp_path: Path) -> LexicalIndex:
+    index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    index.upsert([
+        DocumentChunk(
+            chunk_id="p1__note.txt__chunk_0",
+            document_id="p1__note.txt",
+            source_path="p1/note.txt",
+            chunk_index=0,
+            content="Warfarin dose held for INR 4.2.",
+            patient_id="p1",
+        )
+    ])
+    return index
+
+
+def _retrieve(store, index, *, patient_id: str = "p1", **overrides):
+    settings = replace(get_settings(), retrieval_mode="vector", **overrides)
+    return asyncio.run(
+        retrieve_context(
+            question="warfarin dose",
+            patient_id=patient_id,
+            openai_client=None,
+            vector_store=store,
+            top_k=5,
+            lexical_index=index,
+            settings=settings,
+        )
+    )
+
+
+def test_fallback_is_off_by_default(tmp_path: Path) -> None:
+    assert get_settings().retrieval_embed_timeout == 0
+    chunks = _retrieve(_SlowVectorStore(delay=0.2), _lexical_index(tmp_path), retrieval_embed_timeout=0.0)
+
+    assert [chunk.chunk_id for chunk in chunks] == ["p1__vector"]
+    assert not served_from_fallback(chunks)
+
+
+def test_errors_propagate_without_fallback(tmp_path: Path) -> None:
+    store = _SlowVectorStore(error=RuntimeError("embedding failed"))
+    with pytest.raises(HTTPException) as raised:
+        _retrieve(store, _lexical_index(tmp_path), retrieval_embed_timeout=0.0)
+    assert raised.value.status_code == 502
+
+
+def test_slow_vector_search_falls_back_when_enabled(tmp_path: Path) -> None:
+    chunks = _retrieve(_SlowVectorStore(delay=1.0), _lexical_index(tmp_path), retrieval_embed_timeout=0.05)
+
+    assert [chunk.chunk_id for chunk in chunks] == ["p1__note.txt__chunk_0"]
+    assert chunks[0].metadata["retrieval"] == LEXICAL_FALLBACK
+    assert served_from_fallback(chunks)
+
+
+def test_fallback_never_crosses_patients(tmp_path: Path) -> None:
+    store = _SlowVectorStore(error=RuntimeError("embedding failed"))
+    with pytest.raises(HTTPException):
+        _retrieve(store, _lexical_index(tmp_path), patient_id="p10", retrieval_embed_timeout=0.05)
+
+
+class _BatchVectorStore:
+    """Stands in for a vector store answering several questions from one embedding call."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def asimilarity_search_texts(self, questions, *, client, top_k, patient_id=None):
+        self.calls += 1
+        return [[RetrievedChunk(chunk_id=f"p1__vector_{index}", content="vector hit", score=0.9, metadata={})] for index in range(len(questions))]
+
+
+def _retrieve_many(store, index, *, mode: str):
+    settings = replace(get_settings(), retrieval_mode=mode, retrieval_embed_timeout=0.0)
+    return asyncio.run(
+        retrieve_context_many(
+            questions=["warfarin dose", "current medications"],
+            patient_id="p1",
+            openai_client=None,
+            vector_store=store,
+            top_k=5,
+            merge=False,
+            lexical_index=index,
+            settings=settings,
+        )
+    )
+
+
+def test_many_honours_the_retrieval_mode(tmp_path: Path) -> None:
+    index = _lexical_index(tmp_path)
+
+    store = _BatchVectorStore()
+    lexical = _retrieve_many(store, index, mode="lexical")
+    assert store.calls == 0
+    assert [[chunk.chunk_id for chunk in chunks] for chunks in lexical] == [["p1__note.txt__chunk_0"], []]
+
+    hybrid = _retrieve_many(store, index, mode="hybrid")
+    assert store.calls == 1
+    assert {chunk.chunk_id for chunk in hybrid[0]} == {"p1__vector_0", "p1__note.txt__chunk_0"}
+    assert [chunk.chunk_id for chunk in hybrid[1]] == ["p1__vector_1"]
@@ -0,0 +1,90 @@
+""" Memory-mapped index snapshot: round trip, lazy records and serving through file changes. """
+
+from pathlib import Path
+
+import pytest
+
+from src.rag import snapshot
+from src.rag.numpy_store import NumpyVectorStore
+from src.rag.snapshot import SnapshotVectorStore, export_snapshot, is_current_snapshot
+from src.rag.vector_store import DocumentChunk
+
+
+def _chunk(chunk_id: str, patient_id: str = "p1") -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=chunk_id,
+        document_id=f"{patient_id}__note.txt",
+        source_path=f"{patient_id}/note.txt",
+        chunk_index=0,
+        content=f"content of {chunk_id}",
+        patient_id=patient_id,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _check_every_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(snapshot, "_STAT_CHECK_INTERVAL", 0.0)
+
+
+def _export(tmp_path: Path, chunks: list[DocumentChunk], embeddings: list[list[float]], name: str = "index.snap") -> Path:
+    store = NumpyVectorStore(persist_directory=tmp_path / "backend", collection_name=name.replace(".", "_"))
+    store.upsert(chunks, embeddings)
+    export_snapshot(store, tmp_path / name)
+    return tmp_path / name
+
+
+def _ids(store: SnapshotVectorStore, patient_id: str | None = "p1") -> list[str]:
+    return [chunk.chunk_id for chunk in store.similarity_search([1.0, 0.0, 0.0], top_k=10, patient_id=patient_id)]
+
+
+def test_round_trip_is_scoped_to_the_patient(tmp_path: Path) -> None:
+    path = _export(tmp_path, [_chunk("a", "p1"), _chunk("b", "p2"), _chunk("c", "p1")], [[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.6, 0.8, 0.0]])
+    store = SnapshotVectorStore(path)
+
+    results = store.similarity_search([1.0, 0.0, 0.0], top_k=10, patient_id="p1")
+
+    assert [chunk.chunk_id for chunk in results] == ["a", "c"]
+    assert results[0].content == "content of a"
+    assert results[0].metadata["patient_id"] == "p1"
+    assert _ids(store, "p2") == ["b"]
+    assert is_current_snapshot(path)
+
+
+def test_records_are_decoded_only_for_returned_rows(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    chunks = [_chunk(f"c{index}") for index in range(20)]
+    path = _export(tmp_path, chunks, [[1.0, index / 20, 0.0] for index in range(20)])
+    decoded: list[int] = []
+    record = snapshot._LoadedSnapshot.record
+    monkeypatch.setattr(snapshot._LoadedSnapshot, "record", lambda self, row: decoded.append(row) or record(self, row))
+
+    store = SnapshotVectorStore(path)
+    assert decoded == []
+
+    assert [chunk.chunk_id for chunk in store.similarity_search([1.0, 0.0, 0.0], top_k=2, patient_id="p1")] == ["c0", "c1"]
+    assert len(decoded) == 2
+
+
+def test_keeps_serving_when_the_file_disappears(tmp_path: Path) -> None:
+    path = _export(tmp_path, [_chunk("a")], [[1.0, 0.0, 0.0]])
+    store = SnapshotVectorStore(path)
+    path.unlink()
+
+    assert _ids(store) == ["a"]
+
+
+def test_replaced_file_is_picked_up(tmp_path: Path) -> None:
+    path = _export(tmp_path, [_chunk("a")], [[1.0, 0.0, 0.0]])
+    store = SnapshotVectorStore(path)
+    replacement = _export(tmp_path, [_chunk("b")], [[1.0, 0.0, 0.0]], name="next.snap")
+    replacement.replace(path)
+
+    assert _ids(store) == ["b"]
+
+
+def test_older_format_is_not_current(tmp_path: Path) -> None:
+    path = tmp_path / "old.snap"
+    path.write_bytes(b"RAGSNAP1".ljust(64, b"\0") + (2).to_bytes(8, "little") + b"RAGSNAP1")
+
+    assert not is_current_snapshot(path)
+    with pytest.raises(ValueError, match="older snapshot format"):
+        SnapshotVectorStore(path)